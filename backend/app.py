@@ -1,24 +1,308 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, has_app_context, has_request_context
 from flask_cors import CORS
 import sqlite3
 import json
 from datetime import datetime
 import os
+import atexit
+import base64
+import time
+import click
+from functools import wraps
+from werkzeug.local import LocalProxy
+
+from db import ConnectionPool, DatabaseWriter, configure_database, storage_pragmas
+from migrations import CATALOG_TABLES, SEARCH_INDEXES, SHARD_MIGRATIONS, SYNC_TABLES, apply_migrations
+from versioning import TableVersions, conditional
+from cache import ResponseCache
+from serialization import dumps, encode_row, encode_rows, json_response
+from seeding import lesson_exercise_rows, seed_from_file, startup_lock, upsert_lesson_exercises
+from search import SEARCH_SOURCES, search
+from backup import EXPORT_TABLES, ImportFormatError, export_ndjson, import_ndjson, iter_lines, table_columns
+from runner import RunnerPool, RunnerUnavailable
+from grading import GradingQueue
+from writebehind import ProgressBuffer
+from events import EventBus, EventStream, TooManySubscribers, parse_event_id
+from sync import DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT, changes_since, parse_shard_since, prune_tombstones, shard_changes_since
+from stats import get_stats, rebuild_stats
+from history import DEFAULT_HISTORY_LIMIT, MAX_HISTORY_LIMIT, get_version, list_versions, record_attempts
+from lessons import LessonIndex, LessonIndexError, compile_index, source_digest
+from metrics import Metrics, TimedJSONProvider
+from review import DEFAULT_REVIEW_LIMIT, MAX_GRADE, MAX_REVIEW_LIMIT, MIN_GRADE, due_reviews, now_iso, record_review, utc_now
+from tenants import Tenant, TenantRegistry, UserDirectory, adopt_user_tables, bearer_token, create_user
 
 app = Flask(__name__)
 CORS(app)
 
 DATABASE = 'dsa_tracker.db'
 
+# Per-route latency, SQL and serialization metrics, exported at /metrics.
+# SLOW_REQUEST_MS logs slower requests with query plans for their statements.
+SLOW_REQUEST_MS = os.environ.get('SLOW_REQUEST_MS')
+metrics = Metrics(
+    slow_request_seconds=float(SLOW_REQUEST_MS) / 1000 if SLOW_REQUEST_MS else None,
+    log=app.logger.warning,
+)
+app.json = TimedJSONProvider(app, metrics)
+traced_connection = metrics.connection_factory()
+# The raw-JSON splice encoders count as serialization time too
+timed_dumps = metrics.timed(dumps)
+timed_encode_row = metrics.timed(encode_row)
+timed_encode_rows = metrics.timed(encode_rows)
+
+# Connection pool settings (override with environment variables)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5.0))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30.0))
+
+# Readers share the pool and are read-only; all writes go through the writer thread
+catalog_pool = ConnectionPool(
+    DATABASE,
+    max_size=DB_POOL_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    pragmas={**storage_pragmas(), 'query_only': 'ON'},
+    health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+    factory=traced_connection,
+)
+# Drive ETags on the read endpoints. The counters live in the database and
+# are bumped by triggers, so every process sees every write; mutating
+# endpoints bump them to tell listeners (the cache, the event bus) at once.
+catalog_versions = TableVersions(DATABASE)
+
+# Commits by other processes (server workers, CLI commands) are noticed by
+# each writer within DB_WATCH_INTERVAL seconds and announced to listeners
+DB_WATCH_INTERVAL = float(os.environ.get('DB_WATCH_INTERVAL', 0.25))
+catalog_writer = DatabaseWriter(
+    DATABASE,
+    pragmas=storage_pragmas(),
+    factory=traced_connection,
+    watch_interval=DB_WATCH_INTERVAL or None,
+    on_external_change=catalog_versions.refresh if DB_WATCH_INTERVAL else None,
+)
+atexit.register(catalog_writer.stop)
+
+# Serialized GET responses, invalidated by table whenever versions are bumped
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 512)),
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+)
+catalog_versions.add_listener(response_cache.invalidate)
+
+# Every bump is pushed to /api/events subscribers as a change event
+event_bus = EventBus(
+    max_subscribers=int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 1000)),
+    queue_size=int(os.environ.get('EVENTS_QUEUE_SIZE', 64)),
+)
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15.0))
+
+def write_origin():
+    """The X-Client-Id of the request making a write (None outside requests)"""
+    return request.headers.get('X-Client-Id') if has_request_context() else None
+
+catalog_versions.add_listener(event_bus.table_listener(catalog_versions, origin=write_origin))
+atexit.register(event_bus.close)
+
+# Progress autosaves are coalesced per problem and written in batches
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get('PROGRESS_FLUSH_INTERVAL', 1.0))
+PROGRESS_FLUSH_MAX_PENDING = int(os.environ.get('PROGRESS_FLUSH_MAX_PENDING', 256))
+PROGRESS_FLUSH_MAX_ATTEMPTS = int(os.environ.get('PROGRESS_FLUSH_MAX_ATTEMPTS', 3))
+catalog_progress_buffer = ProgressBuffer(
+    catalog_writer,
+    flush_interval=PROGRESS_FLUSH_INTERVAL,
+    max_pending=PROGRESS_FLUSH_MAX_PENDING,
+    after_write=record_attempts,
+    max_attempts=PROGRESS_FLUSH_MAX_ATTEMPTS,
+    after_flush=catalog_versions.refresh,
+)
+atexit.register(catalog_progress_buffer.flush)
+catalog_progress_buffer.install_signal_handler()
+
+# The main database: the problems catalog, plus the one user's tables when
+# there are no user shards
+catalog = Tenant(None, catalog_pool, catalog_writer, catalog_versions, catalog_progress_buffer)
+
+# User accounts with their own shard files (see tenants.py), enabled by
+# USER_SHARD_DIRS: one or more directories separated by os.pathsep
+USER_SHARD_DIRS = [d for d in os.environ.get('USER_SHARD_DIRS', '').split(os.pathsep) if d]
+USER_SHARDS_OPEN = int(os.environ.get('USER_SHARDS_OPEN', 64))
+USER_SHARD_POOL_SIZE = int(os.environ.get('USER_SHARD_POOL_SIZE', 4))
+
+def create_shard_tables(db):
+    """Create and migrate a user shard's tables (runs on the shard's writer)"""
+    create_user_tables(db)
+    apply_migrations(db, SHARD_MIGRATIONS)
+
+def open_shard(user):
+    """Pool, writer, versions and progress buffer for a user's shard, migrated first"""
+    path = user['shard_path']
+    # Problem versions come from the catalog. Shard cache entries are keyed
+    # per user and checked against the versions they were built at, so
+    # shard bumps don't need to sweep the shared cache.
+    shard_versions = TableVersions(path, parent=catalog_versions, inherited=CATALOG_TABLES)
+    shard_versions.add_listener(event_bus.table_listener(shard_versions, scope=user['id'], origin=write_origin))
+
+    shard_writer = DatabaseWriter(
+        path,
+        pragmas=storage_pragmas(),
+        factory=traced_connection,
+        watch_interval=DB_WATCH_INTERVAL or None,
+        on_external_change=shard_versions.refresh if DB_WATCH_INTERVAL else None,
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with startup_lock(path):
+        configure_database(path)
+        shard_writer.run(create_shard_tables)
+
+    shard_pool = ConnectionPool(
+        path,
+        max_size=USER_SHARD_POOL_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        pragmas={**storage_pragmas(), 'query_only': 'ON'},
+        health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+        factory=traced_connection,
+        attach={'catalog': DATABASE},
+    )
+    shard_buffer = ProgressBuffer(
+        shard_writer,
+        flush_interval=PROGRESS_FLUSH_INTERVAL,
+        max_pending=PROGRESS_FLUSH_MAX_PENDING,
+        after_write=record_attempts,
+        max_attempts=PROGRESS_FLUSH_MAX_ATTEMPTS,
+        after_flush=shard_versions.refresh,
+    )
+    return Tenant(user['id'], shard_pool, shard_writer, shard_versions, shard_buffer)
+
+users = UserDirectory(catalog_pool)
+tenants = None
+if USER_SHARD_DIRS:
+    tenants = TenantRegistry(open_shard, max_open=USER_SHARDS_OPEN)
+    atexit.register(tenants.close_all)
+    tenants.install_signal_handler()
+
+def current_tenant():
+    """The request's user shard, or the main database"""
+    return g.get('tenant', catalog) if has_app_context() else catalog
+
+# What the endpoints read and write: the current user's shard with user
+# shards enabled, otherwise (and outside requests) the main database.
+# Changes to the catalog itself go through the catalog_* objects.
+pool = LocalProxy(lambda: current_tenant().pool)
+writer = LocalProxy(lambda: current_tenant().writer)
+versions = LocalProxy(lambda: current_tenant().versions)
+progress_buffer = LocalProxy(lambda: current_tenant().progress_buffer)
+
+# Node.js worker processes that grade submitted solutions (started on first run)
+runner = RunnerPool(
+    node=os.environ.get('RUNNER_NODE'),
+    size=int(os.environ.get('RUNNER_WORKERS', 2)),
+    test_timeout_ms=int(os.environ.get('RUNNER_TEST_TIMEOUT_MS', 2000)),
+    memory_mb=int(os.environ.get('RUNNER_MEMORY_MB', 128)),
+)
+atexit.register(runner.stop)
+
+def load_test_cases(problem_id):
+    """Stored test_cases JSON for a problem ('' if it has none), or None if missing"""
+    db = catalog_pool.acquire()
+    try:
+        row = db.execute('SELECT test_cases FROM problems WHERE id = ?', (problem_id,)).fetchone()
+    finally:
+        catalog_pool.release(db)
+    return None if row is None else (row['test_cases'] or '')
+
+# Dedupes, caches and batches runs in front of the runner
+grading = GradingQueue(
+    runner,
+    load_test_cases,
+    cache_size=int(os.environ.get('GRADING_CACHE_SIZE', 1024)),
+    max_batch=int(os.environ.get('GRADING_MAX_BATCH', 16)),
+)
+catalog_versions.add_listener(grading.invalidate)
+
 def get_db():
-    """Get database connection"""
-    db = sqlite3.connect(DATABASE)
-    db.row_factory = sqlite3.Row
-    return db
+    """Get the pooled database connection for the current app context"""
+    if 'db' not in g:
+        g.db_pool = current_tenant().pool
+        g.db = g.db_pool.acquire()
+    return g.db
+
+def public(view):
+    """Mark a view as open to requests without an API token (with user shards)"""
+    view.public = True
+    return view
+
+def admin_only(view):
+    """With user shards, only admins may change shared state (the problem catalog, the cache)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if tenants is not None and not g.user['is_admin']:
+            return jsonify({'error': 'This requires an admin account'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def request_token():
+    token = bearer_token(request.headers.get('Authorization'))
+    if token is None and request.endpoint == 'stream_events':
+        # EventSource can't set headers
+        token = request.args.get('access_token')
+    return token
+
+@app.before_request
+def start_request_metrics():
+    """Open this request's metrics (SQL and serialization time accrue to it)"""
+    endpoint = request.url_rule.rule if request.url_rule else '(unmatched)'
+    metrics.begin(endpoint, request.method)
+
+@app.before_request
+def open_user_shard():
+    """With user shards, route the request to the caller's shard (401 without a valid token)"""
+    # Batched sub-requests share the outer request's app context and shard
+    if tenants is None or 'tenant' in g or request.method == 'OPTIONS':
+        return None
+    view = app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, 'public', False):
+        return None
+    user = users.authenticate(request_token())
+    if user is None:
+        return jsonify({'error': 'Missing or invalid API token'}), 401
+    g.user = user
+    g.tenant = tenants.acquire(user)
+    g.cache_scope = g.tenant.cache_scope
+    return None
+
+@app.after_request
+def record_response_status(response):
+    stats = metrics.current()
+    if stats is not None:
+        stats.status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exception):
+    """Record the request's latency, logging it with query plans if it was slow"""
+    finished = metrics.end()
+    if finished is not None:
+        stats, elapsed, slow = finished
+        if slow:
+            metrics.log_slow(stats, elapsed, request.full_path.rstrip('?'), g.get('db'))
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Return the app context's connection to the pool, and its shard to the registry"""
+    db = g.pop('db', None)
+    if db is not None:
+        g.pop('db_pool').release(db)
+    tenant = g.pop('tenant', None)
+    if tenant is not None:
+        tenants.release(tenant)
 
 def init_db():
     """Initialize database with tables"""
-    db = get_db()
+    configure_database(DATABASE)
+    catalog_writer.run(create_tables)
+
+def create_tables(db):
+    """Create tables and default rows (runs on the writer thread)"""
     cursor = db.cursor()
 
     # Problems table - stores both lesson exercises and user-added problems
@@ -41,6 +325,13 @@ def init_db():
         )
     ''')
 
+    create_user_tables(db)
+    apply_migrations(db)
+
+def create_user_tables(db):
+    """Create one user's tables and default rows (the main database's, or a shard's)"""
+    cursor = db.cursor()
+
     # User progress table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS user_progress (
@@ -132,96 +423,263 @@ def init_db():
                 VALUES (?, ?)
             ''', (category, idx))
 
-    db.commit()
-    db.close()
-
-# Initialize database on startup
-init_db()
+LESSON_DATA_PATH = os.path.join(os.path.dirname(__file__), '../dsa-study/src/components/lesson-data.json')
 
 def seed_exercises_from_file():
-    """Automatically seed exercises from lesson-data.json if not already seeded"""
-    lesson_data_path = os.path.join(os.path.dirname(__file__), '../dsa-study/src/components/lesson-data.json')
+    """Seed exercises from lesson-data.json when its content hash has changed"""
+    if not os.path.exists(LESSON_DATA_PATH):
+        print(f"Warning: lesson-data.json not found at {LESSON_DATA_PATH}")
+        return None
+
+    written, seconds = seed_from_file(catalog_writer, LESSON_DATA_PATH)
+    if written is None:
+        print(f"✓ Lesson exercises unchanged, seeding skipped ({seconds * 1000:.1f}ms)")
+    else:
+        print(f"✓ Seeded {written} lesson exercises ({seconds * 1000:.1f}ms)")
+    return written
+
+# Compiled lesson content behind GET /api/lessons, rebuilt when lesson-data.json changes
+LESSON_INDEX_PATH = os.environ.get('LESSON_INDEX_PATH', 'lesson_index.bin')
+lesson_index = LessonIndex(LESSON_INDEX_PATH)
+
+def compile_lessons_from_file():
+    """Compile lesson-data.json into the lesson index when its content hash has changed"""
+    if not os.path.exists(LESSON_DATA_PATH):
+        print(f"Warning: lesson-data.json not found at {LESSON_DATA_PATH}")
+        return None
+
+    started = time.perf_counter()
+    digest = source_digest(LESSON_DATA_PATH)
+    if lesson_index.is_current(digest):
+        print(f"✓ Lesson index unchanged ({(time.perf_counter() - started) * 1000:.1f}ms)")
+        return None
+    with open(LESSON_DATA_PATH, 'rb') as f:
+        count = compile_index(json.load(f), digest, LESSON_INDEX_PATH)
+    print(f"✓ Compiled {count} lessons into {LESSON_INDEX_PATH} ({(time.perf_counter() - started) * 1000:.1f}ms)")
+    return count
+
+def startup():
+    """Create/migrate the schema and seed exercises, once per deployment.
+
+    Workers sharing the database take turns under a file lock; after the
+    first one finishes, the rest find the schema current and the lesson
+    hash unchanged and return almost immediately. Set SEED_ON_STARTUP=0 to
+    leave seeding to `flask --app app seed` in a deploy step.
+    """
+    started = time.perf_counter()
+    with startup_lock(DATABASE):
+        init_db()
+        if os.environ.get('SEED_ON_STARTUP', '1') != '0':
+            seed_exercises_from_file()
+        compile_lessons_from_file()
+    print(f"✓ Database ready in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+@app.cli.command('seed')
+def seed_command():
+    """Seed lesson exercises from lesson-data.json"""
+    seed_exercises_from_file()
+
+@app.cli.command('compile-lessons')
+def compile_lessons_command():
+    """Compile lesson-data.json into the memory-mapped lesson index"""
+    compile_lessons_from_file()
+
+# Initialize database and seed exercises on startup
+startup()
 
-    if not os.path.exists(lesson_data_path):
-        print(f"Warning: lesson-data.json not found at {lesson_data_path}")
-        return
+# ==================== PROBLEMS ENDPOINTS ====================
 
-    with open(lesson_data_path, 'r') as f:
-        lesson_data = json.load(f)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
 
-    db = get_db()
-    cursor = db.cursor()
-
-    count = 0
-    for category, lessons in lesson_data.items():
-        for lesson in lessons:
-            if 'exercise' in lesson:
-                exercise = lesson['exercise']
-                problem_id = f"{lesson['id']}-exercise"
-
-                # Check if already exists
-                cursor.execute('SELECT id FROM problems WHERE id = ?', (problem_id,))
-                if cursor.fetchone():
-                    continue
-
-                cursor.execute('''
-                    INSERT INTO problems (
-                        id, title, category, difficulty, description,
-                        is_lesson_exercise, lesson_id, starter_code,
-                        solution, test_cases
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    problem_id,
-                    exercise.get('title', lesson['title']),
-                    category,
-                    exercise.get('difficulty', lesson['difficulty']),
-                    exercise.get('description'),
-                    1,
-                    lesson['id'],
-                    exercise.get('starterCode'),
-                    exercise.get('solution'),
-                    json.dumps(exercise.get('testCases', []))
-                ))
-                count += 1
-
-    db.commit()
-    db.close()
-
-    if count > 0:
-        print(f"✓ Seeded {count} lesson exercises")
-
-# Auto-seed on startup
-seed_exercises_from_file()
+def encode_cursor(*values):
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
 
-# ==================== PROBLEMS ENDPOINTS ====================
+def decode_cursor(cursor, size):
+    """Decode a cursor from encode_cursor(), raising ValueError if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+# Output field -> SQL expression for every field a list endpoint can project
+PROBLEM_COLUMNS = {
+    'id': 'p.id',
+    'title': 'p.title',
+    'category': 'p.category',
+    'difficulty': 'p.difficulty',
+    'description': 'p.description',
+    'platform': 'p.platform',
+    'is_lesson_exercise': 'p.is_lesson_exercise',
+    'lesson_id': 'p.lesson_id',
+    'starter_code': 'p.starter_code',
+    'solution': 'p.solution',
+    'test_cases': 'p.test_cases',
+    'time_complexity': 'p.time_complexity',
+    'space_complexity': 'p.space_complexity',
+    'created_at': 'p.created_at',
+    'completed': 'up.completed',
+    'completed_at': 'up.completed_at',
+    'user_code': 'up.user_code',
+    'last_attempted': 'up.last_attempted',
+}
+
+NOTE_COLUMNS = {
+    name: name for name in
+    ('id', 'note_title', 'note_content', 'data_structure', 'tags', 'created_at')
+}
+
+RESOURCE_COLUMNS = {
+    name: name for name in
+    ('id', 'resource_name', 'resource_type', 'resource_link', 'data_structure',
+     'is_favorite', 'added_at')
+}
+
+def select_fields(columns, required=()):
+    """Compile the ?fields= projection into a SQL column list.
+
+    Returns the column list and the requested field names, or None when no
+    projection was asked for. Fields in ``required`` are always selected
+    (e.g. pagination keys) and should be dropped from the output unless
+    requested. Raises ValueError for unknown fields.
+    """
+    fields_arg = request.args.get('fields')
+    if not fields_arg:
+        return ', '.join(f'{expr} AS {name}' for name, expr in columns.items()), None
+
+    fields = list(dict.fromkeys(f.strip() for f in fields_arg.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    selected = fields + [f for f in required if f not in fields]
+    return ', '.join(f'{columns[name]} AS {name}' for name in selected), fields
+
+def project_row(row, fields):
+    """Turn a row into a dict, keeping only the requested fields"""
+    item = dict(row)
+    if fields is not None and len(item) != len(fields):
+        item = {name: item[name] for name in fields}
+    return item
+
+def progress_pending():
+    """Whether autosaves are buffered that user_progress versions don't count yet"""
+    return bool(progress_buffer.pending())
+
+def parse_bool_arg(name):
+    """Read a 0/1/true/false query argument as 0, 1 or None when absent"""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    if value.lower() in ('1', 'true', 'yes'):
+        return 1
+    if value.lower() in ('0', 'false', 'no'):
+        return 0
+    raise ValueError(f'Invalid value for {name}: {value}')
 
 @app.route('/api/problems', methods=['GET'])
+@conditional(versions, 'problems', 'user_progress', cache=response_cache,
+             bypass=progress_pending)
 def get_problems():
-    """Get all problems (both exercises and user-added)"""
-    db = get_db()
-    cursor = db.cursor()
+    """Get problems (both exercises and user-added), newest first.
+
+    Optional filters: category, difficulty, completed, is_lesson_exercise.
+    Passing limit and/or cursor switches to keyset pagination over
+    (created_at, id) and returns {problems, next_cursor}; without them the
+    full list is returned as before. fields=a,b,... limits the columns
+    read and returned.
+    """
+    paginate = 'limit' in request.args or 'cursor' in request.args
+    where = []
+    params = []
 
-    cursor.execute('''
-        SELECT p.*, up.completed, up.completed_at, up.user_code, up.last_attempted
+    try:
+        columns, fields = select_fields(
+            PROBLEM_COLUMNS, required=('created_at', 'id') if paginate else ('id',)
+        )
+
+        for column in ('category', 'difficulty'):
+            value = request.args.get(column)
+            if value:
+                where.append(f'p.{column} = ?')
+                params.append(value)
+
+        completed = parse_bool_arg('completed')
+        if completed is not None:
+            # Filtering on progress needs buffered saves in the table
+            progress_buffer.flush()
+            where.append('COALESCE(up.completed, 0) = ?')
+            params.append(completed)
+
+        is_lesson_exercise = parse_bool_arg('is_lesson_exercise')
+        if is_lesson_exercise is not None:
+            where.append('p.is_lesson_exercise = ?')
+            params.append(is_lesson_exercise)
+
+        limit = None
+        if paginate:
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            cursor_arg = request.args.get('cursor')
+            if cursor_arg:
+                created_at, last_id = decode_cursor(cursor_arg, 2)
+                where.append('(p.created_at, p.id) < (?, ?)')
+                params.extend([created_at, last_id])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    query = f'''
+        SELECT {columns}
         FROM problems p
         LEFT JOIN user_progress up ON p.id = up.problem_id
-        ORDER BY p.created_at DESC
-    ''')
+    '''
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    query += ' ORDER BY p.created_at DESC, p.id DESC'
+    if limit is not None:
+        # Fetch one extra row to know whether another page exists
+        query += ' LIMIT ?'
+        params.append(limit + 1)
+
+    pending = progress_buffer.pending()
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(query, params)
+
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
 
-    problems = []
-    for row in cursor.fetchall():
-        problem = dict(row)
-        # Parse JSON fields
-        if problem['test_cases']:
-            problem['test_cases'] = json.loads(problem['test_cases'])
-        problems.append(problem)
+    # test_cases is stored as JSON text and spliced into the output unparsed
+    if pending:
+        # Buffered autosaves (keyed by id, which is always selected) win
+        rows = [
+            progress_buffer.apply(dict(row), pending[row['id']]) if row['id'] in pending else row
+            for row in rows
+        ]
+    problems = timed_encode_rows(project_row(row, fields) for row in rows)
+
+    if limit is None:
+        return json_response(problems)
 
-    db.close()
-    return jsonify(problems)
+    return json_response(
+        b'{"next_cursor":' + timed_dumps(next_cursor) + b',"problems":' + problems + b'}'
+    )
 
 @app.route('/api/problems/<problem_id>', methods=['GET'])
+@conditional(versions, 'problems', 'user_progress', cache=response_cache,
+             bypass=progress_pending)
 def get_problem(problem_id):
     """Get a specific problem"""
+    pending = progress_buffer.pending(problem_id)
+
     db = get_db()
     cursor = db.cursor()
 
@@ -233,31 +691,60 @@ def get_problem(problem_id):
     ''', (problem_id,))
 
     row = cursor.fetchone()
-    db.close()
 
     if row:
-        problem = dict(row)
-        if problem['test_cases']:
-            problem['test_cases'] = json.loads(problem['test_cases'])
-        return jsonify(problem)
+        item = dict(row)
+        if pending:
+            progress_buffer.apply(item, pending)
+        return json_response(timed_encode_row(item))
     return jsonify({'error': 'Problem not found'}), 404
 
+@app.route('/api/problems/<problem_id>/run', methods=['POST'])
+def run_problem(problem_id):
+    """Run submitted code against the problem's test cases.
+
+    Identical resubmissions are answered from the grading cache. Passing
+    every test case records the code as a completed attempt in user_progress.
+    """
+    data = request.json or {}
+    code = data.get('code')
+    if not isinstance(code, str) or not code.strip():
+        return jsonify({'error': 'code is required'}), 400
+
+    fixture = grading.fixture(problem_id)
+    if fixture is None:
+        return jsonify({'error': 'Problem not found'}), 404
+    if not fixture.test_cases:
+        return jsonify({'error': 'Problem has no test cases'}), 400
+
+    try:
+        result = grading.grade(fixture, code)
+    except (RunnerUnavailable, TimeoutError) as e:
+        return jsonify({'error': str(e) or 'Timed out waiting for a test runner'}), 503
+
+    if result['passed']:
+        # Through the autosave buffer, so a buffered edit can't overwrite it later
+        now = datetime.now().isoformat()
+        progress_buffer.save(problem_id, code, 1, now, now)
+
+    return jsonify(result)
+
 @app.route('/api/problems', methods=['POST'])
+@admin_only
 def create_problem():
     """Create a new problem"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
+    problem_id = data.get('id', str(datetime.now().timestamp()))
 
     try:
-        cursor.execute('''
+        catalog_writer.execute('''
             INSERT INTO problems (
                 id, title, category, difficulty, description, platform,
                 is_lesson_exercise, lesson_id, starter_code, solution,
                 test_cases, time_complexity, space_complexity
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
-            data.get('id', str(datetime.now().timestamp())),
+            problem_id,
             data['title'],
             data['category'],
             data['difficulty'],
@@ -267,29 +754,23 @@ def create_problem():
             data.get('lesson_id'),
             data.get('starter_code'),
             data.get('solution'),
-            json.dumps(data.get('test_cases', [])),
+            dumps(data.get('test_cases', [])).decode(),
             data.get('time_complexity'),
             data.get('space_complexity')
         ))
-
-        db.commit()
-        problem_id = data.get('id', str(datetime.now().timestamp()))
-        db.close()
+        catalog_versions.bump('problems')
 
         return jsonify({'id': problem_id, 'message': 'Problem created'}), 201
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/problems/<problem_id>', methods=['PUT'])
+@admin_only
 def update_problem(problem_id):
     """Update a problem"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
-
     try:
-        cursor.execute('''
+        catalog_writer.execute('''
             UPDATE problems
             SET title = ?, category = ?, difficulty = ?, description = ?,
                 platform = ?, solution = ?, time_complexity = ?, space_complexity = ?
@@ -305,26 +786,26 @@ def update_problem(problem_id):
             data.get('space_complexity'),
             problem_id
         ))
-
-        db.commit()
-        db.close()
+        catalog_versions.bump('problems')
 
         return jsonify({'message': 'Problem updated'})
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/problems/<problem_id>', methods=['DELETE'])
+@admin_only
 def delete_problem(problem_id):
     """Delete a problem"""
-    db = get_db()
-    cursor = db.cursor()
+    catalog_progress_buffer.flush()
 
-    cursor.execute('DELETE FROM problems WHERE id = ?', (problem_id,))
-    cursor.execute('DELETE FROM user_progress WHERE problem_id = ?', (problem_id,))
+    def delete(db):
+        db.execute('DELETE FROM problems WHERE id = ?', (problem_id,))
+        db.execute('DELETE FROM user_progress WHERE problem_id = ?', (problem_id,))
 
-    db.commit()
-    db.close()
+    # Users' shards keep their progress on the problem; every read of it
+    # that matters joins problems, so it simply stops showing up
+    catalog_writer.run(delete)
+    catalog_versions.bump('problems', 'user_progress')
 
     return jsonify({'message': 'Problem deleted'})
 
@@ -332,77 +813,244 @@ def delete_problem(problem_id):
 
 @app.route('/api/progress/<problem_id>', methods=['POST'])
 def update_progress(problem_id):
-    """Update progress for a problem"""
+    """Update progress for a problem (buffered; see writebehind.py)"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
 
-    # Check if progress exists
-    cursor.execute('SELECT id FROM user_progress WHERE problem_id = ?', (problem_id,))
-    existing = cursor.fetchone()
+    progress_buffer.save(
+        problem_id,
+        data.get('user_code'),
+        data.get('completed', 0),
+        data.get('completed_at'),
+        datetime.now().isoformat()
+    )
 
-    if existing:
-        cursor.execute('''
-            UPDATE user_progress
-            SET user_code = ?, completed = ?, completed_at = ?, last_attempted = ?
-            WHERE problem_id = ?
-        ''', (
-            data.get('user_code'),
-            data.get('completed', 0),
-            data.get('completed_at'),
-            datetime.now().isoformat(),
-            problem_id
-        ))
-    else:
-        cursor.execute('''
-            INSERT INTO user_progress (problem_id, user_code, completed, completed_at, last_attempted)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
+    return jsonify({'message': 'Progress updated'})
+
+MAX_BATCH_ITEMS = 1000
+
+def batch_items(data):
+    """Validate a batch request body: a non-empty JSON array of bounded size"""
+    if not isinstance(data, list) or not data:
+        raise ValueError('Expected a non-empty JSON array')
+    if len(data) > MAX_BATCH_ITEMS:
+        raise ValueError(f'At most {MAX_BATCH_ITEMS} items per batch')
+    return data
+
+@app.route('/api/progress/batch', methods=['POST'])
+def update_progress_batch():
+    """Update progress for several problems in one transaction.
+
+    Takes an array of {problem_id, user_code, completed, completed_at} and
+    returns a status per item, in order.
+    """
+    try:
+        items = batch_items(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    now = datetime.now().isoformat()
+    results = []
+    for index, item in enumerate(items):
+        problem_id = item.get('problem_id') if isinstance(item, dict) else None
+        if not isinstance(problem_id, str) or not problem_id:
+            results.append({'index': index, 'status': 'error', 'error': 'problem_id is required'})
+            continue
+        progress_buffer.save(
             problem_id,
-            data.get('user_code'),
-            data.get('completed', 0),
-            data.get('completed_at'),
-            datetime.now().isoformat()
-        ))
+            item.get('user_code'),
+            item.get('completed', 0),
+            item.get('completed_at'),
+            now
+        )
+        results.append({'index': index, 'problem_id': problem_id, 'status': 'saved'})
 
-    db.commit()
-    db.close()
+    saved = sum(1 for r in results if r['status'] == 'saved')
+    if saved:
+        try:
+            # The buffer writes everything it holds in one executemany transaction
+            progress_buffer.flush()
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
 
-    return jsonify({'message': 'Progress updated'})
+    return jsonify({'results': results, 'saved': saved, 'failed': len(results) - saved})
 
 @app.route('/api/progress', methods=['GET'])
+@conditional(versions, 'user_progress', cache=response_cache,
+             bypass=progress_pending)
 def get_all_progress():
     """Get all user progress"""
+    progress_buffer.flush()
     db = get_db()
     cursor = db.cursor()
 
     cursor.execute('SELECT * FROM user_progress')
     progress = [dict(row) for row in cursor.fetchall()]
 
-    db.close()
     return jsonify(progress)
 
+@app.route('/api/progress/<problem_id>/history', methods=['GET'])
+@conditional(versions, 'user_progress', cache=response_cache,
+             bypass=progress_pending)
+def get_progress_history(problem_id):
+    """Saved versions of a problem's code, newest first, without the code itself.
+
+    Page with limit and before=<next_before>; fetch a version's code from
+    /api/progress/<problem_id>/history/<version>.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_HISTORY_LIMIT)), 1), MAX_HISTORY_LIMIT)
+        before = int(request.args['before']) if 'before' in request.args else None
+    except ValueError:
+        return jsonify({'error': 'limit and before must be integers'}), 400
+
+    progress_buffer.flush()
+    history = list_versions(get_db(), problem_id, limit + 1, before)
+    next_before = None
+    if len(history) > limit:
+        history = history[:limit]
+        next_before = history[-1]['version']
+
+    return jsonify({'versions': history, 'next_before': next_before})
+
+@app.route('/api/progress/<problem_id>/history/<int:version>', methods=['GET'])
+def get_progress_version(problem_id, version):
+    """One saved version of a problem's code, with its content hash as a strong ETag"""
+    progress_buffer.flush()
+    attempt = get_version(get_db(), problem_id, version)
+    if attempt is None:
+        return jsonify({'error': 'Version not found'}), 404
+
+    response = jsonify(attempt)
+    response.set_etag(attempt['hash'])
+    # Revalidate: a deleted and re-created problem numbers its versions afresh
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+# ==================== REVIEW ENDPOINTS ====================
+
+# Not behind @conditional: reviews fall due with the clock, not with writes
+@app.route('/api/review/next', methods=['GET'])
+def get_next_reviews():
+    """Problems due for spaced-repetition review, most overdue first"""
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_REVIEW_LIMIT)), 1), MAX_REVIEW_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    # Completing a problem schedules its first review, so apply buffered saves
+    progress_buffer.flush()
+    items, next_due_at = due_reviews(get_db(), now_iso(), limit)
+    return jsonify({'items': items, 'next_due_at': next_due_at})
+
+@app.route('/api/review/<problem_id>', methods=['POST'])
+def review_problem(problem_id):
+    """Record a review grade (0-5) and reschedule the problem"""
+    grade = (request.get_json(silent=True) or {}).get('grade')
+    if isinstance(grade, bool) or not isinstance(grade, int) or not MIN_GRADE <= grade <= MAX_GRADE:
+        return jsonify({'error': f'grade must be an integer from {MIN_GRADE} to {MAX_GRADE}'}), 400
+
+    check_problem = not current_tenant().sharded
+    if not check_problem:
+        # The shard's writer can't see the catalog; look the problem up here
+        if get_db().execute('SELECT 1 FROM problems WHERE id = ?', (problem_id,)).fetchone() is None:
+            return jsonify({'error': 'Problem not found'}), 404
+    schedule = writer.run(record_review, problem_id, grade, utc_now(), check_problem)
+    if schedule is None:
+        return jsonify({'error': 'Problem not found'}), 404
+    versions.bump('review_schedule')
+    return jsonify(schedule)
+
 # ==================== LESSONS ENDPOINTS ====================
 
+def lesson_index_response(body, etag):
+    """Precompiled JSON from the lesson index, with its content hash as a strong ETag"""
+    response = json_response(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/lessons', methods=['GET'])
+@public
+def get_lessons():
+    """Lesson summaries grouped by category, in lesson-data.json order"""
+    try:
+        return lesson_index_response(*lesson_index.summaries())
+    except LessonIndexError as e:
+        return jsonify({'error': str(e)}), 503
+
+@app.route('/api/lessons/<lesson_id>', methods=['GET'])
+@public
+def get_lesson(lesson_id):
+    """Full content of one lesson (explanation, visualizer steps, exercise)"""
+    try:
+        found = lesson_index.lesson(lesson_id)
+    except LessonIndexError as e:
+        return jsonify({'error': str(e)}), 503
+    if found is None:
+        return jsonify({'error': 'Lesson not found'}), 404
+    return lesson_index_response(*found)
+
 @app.route('/api/lessons/complete/<lesson_id>', methods=['POST'])
 def mark_lesson_complete(lesson_id):
     """Mark a lesson as complete"""
-    db = get_db()
-    cursor = db.cursor()
+    writer.execute('''
+        INSERT OR IGNORE INTO lesson_completion (lesson_id, completed_at)
+        VALUES (?, ?)
+    ''', (lesson_id, datetime.now().isoformat()))
+    versions.bump('lesson_completion')
+    return jsonify({'message': 'Lesson marked complete'})
 
-    cursor.execute('SELECT id FROM lesson_completion WHERE lesson_id = ?', (lesson_id,))
-    if not cursor.fetchone():
-        cursor.execute('''
-            INSERT INTO lesson_completion (lesson_id, completed_at)
-            VALUES (?, ?)
-        ''', (lesson_id, datetime.now().isoformat()))
+@app.route('/api/lessons/complete/batch', methods=['POST'])
+def mark_lessons_complete_batch():
+    """Mark several lessons complete in one transaction.
 
-        db.commit()
+    Takes an array of lesson ids and returns a status per item, in order:
+    completed, already_completed or error.
+    """
+    try:
+        items = batch_items(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    db.close()
-    return jsonify({'message': 'Lesson marked complete'})
+    lesson_ids = [item for item in items if isinstance(item, str) and item]
+    now = datetime.now().isoformat()
+
+    def complete(db):
+        placeholders = ', '.join('?' for _ in lesson_ids)
+        existing = {
+            row[0] for row in db.execute(
+                f'SELECT lesson_id FROM lesson_completion WHERE lesson_id IN ({placeholders})',
+                lesson_ids,
+            )
+        }
+        new_ids = list(dict.fromkeys(i for i in lesson_ids if i not in existing))
+        db.executemany(
+            'INSERT OR IGNORE INTO lesson_completion (lesson_id, completed_at) VALUES (?, ?)',
+            [(lesson_id, now) for lesson_id in new_ids],
+        )
+        return existing
+
+    existing = writer.run(complete) if lesson_ids else set()
+
+    results = []
+    seen = set(existing)
+    for index, item in enumerate(items):
+        if not isinstance(item, str) or not item:
+            results.append({'index': index, 'status': 'error', 'error': 'Expected a lesson id'})
+        elif item in seen:
+            results.append({'index': index, 'lesson_id': item, 'status': 'already_completed'})
+        else:
+            seen.add(item)
+            results.append({'index': index, 'lesson_id': item, 'status': 'completed'})
+
+    completed = sum(1 for r in results if r['status'] == 'completed')
+    if completed:
+        versions.bump('lesson_completion')
+
+    return jsonify({'results': results, 'completed': completed})
 
 @app.route('/api/lessons/completed', methods=['GET'])
+@conditional(versions, 'lesson_completion', cache=response_cache)
 def get_completed_lessons():
     """Get all completed lessons"""
     db = get_db()
@@ -411,76 +1059,46 @@ def get_completed_lessons():
     cursor.execute('SELECT * FROM lesson_completion')
     lessons = [dict(row) for row in cursor.fetchall()]
 
-    db.close()
     return jsonify(lessons)
 
 # ==================== SEED DATA ====================
 
 @app.route('/api/seed-lesson-exercises', methods=['POST'])
+@admin_only
 def seed_lesson_exercises():
     """Seed database with exercises from lesson-data.json"""
     lesson_data = request.json
-    db = get_db()
-    cursor = db.cursor()
-
-    count = 0
-    for category, lessons in lesson_data.items():
-        for lesson in lessons:
-            if 'exercise' in lesson:
-                exercise = lesson['exercise']
-                problem_id = f"{lesson['id']}-exercise"
-
-                # Check if already exists
-                cursor.execute('SELECT id FROM problems WHERE id = ?', (problem_id,))
-                if not cursor.fetchone():
-                    cursor.execute('''
-                        INSERT INTO problems (
-                            id, title, category, difficulty, description,
-                            is_lesson_exercise, lesson_id, starter_code,
-                            solution, test_cases
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        problem_id,
-                        exercise.get('title', lesson['title']),
-                        category,
-                        exercise.get('difficulty', lesson['difficulty']),
-                        exercise.get('description'),
-                        1,
-                        lesson['id'],
-                        exercise.get('starterCode'),
-                        exercise.get('solution'),
-                        json.dumps(exercise.get('testCases', []))
-                    ))
-                    count += 1
-
-    db.commit()
-    db.close()
+    count = catalog_writer.run(upsert_lesson_exercises, lesson_exercise_rows(lesson_data))
+    if count:
+        catalog_versions.bump('problems')
 
     return jsonify({'message': f'Seeded {count} exercises'})
 
 # ==================== RESOURCES ENDPOINTS ====================
 
 @app.route('/api/resources', methods=['GET'])
+@conditional(versions, 'resources', cache=response_cache)
 def get_resources():
-    """Get all resources"""
+    """Get all resources (fields=a,b,... limits the columns returned)"""
+    try:
+        columns, fields = select_fields(RESOURCE_COLUMNS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     db = get_db()
     cursor = db.cursor()
 
-    cursor.execute('SELECT * FROM resources ORDER BY added_at DESC')
-    resources = [dict(row) for row in cursor.fetchall()]
+    cursor.execute(f'SELECT {columns} FROM resources ORDER BY added_at DESC')
+    resources = [project_row(row, fields) for row in cursor.fetchall()]
 
-    db.close()
     return jsonify(resources)
 
 @app.route('/api/resources', methods=['POST'])
 def create_resource():
     """Create a new resource"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
-
     try:
-        cursor.execute('''
+        result = writer.execute('''
             INSERT INTO resources (
                 resource_name, resource_type, resource_link,
                 data_structure, is_favorite, added_at
@@ -493,25 +1111,19 @@ def create_resource():
             1 if data.get('isFavorite') else 0,
             data.get('addedAt', datetime.now().isoformat())
         ))
-
-        db.commit()
-        resource_id = cursor.lastrowid
-        db.close()
+        versions.bump('resources')
+        resource_id = result.lastrowid
 
         return jsonify({'id': resource_id, 'message': 'Resource created'}), 201
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/resources/<int:resource_id>', methods=['PUT'])
 def update_resource(resource_id):
     """Update a resource"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
-
     try:
-        cursor.execute('''
+        writer.execute('''
             UPDATE resources
             SET resource_name = ?, resource_type = ?, resource_link = ?,
                 data_structure = ?, is_favorite = ?
@@ -524,70 +1136,67 @@ def update_resource(resource_id):
             1 if data.get('isFavorite') else 0,
             resource_id
         ))
-
-        db.commit()
-        db.close()
+        versions.bump('resources')
 
         return jsonify({'message': 'Resource updated'})
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/resources/<int:resource_id>', methods=['DELETE'])
 def delete_resource(resource_id):
     """Delete a resource"""
-    db = get_db()
-    cursor = db.cursor()
-
-    cursor.execute('DELETE FROM resources WHERE id = ?', (resource_id,))
-
-    db.commit()
-    db.close()
+    writer.execute('DELETE FROM resources WHERE id = ?', (resource_id,))
+    versions.bump('resources')
 
     return jsonify({'message': 'Resource deleted'})
 
 @app.route('/api/resources/<int:resource_id>/favorite', methods=['PATCH'])
 def toggle_favorite(resource_id):
     """Toggle favorite status of a resource"""
-    db = get_db()
-    cursor = db.cursor()
+    def toggle(db):
+        cursor = db.cursor()
 
-    cursor.execute('SELECT is_favorite FROM resources WHERE id = ?', (resource_id,))
-    row = cursor.fetchone()
+        cursor.execute('SELECT is_favorite FROM resources WHERE id = ?', (resource_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
 
-    if row:
         new_status = 0 if row['is_favorite'] else 1
         cursor.execute('UPDATE resources SET is_favorite = ? WHERE id = ?', (new_status, resource_id))
-        db.commit()
-        db.close()
+        return new_status
+
+    new_status = writer.run(toggle)
+    if new_status is not None:
+        versions.bump('resources')
         return jsonify({'message': 'Favorite toggled', 'is_favorite': new_status})
 
-    db.close()
     return jsonify({'error': 'Resource not found'}), 404
 
 # ==================== NOTES ENDPOINTS ====================
 
 @app.route('/api/notes', methods=['GET'])
+@conditional(versions, 'notes', cache=response_cache)
 def get_notes():
-    """Get all notes"""
+    """Get all notes (fields=a,b,... limits the columns returned)"""
+    try:
+        columns, fields = select_fields(NOTE_COLUMNS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     db = get_db()
     cursor = db.cursor()
 
-    cursor.execute('SELECT * FROM notes ORDER BY created_at DESC')
-    notes = [dict(row) for row in cursor.fetchall()]
+    cursor.execute(f'SELECT {columns} FROM notes ORDER BY created_at DESC')
+    notes = [project_row(row, fields) for row in cursor.fetchall()]
 
-    db.close()
     return jsonify(notes)
 
 @app.route('/api/notes', methods=['POST'])
 def create_note():
     """Create a new note"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
-
     try:
-        cursor.execute('''
+        result = writer.execute('''
             INSERT INTO notes (
                 note_title, note_content, data_structure, tags, created_at
             ) VALUES (?, ?, ?, ?, ?)
@@ -598,25 +1207,19 @@ def create_note():
             data.get('tags'),
             data.get('createdAt', datetime.now().isoformat())
         ))
-
-        db.commit()
-        note_id = cursor.lastrowid
-        db.close()
+        versions.bump('notes')
+        note_id = result.lastrowid
 
         return jsonify({'id': note_id, 'message': 'Note created'}), 201
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/notes/<int:note_id>', methods=['PUT'])
 def update_note(note_id):
     """Update a note"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
-
     try:
-        cursor.execute('''
+        writer.execute('''
             UPDATE notes
             SET note_title = ?, note_content = ?, data_structure = ?, tags = ?
             WHERE id = ?
@@ -627,31 +1230,24 @@ def update_note(note_id):
             data.get('tags'),
             note_id
         ))
-
-        db.commit()
-        db.close()
+        versions.bump('notes')
 
         return jsonify({'message': 'Note updated'})
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/notes/<int:note_id>', methods=['DELETE'])
 def delete_note(note_id):
     """Delete a note"""
-    db = get_db()
-    cursor = db.cursor()
-
-    cursor.execute('DELETE FROM notes WHERE id = ?', (note_id,))
-
-    db.commit()
-    db.close()
+    writer.execute('DELETE FROM notes WHERE id = ?', (note_id,))
+    versions.bump('notes')
 
     return jsonify({'message': 'Note deleted'})
 
 # ==================== SETTINGS ENDPOINTS ====================
 
 @app.route('/api/settings', methods=['GET'])
+@conditional(versions, 'user_settings', cache=response_cache)
 def get_settings():
     """Get user settings"""
     db = get_db()
@@ -660,18 +1256,14 @@ def get_settings():
     cursor.execute('SELECT * FROM user_settings WHERE id = 1')
     settings = cursor.fetchone()
 
-    db.close()
     return jsonify(dict(settings) if settings else {})
 
 @app.route('/api/settings', methods=['PUT'])
 def update_settings():
     """Update user settings"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
-
     try:
-        cursor.execute('''
+        writer.execute('''
             UPDATE user_settings
             SET app_name = ?, study_subject = ?, category_label = ?,
                 category_label_plural = ?, updated_at = ?
@@ -683,18 +1275,16 @@ def update_settings():
             data.get('categoryLabelPlural'),
             datetime.now().isoformat()
         ))
-
-        db.commit()
-        db.close()
+        versions.bump('user_settings')
 
         return jsonify({'message': 'Settings updated'})
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 # ==================== CATEGORIES ENDPOINTS ====================
 
 @app.route('/api/categories', methods=['GET'])
+@conditional(versions, 'custom_categories', cache=response_cache)
 def get_categories():
     """Get all custom categories"""
     db = get_db()
@@ -703,17 +1293,16 @@ def get_categories():
     cursor.execute('SELECT * FROM custom_categories ORDER BY display_order ASC')
     categories = [dict(row) for row in cursor.fetchall()]
 
-    db.close()
     return jsonify(categories)
 
 @app.route('/api/categories', methods=['POST'])
 def create_category():
     """Create a new category"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
 
-    try:
+    def create(db):
+        cursor = db.cursor()
+
         # Get the max display_order
         cursor.execute('SELECT MAX(display_order) as max_order FROM custom_categories')
         result = cursor.fetchone()
@@ -723,51 +1312,39 @@ def create_category():
             INSERT INTO custom_categories (name, display_order)
             VALUES (?, ?)
         ''', (data['name'], max_order + 1))
+        return cursor.lastrowid
 
-        db.commit()
-        category_id = cursor.lastrowid
-        db.close()
+    try:
+        category_id = writer.run(create)
+        versions.bump('custom_categories')
 
         return jsonify({'id': category_id, 'message': 'Category created'}), 201
     except sqlite3.IntegrityError:
-        db.close()
         return jsonify({'error': 'Category already exists'}), 400
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/categories/<int:category_id>', methods=['PUT'])
 def update_category(category_id):
     """Update a category"""
     data = request.json
-    db = get_db()
-    cursor = db.cursor()
-
     try:
-        cursor.execute('''
+        writer.execute('''
             UPDATE custom_categories
             SET name = ?
             WHERE id = ?
         ''', (data['name'], category_id))
-
-        db.commit()
-        db.close()
+        versions.bump('custom_categories')
 
         return jsonify({'message': 'Category updated'})
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/categories/<int:category_id>', methods=['DELETE'])
 def delete_category(category_id):
     """Delete a category"""
-    db = get_db()
-    cursor = db.cursor()
-
-    cursor.execute('DELETE FROM custom_categories WHERE id = ?', (category_id,))
-
-    db.commit()
-    db.close()
+    writer.execute('DELETE FROM custom_categories WHERE id = ?', (category_id,))
+    versions.bump('custom_categories')
 
     return jsonify({'message': 'Category deleted'})
 
@@ -775,24 +1352,358 @@ def delete_category(category_id):
 def reorder_categories():
     """Reorder categories"""
     data = request.json  # Expects { categoryIds: [id1, id2, id3...] }
-    db = get_db()
-    cursor = db.cursor()
 
     try:
-        for idx, category_id in enumerate(data['categoryIds']):
-            cursor.execute('''
-                UPDATE custom_categories
-                SET display_order = ?
-                WHERE id = ?
-            ''', (idx, category_id))
-
-        db.commit()
-        db.close()
+        writer.executemany('''
+            UPDATE custom_categories
+            SET display_order = ?
+            WHERE id = ?
+        ''', [(idx, category_id) for idx, category_id in enumerate(data['categoryIds'])])
+        versions.bump('custom_categories')
 
         return jsonify({'message': 'Categories reordered'})
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 400
 
+# ==================== STATS ENDPOINTS ====================
+
+# Not behind @conditional: the current streak changes at midnight without a write
+@app.route('/api/stats', methods=['GET'])
+def get_dashboard_stats():
+    """Dashboard statistics from the incrementally maintained summary tables.
+
+    Solved/total per category and difficulty, the lesson completion ratio,
+    current and longest daily streaks, and the last 30 days of activity.
+    """
+    progress_buffer.flush()
+    return jsonify(get_stats(get_db(), shard=current_tenant().sharded))
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Check the dashboard summary tables and rebuild them from scratch"""
+    drifted = catalog_writer.run(rebuild_stats)
+    if not drifted:
+        print("✓ Stats consistent, summary tables rebuilt")
+        return
+    for table, *key in drifted:
+        print(f"  {table}: {', '.join(str(part) for part in key)}")
+    print(f"✓ Rebuilt stats, corrected {len(drifted)} drifted rows")
+
+# ==================== SEARCH ENDPOINTS ====================
+
+@app.route('/api/search', methods=['GET'])
+@conditional(versions, 'notes', 'problems', 'resources', cache=response_cache)
+def search_all():
+    """Ranked full-text search over notes, problems and resources.
+
+    q is the search text; types=notes,problems,resources narrows the
+    sources; limit/offset page through the results. title and snippet are
+    escaped HTML with matches wrapped in <mark> tags.
+    """
+    query = request.args.get('q', '').strip()
+    types = [t for t in request.args.get('types', '').split(',') if t] or list(SEARCH_SOURCES)
+    unknown = [t for t in types if t not in SEARCH_SOURCES]
+    if unknown:
+        return jsonify({'error': f"Unknown types: {', '.join(unknown)}"}), 400
+
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+
+    results = search(get_db(), query, types, limit, offset) if query else []
+
+    next_offset = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_offset = offset + limit
+
+    return jsonify({'results': results, 'next_offset': next_offset})
+
+@app.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Rebuild the full-text search indexes from their tables"""
+    def rebuild(db):
+        for index in SEARCH_INDEXES:
+            db.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+    catalog_writer.run(rebuild)
+    print(f"✓ Rebuilt {len(SEARCH_INDEXES)} search indexes")
+
+# ==================== EVENTS ENDPOINTS ====================
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """Server-Sent Events stream of data changes.
+
+    Sends a `change` event naming the tables each write touched, a `resync`
+    event when the client fell too far behind to be caught up, and a
+    comment heartbeat while idle. Reconnecting browsers send
+    Last-Event-ID and receive the events they missed.
+    """
+    last_event_id = parse_event_id(
+        request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    )
+
+    try:
+        # Scoped to the user with user shards (None otherwise); catalog
+        # changes reach everyone
+        subscriber = event_bus.subscribe(last_event_id, scope=current_tenant().user_id)
+    except TooManySubscribers as e:
+        return jsonify({'error': str(e)}), 503
+
+    response = Response(
+        EventStream(event_bus, subscriber, heartbeat=EVENTS_HEARTBEAT),
+        mimetype='text/event-stream',
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ==================== SYNC ENDPOINTS ====================
+
+@app.route('/api/sync', methods=['GET'])
+@conditional(versions, *SYNC_TABLES, cache=response_cache,
+             bypass=progress_pending)
+def sync_changes():
+    """Rows changed since a change-log position, with tombstones for deletes.
+
+    since=<next_since from the previous call> (0 for everything, now for
+    just the current position); tables=a,b limits the changes to those
+    tables; limit caps the page and has_more says whether to call again.
+    reset=true means the position is too old and the client must resync
+    from 0. With user shards next_since is an opaque "catalog.shard"
+    string (see sync.py).
+    """
+    sharded = current_tenant().sharded
+    tables = [t for t in request.args.get('tables', '').split(',') if t] or None
+    unknown = [t for t in tables or () if t not in SYNC_TABLES]
+    if unknown:
+        return jsonify({'error': f"Unknown tables: {', '.join(unknown)}"}), 400
+    try:
+        since = request.args.get('since', '0')
+        if since == 'now':
+            since = None
+        else:
+            since = parse_shard_since(since) if sharded else max(int(since), 0)
+        limit = min(max(int(request.args.get('limit', DEFAULT_SYNC_LIMIT)), 1), MAX_SYNC_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+
+    progress_buffer.flush()
+    if sharded:
+        return json_response(shard_changes_since(get_db(), since, limit, tables))
+    return json_response(changes_since(get_db(), since, limit, tables))
+
+@app.cli.command('prune-changes')
+@click.option('--days', default=30, show_default=True, help='Keep tombstones newer than this')
+def prune_changes_command(days):
+    """Remove old delete tombstones from the sync change log"""
+    removed = catalog_writer.run(prune_tombstones, days)
+    print(f"✓ Pruned {removed} tombstones older than {days} days")
+
+# ==================== EXPORT / IMPORT ====================
+
+@app.route('/api/export', methods=['GET'])
+def export_data():
+    """Stream tables as NDJSON (tables=a,b limits the export)"""
+    tables = [t for t in request.args.get('tables', '').split(',') if t] or EXPORT_TABLES
+    unknown = [t for t in tables if t not in EXPORT_TABLES]
+    if unknown:
+        return jsonify({'error': f"Unknown tables: {', '.join(unknown)}"}), 400
+
+    progress_buffer.flush()
+    # The generator runs after the request, so it gets the real pool, not the proxy
+    response = Response(export_ndjson(current_tenant().pool, tables), mimetype='application/x-ndjson')
+    filename = f"dsa-tracker-{datetime.now().strftime('%Y%m%d-%H%M%S')}.ndjson"
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@app.route('/api/import', methods=['POST'])
+def import_data():
+    """Import an NDJSON upload from /api/export in one transaction.
+
+    on_conflict=update (default) overwrites existing rows with the same key;
+    on_conflict=skip keeps them. A bad line or a failed write imports nothing.
+    """
+    on_conflict = request.args.get('on_conflict', 'update')
+    if on_conflict not in ('update', 'skip'):
+        return jsonify({'error': 'on_conflict must be update or skip'}), 400
+
+    progress_buffer.flush()
+    db = get_db()
+    known_columns = {table: table_columns(db, table) for table in EXPORT_TABLES}
+
+    counts = {}
+    try:
+        # A user can't write the shared catalog; their export's problems are skipped
+        skip_tables = CATALOG_TABLES if current_tenant().sharded else ()
+        counts = import_ndjson(iter_lines(request.stream), writer, known_columns, on_conflict,
+                               skip_tables=skip_tables)
+    except (ImportFormatError, sqlite3.Error) as e:
+        return jsonify({'error': str(e), 'imported': {}}), 400
+    finally:
+        # Only set once the import has committed
+        if counts:
+            versions.bump(*counts)
+
+    return jsonify({'message': 'Import complete', 'imported': counts})
+
+# ==================== BATCH ENDPOINTS ====================
+
+MAX_BATCH_REQUESTS = 20
+
+@app.route('/api/batch', methods=['GET', 'POST'])
+def batch_get():
+    """Run several GET requests in one round trip.
+
+    Paths come from repeated ?path= arguments or a JSON body
+    {"requests": ["/api/settings", "/api/notes", ...]}. Sub-requests share
+    this request's database connection; each JSON body is spliced into the
+    response as-is under {path, status, body}.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        paths = data.get('requests') if isinstance(data, dict) else None
+    else:
+        paths = request.args.getlist('path')
+
+    if not isinstance(paths, list) or not paths or not all(isinstance(p, str) for p in paths):
+        return jsonify({'error': 'Expected a non-empty list of paths'}), 400
+    if len(paths) > MAX_BATCH_REQUESTS:
+        return jsonify({'error': f'At most {MAX_BATCH_REQUESTS} requests per batch'}), 400
+
+    parts = []
+    for path in paths:
+        if not path.startswith('/api/') or path.split('?')[0].rstrip('/') == '/api/batch':
+            status, body = 400, timed_dumps({'error': 'Only /api/ paths can be batched'})
+        else:
+            with app.test_request_context(path, method='GET'):
+                response = app.full_dispatch_request()
+            status = response.status_code
+            if response.is_streamed or response.mimetype != 'application/json':
+                response.close()
+                status, body = 400, timed_dumps({'error': 'Only JSON endpoints can be batched'})
+            else:
+                body = response.get_data() or b'null'
+        parts.append(
+            b'{"path":' + timed_dumps(path) + b',"status":' + str(status).encode()
+            + b',"body":' + body + b'}'
+        )
+
+    return json_response(b'{"responses":[' + b','.join(parts) + b']}')
+
+# ==================== USERS ====================
+
+@app.route('/api/me', methods=['GET'])
+def get_current_user():
+    """The account behind the request's API token (null without user shards)"""
+    user = g.get('user')
+    if user is None:
+        return jsonify(None)
+    return jsonify({'id': user['id'], 'username': user['username'], 'is_admin': bool(user['is_admin'])})
+
+@app.cli.command('create-user')
+@click.argument('username')
+@click.option('--admin', is_flag=True, help='Allow changes to the shared problem catalog')
+@click.option('--adopt', is_flag=True, help="Start from the main database's single-user data")
+def create_user_command(username, admin, adopt):
+    """Add an account with its own shard and print its API token"""
+    if not USER_SHARD_DIRS:
+        raise click.ClickException('Set USER_SHARD_DIRS to enable user accounts')
+    init_db()
+    user_id, path, token = catalog_writer.run(create_user, username, USER_SHARD_DIRS, admin)
+    open_shard({'id': user_id, 'shard_path': path}).close()
+    print(f"✓ Created user {username} (id {user_id}) with shard {path}")
+    if adopt:
+        counts = adopt_user_tables(path, DATABASE)
+        print(f"✓ Copied {sum(counts.values())} rows of existing data into the shard")
+    print(f"  API token (shown once): {token}")
+
+# ==================== SYSTEM ENDPOINTS ====================
+
+@app.route('/metrics', methods=['GET'])
+@public
+def get_metrics():
+    """Prometheus text metrics: per-route latency, SQL, serialization and component stats"""
+    body = metrics.render({
+        'db_pool': catalog_pool.stats(),
+        'db_writer': catalog_writer.stats(),
+        'response_cache': response_cache.stats(),
+        'runner': runner.stats(),
+        'grading': grading.stats(),
+        'progress_buffer': catalog_progress_buffer.stats(),
+        'events': event_bus.stats(),
+        **({'user_shards': tenants.stats()} if tenants is not None else {}),
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/system/db-pool', methods=['GET'])
+@public
+def get_pool_stats():
+    """Get connection pool hit/miss/wait metrics"""
+    return jsonify(catalog_pool.stats())
+
+@app.route('/api/system/db-writer', methods=['GET'])
+@public
+def get_writer_stats():
+    """Get single-writer queue and batching metrics"""
+    return jsonify(catalog_writer.stats())
+
+@app.route('/api/system/runner', methods=['GET'])
+@public
+def get_runner_stats():
+    """Get test runner worker pool metrics"""
+    return jsonify(runner.stats())
+
+@app.route('/api/system/grading', methods=['GET'])
+@public
+def get_grading_stats():
+    """Get grading queue depth, wait time, batching and verdict cache metrics"""
+    return jsonify(grading.stats())
+
+@app.route('/api/system/progress-buffer', methods=['GET'])
+@public
+def get_progress_buffer_stats():
+    """Get progress write-behind buffer metrics"""
+    return jsonify(catalog_progress_buffer.stats())
+
+@app.route('/api/system/events', methods=['GET'])
+@public
+def get_events_stats():
+    """Get event bus subscriber and delivery metrics"""
+    return jsonify(event_bus.stats())
+
+@app.route('/api/system/user-shards', methods=['GET'])
+@public
+def get_user_shard_stats():
+    """Get open user shard and LRU metrics (404 without user shards)"""
+    if tenants is None:
+        return jsonify({'error': 'User shards are not enabled'}), 404
+    return jsonify(tenants.stats())
+
+@app.route('/api/system/lesson-index', methods=['GET'])
+@public
+def get_lesson_index_stats():
+    """Get lesson index size and source hash"""
+    try:
+        return jsonify(lesson_index.stats())
+    except LessonIndexError as e:
+        return jsonify({'error': str(e)}), 503
+
+@app.route('/api/system/cache', methods=['GET'])
+@public
+def get_cache_stats():
+    """Get response cache hit ratio and size metrics"""
+    return jsonify(response_cache.stats())
+
+@app.route('/api/system/cache', methods=['DELETE'])
+@admin_only
+def clear_cache():
+    """Drop every cached response"""
+    response_cache.clear()
+    return jsonify({'message': 'Cache cleared'})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
@@ -0,0 +1,257 @@
+"""
+ASGI entry point for the API (``SERVER_MODE=asgi python serve.py``).
+
+The Flask app stays synchronous: each request runs on a thread from a
+fixed executor (SERVER_THREADS) and its response is sent chunk by chunk as
+that thread produces it, so a slow handler or a slow client ties up one
+executor thread rather than the event loop. /api/events, the one
+long-lived endpoint, is served on the event loop instead: the subscriber's
+wake callback sets an asyncio event, so an idle stream costs a coroutine
+instead of a blocked thread and open browser tabs can't starve requests
+of threads.
+
+Request bodies are read before the app runs (spooled to a temporary file
+past MAX_BODY_IN_MEMORY).
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import app as api
+from events import RETRY_MS, TooManySubscribers, format_events, parse_event_id, ping_message, retry_message
+from tenants import bearer_token
+
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 16))
+
+MAX_BODY_IN_MEMORY = 1024 * 1024
+
+# A response chunk the client hasn't taken in this long means it is gone
+SEND_TIMEOUT = 60.0
+
+executor = ThreadPoolExecutor(max_workers=SERVER_THREADS, thread_name_prefix='asgi-request')
+
+CORS_HEADER = (b'access-control-allow-origin', b'*')
+
+
+def wsgi_environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': int(os.environ.get('SERVER_WORKERS', 1)) > 1,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def read_body(receive):
+    """The whole request body as a file, or None if the client disconnected"""
+    body = tempfile.SpooledTemporaryFile(max_size=MAX_BODY_IN_MEMORY)
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            return None
+        body.write(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    body.seek(0)
+    return body
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def run_wsgi(loop, environ, send, disconnected):
+    """Run the Flask app on an executor thread, sending its response through the loop"""
+    response = {'start': None, 'headers_sent': False}
+
+    def transmit(chunk, more_body):
+        messages = []
+        if not response['headers_sent']:
+            messages.append(response['start'])
+            response['headers_sent'] = True
+        messages.append({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+
+        async def send_all():
+            for message in messages:
+                await send(message)
+        asyncio.run_coroutine_threadsafe(send_all(), loop).result(SEND_TIMEOUT)
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info is not None and response['headers_sent']:
+            raise exc_info[1].with_traceback(exc_info[2])
+        response['start'] = {
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in headers],
+        }
+        return lambda chunk: transmit(chunk, True)
+
+    result = api.app(environ, start_response)
+    try:
+        # Hold one chunk back so the last one goes out with more_body=False;
+        # a single-chunk response then takes one trip through the loop
+        previous = None
+        for chunk in result:
+            if disconnected.is_set():
+                return
+            if not chunk:
+                continue
+            if previous is not None:
+                transmit(previous, True)
+            previous = chunk
+        transmit(previous or b'', False)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+
+async def handle_wsgi(scope, receive, send):
+    body = await read_body(receive)
+    if body is None:
+        return
+    disconnected = threading.Event()
+    watcher = asyncio.ensure_future(wait_for_disconnect(receive))
+    watcher.add_done_callback(lambda task: task.cancelled() or disconnected.set())
+    try:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, run_wsgi, loop, wsgi_environ(scope, body), send, disconnected)
+    finally:
+        watcher.cancel()
+        body.close()
+
+
+async def send_error(send, status, message):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), CORS_HEADER]})
+    await send({'type': 'http.response.body', 'body': json.dumps({'error': message}).encode()})
+
+
+async def send_text(send, text):
+    await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+
+
+async def stream_events(scope, receive, send):
+    """/api/events on the event loop; same protocol as the Flask view"""
+    headers = dict(scope['headers'])
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    if b'last-event-id' in headers:
+        last_event_id = parse_event_id(headers[b'last-event-id'].decode('latin-1'))
+    else:
+        last_event_id = parse_event_id(query.get('last_event_id', [None])[0])
+
+    loop = asyncio.get_running_loop()
+    user_id = None
+    if api.tenants is not None:
+        token = (bearer_token(headers.get(b'authorization', b'').decode('latin-1'))
+                 or query.get('access_token', [None])[0])
+        # Usually cached; the first lookup of a token reads the catalog
+        user = await loop.run_in_executor(executor, api.users.authenticate, token)
+        if user is None:
+            await send_error(send, 401, 'Missing or invalid API token')
+            return
+        user_id = user['id']
+
+    try:
+        subscriber = api.event_bus.subscribe(last_event_id, scope=user_id)
+    except TooManySubscribers as e:
+        await send_error(send, 503, str(e))
+        return
+
+    ready = asyncio.Event()
+
+    def wake():
+        # Called on the publishing thread, with the bus lock held
+        try:
+            loop.call_soon_threadsafe(ready.set)
+        except RuntimeError:
+            pass  # the loop has already closed
+
+    subscriber.wake = wake
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            CORS_HEADER,
+        ]})
+        await send_text(send, retry_message(RETRY_MS))
+        while not api.event_bus.closed:
+            # Cleared before taking, so a publish in between still wakes the wait
+            ready.clear()
+            events = subscriber.take(0)
+            if events:
+                await send_text(send, format_events(events))
+                continue
+            woken = asyncio.ensure_future(ready.wait())
+            done, _ = await asyncio.wait({woken, disconnected}, timeout=api.EVENTS_HEARTBEAT,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if disconnected in done:
+                return
+            if not done:
+                await send_text(send, ping_message())
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        api.event_bus.unsubscribe(subscriber)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # uvicorn has installed its own handlers by now; wrap them so
+            # open streams end when it starts shutting down
+            api.event_bus.install_signal_handler(signal.SIGTERM)
+            api.event_bus.install_signal_handler(signal.SIGINT)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            api.event_bus.close()
+            await asyncio.get_running_loop().run_in_executor(executor, api.catalog_progress_buffer.flush)
+            if api.tenants is not None:
+                await asyncio.get_running_loop().run_in_executor(executor, api.tenants.close_all)
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http':
+        if scope['path'] == '/api/events' and scope['method'] == 'GET':
+            await stream_events(scope, receive, send)
+        else:
+            await handle_wsgi(scope, receive, send)
@@ -0,0 +1,185 @@
+"""
+NDJSON export and import of every user-facing table.
+
+Each line is one row: ``{"table": "<name>", "row": {...}}``. Export reads
+from a single snapshot with a server-side cursor, so memory stays flat
+regardless of table size. Import validates the whole upload line by line
+into a temporary file first and then writes it in fixed-size
+``executemany`` batches inside one transaction, so an import either
+applies in full or not at all.
+"""
+
+import json
+import tempfile
+
+from serialization import dumps
+
+# Export order matters for imports: parents before children
+EXPORT_TABLES = [
+    'user_settings',
+    'custom_categories',
+    'problems',
+    'user_progress',
+    'review_schedule',
+    'lesson_completion',
+    'resources',
+    'notes',
+]
+
+EXPORT_FETCH_SIZE = 500
+IMPORT_BATCH_SIZE = 1000
+# Validated rows stay in memory up to this size, then spill to disk
+IMPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+
+class ImportFormatError(ValueError):
+    """Raised for a malformed import line; carries the line number"""
+
+    def __init__(self, line_number, message):
+        super().__init__(f'Line {line_number}: {message}')
+        self.line_number = line_number
+
+
+def table_columns(db, table):
+    """Column names of ``table`` (only tables in EXPORT_TABLES are allowed)"""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f'Unknown table: {table}')
+    return [row[1] for row in db.execute(f'PRAGMA table_info({table})')]
+
+
+def export_ndjson(pool, tables=EXPORT_TABLES, fetch_size=EXPORT_FETCH_SIZE):
+    """Yield NDJSON chunks for ``tables`` from one consistent read snapshot.
+
+    Checks its own connection out of ``pool`` because the generator outlives
+    the request's app context.
+    """
+    db = pool.acquire()
+    try:
+        db.execute('BEGIN')
+        for table in tables:
+            columns = table_columns(db, table)
+            prefix = b'{"table":' + dumps(table) + b',"row":'
+            cursor = db.execute(f'SELECT * FROM {table}')
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield b''.join(
+                    prefix + dumps(dict(zip(columns, row))) + b'}\n' for row in rows
+                )
+        db.execute('COMMIT')
+    finally:
+        pool.release(db)
+
+
+def _normalize_problem(row):
+    """Accept test_cases as either stored JSON text or a decoded value"""
+    test_cases = row.get('test_cases')
+    if test_cases is None:
+        return row
+    if isinstance(test_cases, str):
+        json.loads(test_cases)  # reject text that isn't valid JSON
+        return row
+    return {**row, 'test_cases': dumps(test_cases).decode()}
+
+
+def _write_batch(db, table, columns, rows, on_conflict):
+    column_list = ', '.join(columns)
+    placeholders = ', '.join('?' for _ in columns)
+    if on_conflict == 'update':
+        updates = ', '.join(f'{c} = excluded.{c}' for c in columns)
+        conflict = f'ON CONFLICT DO UPDATE SET {updates}'
+    else:
+        conflict = 'ON CONFLICT DO NOTHING'
+    db.executemany(
+        f'INSERT INTO {table} ({column_list}) VALUES ({placeholders}) {conflict}',
+        rows,
+    )
+    return len(rows)
+
+
+def iter_lines(stream, chunk_size=64 * 1024):
+    """Split a binary stream into lines, reading it in fixed-size chunks.
+
+    Werkzeug's request stream reads one byte at a time when iterated by
+    line, which dominates the cost of large uploads.
+    """
+    buffer = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (buffer + chunk).split(b'\n')
+        buffer = lines.pop()
+        yield from lines
+    if buffer:
+        yield buffer
+
+
+def _parse_line(line_number, line, known_columns):
+    """Validate one NDJSON record and return its (table, row)"""
+    try:
+        record = json.loads(line)
+        table = record['table']
+        row = record['row']
+    except (ValueError, KeyError, TypeError) as e:
+        raise ImportFormatError(line_number, f'invalid record ({e})')
+
+    if table not in known_columns or not isinstance(row, dict):
+        raise ImportFormatError(line_number, f'unknown table {table!r}')
+    unknown = [c for c in row if c not in known_columns[table]]
+    if unknown:
+        raise ImportFormatError(line_number, f"unknown columns {', '.join(unknown)}")
+    if table == 'problems':
+        try:
+            row = _normalize_problem(row)
+        except ValueError:
+            raise ImportFormatError(line_number, 'test_cases is not valid JSON')
+    return table, row
+
+
+def import_ndjson(lines, writer, known_columns, on_conflict='update',
+                  batch_size=IMPORT_BATCH_SIZE, skip_tables=()):
+    """Validate NDJSON ``lines``, then write them through ``writer`` in one transaction.
+
+    ``known_columns`` maps table name to its column names. Every line is
+    checked before anything is written, so a bad one raises
+    ImportFormatError with the database untouched; a failing write rolls
+    the whole import back. Rows of ``skip_tables`` are validated but not
+    written (a user shard can't write the shared problems catalog).
+    Returns per-table row counts.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE) as spool:
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            table, row = _parse_line(line_number, line, known_columns)
+            if table not in skip_tables:
+                spool.write(dumps([table, row]) + b'\n')
+        spool.seek(0)
+        # No timeout: the job can't be called back once queued, and a
+        # large import legitimately holds the writer for a while
+        return writer.submit(_write_spool, spool, on_conflict, batch_size).result()
+
+
+def _write_spool(db, spool, on_conflict, batch_size):
+    """Writer job: validated rows grouped by table and column set, in batches"""
+    pending = {}
+    counts = {}
+
+    def flush(key):
+        table, columns = key
+        rows = pending.pop(key)
+        _write_batch(db, table, columns, rows, on_conflict)
+        counts[table] = counts.get(table, 0) + len(rows)
+
+    for line in spool:
+        table, row = json.loads(line)
+        key = (table, tuple(sorted(row)))
+        pending.setdefault(key, []).append(tuple(row[c] for c in key[1]))
+        if len(pending[key]) >= batch_size:
+            flush(key)
+    for key in list(pending):
+        flush(key)
+    return counts
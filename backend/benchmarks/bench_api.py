@@ -0,0 +1,512 @@
+"""
+Benchmark harness for the API: synthetic datasets, micro-benchmarks, a load
+generator and regression comparison.
+
+Subcommands:
+    generate build the dataset for --problems (micro and load do it on demand)
+    micro    time each scenario through Flask's test client
+    load     drive a real server with concurrent keep-alive clients
+    compare  diff two result files and flag regressions
+
+Datasets of --problems problems (1k to 1M) plus progress for half of them
+and notes for a tenth are generated once, deterministically, under
+--data-dir and reused by later runs. micro and load write p50/p95/p99
+latency and throughput per scenario as JSON (--output, default stdout).
+load starts a server on the dataset unless --url points it at one that is
+already running: the threaded development server (--server dev), or
+serve.py with gunicorn (--server wsgi) or uvicorn (--server asgi) and
+--workers/--threads.
+
+Usage:
+    python benchmarks/bench_api.py micro --problems 10000 --output before.json
+    python benchmarks/bench_api.py load --problems 100000 --concurrency 16 --duration 10
+    python benchmarks/bench_api.py load --server wsgi --workers 1 --threads 16 --output wsgi.json
+    python benchmarks/bench_api.py load --url http://127.0.0.1:8000 --output load.json
+    python benchmarks/bench_api.py compare before.json after.json --threshold 0.1
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+CATEGORIES = ['Arrays/Strings', 'Hashing', 'Graphs', 'Dynamic Programming', 'Trees',
+              'Heaps', 'Greedy', 'Advanced']
+DIFFICULTIES = ['Easy', 'Medium', 'Hard']
+WORDS = ['array', 'graph', 'window', 'prefix', 'stack', 'queue', 'heap', 'tree', 'path',
+         'interval', 'matrix', 'string', 'subarray', 'cycle', 'partition', 'merge']
+
+# Scenarios read every dataset at these sizes or below in full
+FULL_LIST_LIMIT = 10000
+
+# Weights of each scenario in the load generator's request mix
+LOAD_MIX = {
+    'get_problems_page': 30,
+    'get_problem': 30,
+    'update_progress': 20,
+    'get_stats': 10,
+    'search': 5,
+    'reorder_categories': 5,
+}
+
+BATCH_SIZE = 10000
+
+
+# ---- datasets ----
+
+def dataset_dir(data_dir, problems):
+    return os.path.join(data_dir, f'problems-{problems}')
+
+
+def generate_dataset(app, problems):
+    """Fill a fresh database through the writer, so triggers maintain every index"""
+    rng = random.Random(problems)
+    started = datetime(2024, 1, 1)
+
+    def timestamp(i):
+        return (started + timedelta(minutes=i)).isoformat(timespec='seconds')
+
+    def sentence(length):
+        return ' '.join(rng.choices(WORDS, k=length))
+
+    for start in range(0, problems, BATCH_SIZE):
+        indexes = range(start, min(start + BATCH_SIZE, problems))
+        app.writer.executemany('''
+            INSERT INTO problems (id, title, category, difficulty, description, test_cases, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(f'bench-{i}', sentence(4), rng.choice(CATEGORIES), rng.choice(DIFFICULTIES),
+               sentence(30), f'[{{"input":{{"n":{i}}},"expected":{i}}}]', timestamp(i))
+              for i in indexes])
+        app.writer.executemany('''
+            INSERT INTO user_progress (problem_id, user_code, completed, completed_at, last_attempted)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(f'bench-{i}', f'function solve(n) {{ return n + {i}; }}', int(i % 5 == 0),
+               timestamp(i) if i % 5 == 0 else None, timestamp(i))
+              for i in indexes if i % 2 == 0])
+        app.writer.executemany(
+            'INSERT INTO notes (note_title, note_content, data_structure, tags) VALUES (?, ?, ?, ?)',
+            [(sentence(3), sentence(60), rng.choice(CATEGORIES), sentence(2))
+             for i in indexes if i % 10 == 0],
+        )
+
+
+def load_app(data_dir, problems):
+    """Import the app inside the dataset's directory, generating the data once"""
+    path = dataset_dir(data_dir, problems)
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)
+    os.environ.setdefault('SEED_ON_STARTUP', '0')
+    import app  # noqa: E402 - creates the schema in the dataset directory
+
+    marker = os.path.join(path, 'ready.json')
+    if not os.path.exists(marker):
+        started = time.perf_counter()
+        generate_dataset(app, problems)
+        with open(marker, 'w') as f:
+            json.dump({'problems': problems, 'seconds': round(time.perf_counter() - started, 2)}, f)
+        print(f"Generated {problems} problems in {time.perf_counter() - started:.1f}s at {path}",
+              file=sys.stderr)
+    return app
+
+
+# ---- scenarios ----
+
+def scenarios(problems, category_ids):
+    """name -> function(rng) returning (method, path, json body or None)"""
+    def problem_id(rng):
+        return f'bench-{rng.randrange(problems)}'
+
+    def reordered(rng):
+        ids = list(category_ids)
+        rng.shuffle(ids)
+        return {'categoryIds': ids}
+
+    found = {
+        'get_problems_page': lambda rng: ('GET', '/api/problems?limit=50', None),
+        'get_problems_category': lambda rng: (
+            'GET', f'/api/problems?limit=50&category={quote(rng.choice(CATEGORIES), safe="")}', None),
+        'get_problem': lambda rng: ('GET', f'/api/problems/{problem_id(rng)}', None),
+        'update_progress': lambda rng: (
+            'POST', f'/api/progress/{problem_id(rng)}',
+            {'user_code': f'function solve(n) {{ return {rng.random()}; }}', 'completed': 0}),
+        'reorder_categories': lambda rng: ('PUT', '/api/categories/reorder', reordered(rng)),
+        'get_stats': lambda rng: ('GET', '/api/stats', None),
+        'search': lambda rng: ('GET', f'/api/search?q={"+".join(rng.sample(WORDS, 2))}', None),
+    }
+    if problems <= FULL_LIST_LIMIT:
+        found['get_problems_all'] = lambda rng: ('GET', '/api/problems', None)
+    return found
+
+
+def category_ids(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute('SELECT id FROM custom_categories ORDER BY id')]
+    finally:
+        conn.close()
+
+
+# ---- results ----
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(timings, errors, seconds):
+    """Latency percentiles (ms) and throughput for one scenario"""
+    timings = sorted(timings)
+    if not timings:
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'max_ms': round(timings[-1] * 1000, 3),
+        'throughput_rps': round(len(timings) / seconds, 1) if seconds else None,
+    }
+
+
+def meta(args, **extra):
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'problems': args.problems,
+        **extra,
+    }
+
+
+def write_results(results, output):
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+# ---- micro ----
+
+def run_generate(args):
+    app = load_app(args.data_dir, args.problems)
+    app.writer.stop()
+
+
+def run_micro(args):
+    app = load_app(args.data_dir, args.problems)
+    client = app.app.test_client()
+    rng = random.Random(args.seed)
+    selected = scenarios(args.problems, category_ids(app.DATABASE))
+    if args.scenarios:
+        selected = {name: selected[name] for name in args.scenarios}
+
+    results = {}
+    for name, make_request in selected.items():
+        timings, errors = [], 0
+        for iteration in range(args.warmup + args.requests):
+            method, path, body = make_request(rng)
+            if not args.warm_cache:
+                app.response_cache.clear()
+            started = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            elapsed = time.perf_counter() - started
+            if iteration < args.warmup:
+                continue
+            if response.status_code >= 400:
+                errors += 1
+            timings.append(elapsed)
+        results[f'micro/{name}'] = summarize(timings, errors, sum(timings))
+        print(f"  {name}: p50 {results[f'micro/{name}']['p50_ms']}ms", file=sys.stderr)
+
+    app.progress_buffer.flush()
+    app.writer.stop()
+    write_results({'meta': meta(args, mode='micro', warm_cache=args.warm_cache),
+                   'results': results}, args.output)
+
+
+# ---- load ----
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_server(args):
+    """Serve the dataset with the threaded development server (for ``load``)"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    app = load_app(args.data_dir, args.problems)
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'  # keep-alive
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', args.port, app.app, threaded=True, request_handler=QuietHandler)
+    print('ready', flush=True)
+    server.serve_forever()
+
+
+def wait_until_ready(process, url, timeout=60.0):
+    """Poll the server until it answers (gunicorn listens before its workers boot)"""
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+            conn.request('GET', '/api/categories')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit('Benchmark server failed to start')
+
+
+def start_server(args):
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    if args.server != 'dev':
+        subprocess.run([sys.executable, os.path.abspath(__file__), 'generate',
+                        '--problems', str(args.problems), '--data-dir', args.data_dir], check=True)
+        env = dict(os.environ, SEED_ON_STARTUP='0', SERVER_MODE=args.server,
+                   SERVER_BIND=f'127.0.0.1:{port}', SERVER_WORKERS=str(args.workers),
+                   SERVER_THREADS=str(args.threads))
+        process = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, 'serve.py')],
+                                   cwd=dataset_dir(args.data_dir, args.problems), env=env,
+                                   stdout=sys.stderr)
+        wait_until_ready(process, url)
+        return process, url
+
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), 'serve', '--port', str(port),
+         '--problems', str(args.problems), '--data-dir', args.data_dir],
+        stdout=subprocess.PIPE, text=True,
+    )
+    # Pass the app's startup output through until the server says it is listening
+    for line in process.stdout:
+        if line.strip() == 'ready':
+            return process, url
+        print(line, end='', file=sys.stderr)
+    process.kill()
+    raise SystemExit('Benchmark server failed to start')
+
+
+def open_event_streams(url, count):
+    """Hold ``count`` /api/events connections open, as that many browser tabs would"""
+    parts = urlsplit(url)
+    streams = []
+    for _ in range(count):
+        sock = socket.create_connection((parts.hostname, parts.port), timeout=30)
+        sock.sendall(f'GET /api/events HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+                     f'Accept: text/event-stream\r\n\r\n'.encode())
+        streams.append(sock)
+    return streams
+
+
+def load_worker(url, selected, weights, deadline, seed, timings, errors, lock):
+    rng = random.Random(seed)
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    names = list(selected)
+    local_timings = {name: [] for name in names}
+    local_errors = {name: 0 for name in names}
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights=weights)[0]
+        method, path, body = selected[name](rng)
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+            ok = False
+        elapsed = time.perf_counter() - started
+        if ok:
+            local_timings[name].append(elapsed)
+        else:
+            local_errors[name] += 1
+    conn.close()
+    with lock:
+        for name in names:
+            timings[name].extend(local_timings[name])
+            errors[name] += local_errors[name]
+
+
+def run_load(args):
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args)
+        db_path = os.path.join(dataset_dir(args.data_dir, args.problems), 'dsa_tracker.db')
+        ids = category_ids(db_path)
+    else:
+        parts = urlsplit(url)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        conn.request('GET', '/api/categories')
+        ids = [category['id'] for category in json.loads(conn.getresponse().read())]
+        conn.close()
+
+    try:
+        selected = scenarios(args.problems, ids)
+        selected = {name: selected[name] for name in LOAD_MIX}
+        weights = [LOAD_MIX[name] for name in selected]
+        timings = {name: [] for name in selected}
+        errors = {name: 0 for name in selected}
+        lock = threading.Lock()
+
+        streams = open_event_streams(url, args.streams)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        threads = [
+            threading.Thread(target=load_worker,
+                             args=(url, selected, weights, deadline, args.seed + index,
+                                   timings, errors, lock))
+            for index in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        for stream in streams:
+            stream.close()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+
+    results = {f'load/{name}': summarize(timings[name], errors[name], seconds) for name in selected}
+    results['load/all'] = summarize(
+        [t for values in timings.values() for t in values], sum(errors.values()), seconds
+    )
+    print(f"  {results['load/all'].get('throughput_rps', 0)} req/s, "
+          f"p99 {results['load/all'].get('p99_ms')}ms, "
+          f"{results['load/all']['errors']} errors", file=sys.stderr)
+    server = {} if args.url else {'server': args.server}
+    if server and args.server != 'dev':
+        server.update(workers=args.workers, threads=args.threads)
+    write_results({'meta': meta(args, mode='load', url=args.url, **server,
+                                concurrency=args.concurrency, duration=args.duration,
+                                streams=args.streams),
+                   'results': results}, args.output)
+
+
+# ---- compare ----
+
+# metric -> True if a higher value is worse
+COMPARED_METRICS = {'p50_ms': True, 'p95_ms': True, 'p99_ms': True, 'throughput_rps': False}
+
+
+def run_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.candidate) as f:
+        candidate = json.load(f)['results']
+
+    regressions = 0
+    for name in sorted(baseline.keys() & candidate.keys()):
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            before, after = baseline[name].get(metric), candidate[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = change > args.threshold if higher_is_worse else change < -args.threshold
+            # Sub-threshold absolute differences in latency are noise
+            if worse and metric.endswith('_ms') and after - before < args.min_delta_ms:
+                worse = False
+            regressions += worse
+            flag = 'REGRESSION' if worse else ''
+            print(f"{name:32} {metric:15} {before:>10} -> {after:>10} {change:+8.1%} {flag}")
+
+    for name in sorted(baseline.keys() - candidate.keys()):
+        print(f"{name:32} missing from {args.candidate}")
+    print(f"{regressions} regression(s) over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def dataset_args(command):
+        command.add_argument('--problems', type=int, default=10000)
+        command.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'dsa-tracker-bench'))
+        command.add_argument('--seed', type=int, default=1)
+
+    generate = commands.add_parser('generate', help='build the dataset without running anything')
+    dataset_args(generate)
+
+    micro = commands.add_parser('micro', help='time scenarios through the test client')
+    dataset_args(micro)
+    micro.add_argument('--requests', type=int, default=200)
+    micro.add_argument('--warmup', type=int, default=20)
+    micro.add_argument('--scenarios', nargs='+')
+    micro.add_argument('--warm-cache', action='store_true',
+                       help='keep the response cache between requests')
+    micro.add_argument('--output')
+
+    load = commands.add_parser('load', help='drive a real server with concurrent clients')
+    dataset_args(load)
+    load.add_argument('--url', help='benchmark this running server instead of starting one')
+    load.add_argument('--server', choices=['dev', 'wsgi', 'asgi'], default='dev',
+                      help='server to start: the development server, or serve.py in either mode')
+    load.add_argument('--workers', type=int, default=1)
+    load.add_argument('--threads', type=int, default=16)
+    load.add_argument('--concurrency', type=int, default=8)
+    load.add_argument('--duration', type=float, default=10.0)
+    load.add_argument('--streams', type=int, default=0,
+                      help='idle /api/events streams to hold open during the run')
+    load.add_argument('--output')
+
+    serve = commands.add_parser('serve')
+    dataset_args(serve)
+    serve.add_argument('--port', type=int, required=True)
+
+    compare = commands.add_parser('compare', help='flag regressions between two result files')
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.add_argument('--threshold', type=float, default=0.1,
+                         help='relative change that counts as a regression')
+    compare.add_argument('--min-delta-ms', type=float, default=0.05)
+
+    args = parser.parse_args()
+    handlers = {
+        'generate': run_generate,
+        'micro': run_micro,
+        'load': run_load,
+        'serve': run_server,
+        'compare': run_compare,
+    }
+    handlers[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
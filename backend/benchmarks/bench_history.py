@@ -0,0 +1,134 @@
+"""
+Benchmark: storage of the code-attempt history against raw snapshots.
+
+Creates a throwaway database in a temp directory and simulates editing
+sessions: each problem starts from a generated solution and is saved after
+every small edit (line inserted, deleted or changed, with the occasional
+undo back to an earlier attempt), flushing the progress buffer after each
+round as the autosave timer would. Reports the bytes of every saved
+snapshot raw and zlib-compressed one by one, the bytes actually stored in
+code_blobs, and how long fetching a version through the API takes.
+
+Usage:
+    python benchmarks/bench_history.py [--problems 200] [--attempts 100]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import zlib
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+IDENTIFIERS = ['nums', 'target', 'left', 'right', 'mid', 'seen', 'result', 'i', 'j', 'count', 'node', 'queue']
+
+
+def statement(rng):
+    a, b, c = rng.sample(IDENTIFIERS, 3)
+    return rng.choice([
+        f'  const {a} = {b}.length - {rng.randint(0, 3)};',
+        f'  if ({a} > {b}) {{ {c} += {rng.randint(1, 9)}; }}',
+        f'  for (let {a} = 0; {a} < {b}.length; {a}++) {{ {c}.push({b}[{a}]); }}',
+        f'  while ({a} < {b}) {{ {c} = Math.floor(({a} + {b}) / 2); }}',
+        f'  // {a} tracks the {b} seen so far',
+        f'  {a}.set({b}, ({a}.get({b}) || 0) + 1);',
+    ])
+
+
+def edit(rng, lines):
+    lines = list(lines)
+    roll = rng.random()
+    body = range(1, len(lines) - 1)
+    if roll < 0.4 or len(lines) < 4:
+        lines.insert(rng.randint(1, len(lines) - 1), statement(rng))
+    elif roll < 0.6:
+        del lines[rng.choice(body)]
+    else:
+        lines[rng.choice(body)] = statement(rng)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--problems', type=int, default=200)
+    parser.add_argument('--attempts', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.environ['SEED_ON_STARTUP'] = '0'
+        os.environ['PROGRESS_FLUSH_INTERVAL'] = '3600'
+        import app  # noqa: E402 - creates the schema in the temp directory
+
+        app.writer.executemany(
+            'INSERT INTO problems (id, title, category, difficulty) VALUES (?, ?, ?, ?)',
+            [(f'p{i}', f'Problem {i}', 'Arrays', 'Easy') for i in range(args.problems)],
+        )
+
+        sessions = {
+            f'p{i}': [['function solve(nums, target) {']
+                      + [statement(rng) for _ in range(rng.randint(10, 40))]
+                      + ['}']]
+            for i in range(args.problems)
+        }
+        raw_bytes = compressed_bytes = snapshots = 0
+        started = time.perf_counter()
+        for _ in range(args.attempts):
+            for problem_id, versions in sessions.items():
+                if len(versions) > 2 and rng.random() < 0.05:
+                    lines = rng.choice(versions[-5:-1])  # undo to a recent attempt
+                else:
+                    lines = edit(rng, versions[-1])
+                versions.append(lines)
+                code = '\n'.join(lines) + '\n'
+                raw_bytes += len(code.encode('utf-8'))
+                compressed_bytes += len(zlib.compress(code.encode('utf-8'), 9))
+                snapshots += 1
+                app.progress_buffer.save(problem_id, code, 0, None, None)
+            app.progress_buffer.flush()
+        record_seconds = time.perf_counter() - started
+
+        stored = app.writer.run(lambda db: db.execute('''
+            SELECT COUNT(*), COALESCE(SUM(length(data)), 0), COALESCE(MAX(depth), 0),
+                   (SELECT COUNT(*) FROM attempt_history)
+            FROM code_blobs
+        ''').fetchone())
+        blobs, stored_bytes, max_depth, versions = stored
+
+        client = app.app.test_client()
+        timings = []
+        for _ in range(500):
+            problem_id = rng.choice(list(sessions))
+            version = rng.randint(1, args.attempts)
+            begin = time.perf_counter()
+            response = client.get(f'/api/progress/{problem_id}/history/{version}')
+            timings.append((time.perf_counter() - begin) * 1000)
+            assert response.status_code == 200
+        timings.sort()
+
+        print(json.dumps({
+            'problems': args.problems,
+            'snapshots': snapshots,
+            'versions': versions,
+            'blobs': blobs,
+            'max_chain_depth': max_depth,
+            'raw_bytes': raw_bytes,
+            'zlib_snapshot_bytes': compressed_bytes,
+            'stored_bytes': stored_bytes,
+            'ratio_vs_raw': round(raw_bytes / stored_bytes, 2),
+            'ratio_vs_zlib_snapshots': round(compressed_bytes / stored_bytes, 2),
+            'record_seconds': round(record_seconds, 2),
+            'get_version_p50_ms': round(timings[len(timings) // 2], 3),
+            'get_version_p99_ms': round(timings[int(len(timings) * 0.99)], 3),
+        }, indent=2))
+        app.writer.stop()
+
+
+if __name__ == '__main__':
+    main()
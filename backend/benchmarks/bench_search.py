@@ -0,0 +1,119 @@
+"""
+Benchmark: GET /api/search latency on a large synthetic corpus.
+
+Creates a throwaway database in a temp directory, loads N notes (default
+100k) plus N/10 problems and resources through the normal write path (so
+the FTS triggers maintain the indexes), then times searches through
+Flask's test client with the response cache cleared before every request.
+
+Usage:
+    python benchmarks/bench_search.py [--documents 100000] [--queries 200]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+# Zipf-distributed vocabulary, like natural text: a handful of words occur in
+# almost every document and most words are rare
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+VOCABULARY = vocabulary(random.Random(1), 20000)
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=length))
+
+
+def insert_in_batches(writer, sql, rows, batch_size=5000):
+    for start in range(0, len(rows), batch_size):
+        writer.executemany(sql, rows[start:start + batch_size])
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.environ['SEED_ON_STARTUP'] = '0'
+        import app  # noqa: E402 - creates the schema in the temp directory
+
+        started = time.perf_counter()
+        insert_in_batches(
+            app.writer, 'INSERT INTO notes (note_title, note_content, tags) VALUES (?, ?, ?)',
+            [(sentence(rng, 4), sentence(rng, 80), sentence(rng, 3))
+             for _ in range(args.documents)],
+        )
+        insert_in_batches(
+            app.writer, 'INSERT INTO problems (id, title, category, difficulty, description) VALUES (?, ?, ?, ?, ?)',
+            [(f'p{i}', sentence(rng, 4), 'Arrays', 'Easy', sentence(rng, 60))
+             for i in range(args.documents // 10)],
+        )
+        insert_in_batches(
+            app.writer, 'INSERT INTO resources (resource_name, resource_type) VALUES (?, ?)',
+            [(sentence(rng, 5), 'video') for _ in range(args.documents // 10)],
+        )
+        load_seconds = time.perf_counter() - started
+
+        client = app.app.test_client()
+        # Searches name distinctive words; skip the ~100 most common ones,
+        # which behave like stop words and are timed separately below
+        searchable = VOCABULARY[100:]
+        queries = [' '.join(rng.sample(searchable, rng.randint(1, 3))) for _ in range(args.queries)]
+        queries += [rng.choice(searchable)[:-1] for _ in range(args.queries // 4)]  # prefix lookups
+
+        def run(queries):
+            timings = []
+            for query in queries:
+                app.response_cache.clear()
+                begin = time.perf_counter()
+                response = client.get('/api/search', query_string={'q': query, 'limit': 20})
+                timings.append((time.perf_counter() - begin) * 1000)
+                assert response.status_code == 200
+            return sorted(timings)
+
+        timings = run(queries)
+        common_timings = run(VOCABULARY[:10])
+
+        print(json.dumps({
+            'documents': args.documents + 2 * (args.documents // 10),
+            'load_seconds': round(load_seconds, 2),
+            'queries': len(queries),
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'max_ms': round(timings[-1], 2),
+            'most_common_terms_p50_ms': round(percentile(common_timings, 50), 2),
+            'most_common_terms_max_ms': round(common_timings[-1], 2),
+        }, indent=2))
+        app.writer.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: building the GET /api/problems body for a 10k-problem catalog.
+
+Compares the old path (json.loads every row's test_cases, then jsonify the
+whole structure) with the splice path in serialization.py, using orjson
+when it is installed and the stdlib encoder otherwise.
+
+Usage:
+    python benchmarks/bench_serialization.py [--problems 10000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask, jsonify  # noqa: E402
+
+import serialization  # noqa: E402
+
+COLUMNS = '''
+    p.id, p.title, p.category, p.difficulty, p.description, p.platform,
+    p.is_lesson_exercise, p.lesson_id, p.starter_code, p.solution,
+    p.test_cases, p.time_complexity, p.space_complexity, p.created_at,
+    NULL AS completed, NULL AS completed_at, NULL AS user_code,
+    NULL AS last_attempted
+'''
+
+
+def build_catalog(count):
+    """In-memory problems table shaped like the real one"""
+    rng = random.Random(42)
+    db = sqlite3.connect(':memory:')
+    db.row_factory = sqlite3.Row
+    db.execute('''
+        CREATE TABLE problems (
+            id TEXT PRIMARY KEY, title TEXT, category TEXT, difficulty TEXT,
+            description TEXT, platform TEXT, is_lesson_exercise INTEGER,
+            lesson_id TEXT, starter_code TEXT, solution TEXT, test_cases TEXT,
+            time_complexity TEXT, space_complexity TEXT, created_at TEXT
+        )
+    ''')
+    rows = []
+    for i in range(count):
+        test_cases = [
+            {'input': {'nums': [rng.randint(-100, 100) for _ in range(20)], 'target': i},
+             'expected': [rng.randint(0, 19), rng.randint(0, 19)]}
+            for _ in range(4)
+        ]
+        rows.append((
+            f'problem-{i}', f'Problem {i}', 'Arrays', 'Medium',
+            'Given an array of integers, return indices of the two numbers. ' * 4,
+            'LeetCode', i % 2, f'lesson-{i % 50}',
+            'function solve(nums, target) {\n  // Your code here\n}',
+            'function solve(nums, target) {\n  const seen = new Map();\n  return [];\n}',
+            json.dumps(test_cases, separators=(',', ':')), 'O(n)', 'O(n)', f'2025-01-01 00:00:{i % 60:02d}',
+        ))
+    db.executemany('INSERT INTO problems VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    return db
+
+
+def old_path(app, rows):
+    problems = []
+    for row in rows:
+        problem = dict(row)
+        if problem['test_cases']:
+            problem['test_cases'] = json.loads(problem['test_cases'])
+        problems.append(problem)
+    with app.app_context():
+        return jsonify(problems).get_data()
+
+
+def splice_path(app, rows):
+    return serialization.encode_rows(dict(row) for row in rows)
+
+
+def measure(fn, app, rows, repeat):
+    fn(app, rows)  # warm up
+    cpu = []
+    for _ in range(repeat):
+        started = time.process_time()
+        body = fn(app, rows)
+        cpu.append(time.process_time() - started)
+    cpu.sort()
+    return {
+        'median_cpu_ms': round(cpu[len(cpu) // 2] * 1000, 2),
+        'min_cpu_ms': round(cpu[0] * 1000, 2),
+        'bytes': len(body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--problems', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db = build_catalog(args.problems)
+    rows = db.execute(f'SELECT {COLUMNS} FROM problems p').fetchall()
+    app = Flask(__name__)
+
+    results = {'problems': args.problems, 'orjson': serialization.orjson is not None}
+    results['old'] = measure(old_path, app, rows, args.repeat)
+    results['splice'] = measure(splice_path, app, rows, args.repeat)
+    results['saved_cpu_ms_per_request'] = round(
+        results['old']['median_cpu_ms'] - results['splice']['median_cpu_ms'], 2
+    )
+    results['speedup'] = round(
+        results['old']['median_cpu_ms'] / results['splice']['median_cpu_ms'], 2
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: lesson seeding cost at startup.
+
+Builds a synthetic lesson-data.json with N exercises and times, on a
+database that is already seeded:
+
+- legacy: json.load + one SELECT per exercise (the pre-hash seeder)
+- hash_unchanged: the content-hash seeder when the file hasn't changed
+- hash_changed: the content-hash seeder after one exercise was edited
+
+It also times a full `import app` in a fresh interpreter against the real
+lesson file, which is what each worker pays on boot.
+
+Usage:
+    python benchmarks/bench_startup.py [--exercises 2000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from db import DatabaseWriter  # noqa: E402
+from seeding import seed_from_file  # noqa: E402
+
+
+def synthetic_lessons(count, edited=False):
+    lessons = []
+    for i in range(count):
+        lessons.append({
+            'id': f'lesson-{i}',
+            'title': f'Lesson {i}',
+            'difficulty': 'Medium',
+            'explanation': 'Lorem ipsum dolor sit amet. ' * 40,
+            'exercise': {
+                'title': f'Exercise {i}' + (' (edited)' if edited and i == 0 else ''),
+                'difficulty': 'Medium',
+                'description': 'Solve the problem. ' * 10,
+                'starterCode': 'function solve(nums) {\n  // Your code here\n}',
+                'solution': 'function solve(nums) {\n  return nums.length;\n}',
+                'testCases': [{'input': {'nums': list(range(10))}, 'expected': 10}],
+            },
+        })
+    return {'Synthetic': lessons}
+
+
+def legacy_seed(database, path):
+    """The seeder as it was before content hashing"""
+    with open(path) as f:
+        lesson_data = json.load(f)
+    db = sqlite3.connect(database)
+    cursor = db.cursor()
+    for category, lessons in lesson_data.items():
+        for lesson in lessons:
+            if 'exercise' in lesson:
+                cursor.execute('SELECT id FROM problems WHERE id = ?', (f"{lesson['id']}-exercise",))
+                cursor.fetchone()
+    db.commit()
+    db.close()
+
+
+def create_schema(database):
+    db = sqlite3.connect(database)
+    db.executescript('''
+        CREATE TABLE problems (
+            id TEXT PRIMARY KEY, title TEXT NOT NULL, category TEXT NOT NULL,
+            difficulty TEXT NOT NULL, description TEXT, platform TEXT,
+            is_lesson_exercise INTEGER DEFAULT 0, lesson_id TEXT,
+            starter_code TEXT, solution TEXT, test_cases TEXT,
+            time_complexity TEXT, space_complexity TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE app_meta (key TEXT PRIMARY KEY, value TEXT);
+    ''')
+    db.close()
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--exercises', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = {'exercises': args.exercises}
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        original = os.path.join(tmp, 'lessons.json')
+        edited = os.path.join(tmp, 'lessons-edited.json')
+        with open(original, 'w') as f:
+            json.dump(synthetic_lessons(args.exercises), f)
+        with open(edited, 'w') as f:
+            json.dump(synthetic_lessons(args.exercises, edited=True), f)
+
+        create_schema(database)
+        writer = DatabaseWriter(database)
+        results['initial_seed_ms'] = best_of(1, lambda: seed_from_file(writer, original))
+
+        results['legacy_ms'] = best_of(args.repeat, lambda: legacy_seed(database, original))
+        results['hash_unchanged_ms'] = best_of(args.repeat, lambda: seed_from_file(writer, original))
+
+        def changed():
+            seed_from_file(writer, edited)
+            seed_from_file(writer, original)
+        results['hash_changed_ms'] = round(best_of(args.repeat, changed) / 2, 2)
+        writer.stop()
+
+    # Full worker boot against the real lesson file (already-seeded database)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+        boot = [sys.executable, '-c', 'import app']
+        subprocess.run(boot, cwd=tmp, env=env, capture_output=True, check=True)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            subprocess.run(boot, cwd=tmp, env=env, capture_output=True, check=True)
+        results['import_app_ms'] = round((time.perf_counter() - started) * 1000 / args.repeat, 2)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Bounded in-process cache for serialized GET responses.
+
+Entries are keyed by endpoint and query arguments and tagged with the
+tables they were built from. Writes invalidate exactly the entries tagged
+with the tables they touched (see TableVersions listeners), and each entry
+also remembers the table versions it was built at, so an entry that raced
+with a write is never served. The versions are shared through the database,
+so that check also catches writes made by other processes, whose
+invalidations reach this cache only later.
+"""
+
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CacheEntry = namedtuple('CacheEntry', ['body', 'mimetype', 'tables', 'versions', 'expires_at'])
+
+
+class ResponseCache:
+    """LRU cache with a TTL, an entry limit and a byte budget"""
+
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024, ttl=300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._bytes = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key, versions):
+        """Return the entry for ``key`` if it is fresh and built at ``versions``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            if entry.versions != versions:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def set(self, key, body, mimetype, tables, versions):
+        """Store a serialized response body built from ``tables`` at ``versions``"""
+        if len(body) > self.max_bytes:
+            return
+        entry = CacheEntry(body, mimetype, tuple(tables), versions,
+                           time.monotonic() + self.ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            for table in entry.tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._stats['stores'] += 1
+
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *tables):
+        """Drop every entry built from any of the given tables"""
+        with self._lock:
+            for table in tables:
+                for key in list(self._by_table.get(table, ())):
+                    self._remove(key)
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['tables'] = {table: len(keys) for table, keys in self._by_table.items()}
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['max_bytes'] = self.max_bytes
+        stats['ttl'] = self.ttl
+        return stats
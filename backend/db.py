@@ -0,0 +1,426 @@
+"""
+SQLite connection management for the DSA Tracker backend.
+
+Connections are expensive to open (file open, schema parse, cold page cache),
+so the API keeps a small pool of them and hands one out per request. The
+database runs in WAL mode: reads go through the pool on any thread, while
+every write is funnelled through a single writer thread so writers never
+contend for the database lock.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+# PRAGMAs applied once to every pooled connection when it is opened
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+def storage_pragmas():
+    """Per-connection storage PRAGMAs, overridable with DB_* environment variables"""
+    return {
+        'synchronous': os.environ.get('DB_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000)),
+        'cache_size': int(os.environ.get('DB_CACHE_SIZE_KB', 16384)) * -1,
+        'mmap_size': int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+
+
+def configure_database(database, journal_mode=None):
+    """Switch the database file to the configured journal mode (WAL by default).
+
+    The journal mode is persistent, so this only needs to run once per file.
+    """
+    journal_mode = journal_mode or os.environ.get('DB_JOURNAL_MODE', 'WAL')
+    conn = sqlite3.connect(database)
+    try:
+        conn.execute(f'PRAGMA busy_timeout = {storage_pragmas()["busy_timeout"]}')
+        return conn.execute(f'PRAGMA journal_mode = {journal_mode}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the pool timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections with per-thread reuse.
+
+    Idle connections are kept on a stack so the most recently used (and
+    therefore warmest) connection is handed out first, and a thread that
+    comes back for a connection gets the one it released last if it is
+    still idle.
+
+    ``attach`` maps schema names to database files that every connection
+    ATTACHes when it opens (e.g. the shared catalog behind a user shard).
+    """
+
+    def __init__(self, database, max_size=8, timeout=5.0, pragmas=None,
+                 health_check_interval=30.0, factory=sqlite3.Connection, attach=None):
+        self.database = database
+        self.factory = factory
+        self.attach = dict(attach or {})
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []          # [(connection, released_at)]
+        self._size = 0           # open connections, idle or checked out
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0,
+            'connect_seconds': 0.0,
+            'health_check_failures': 0,
+        }
+
+    def _connect(self):
+        """Open a new connection with the configured PRAGMAs applied"""
+        started = time.perf_counter()
+        conn = sqlite3.connect(self.database, check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        for schema, path in self.attach.items():
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._stats['connect_seconds'] += elapsed
+        return conn
+
+    def _is_healthy(self, conn, released_at):
+        """Ping connections that have been idle longer than the check interval"""
+        if time.monotonic() - released_at < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _check_fork(self):
+        """Drop connections inherited from a parent process (e.g. pre-fork servers)"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._size = 0
+            self._local = threading.local()
+            self._reset_stats()
+
+    def _take_idle(self):
+        """Pop an idle connection, preferring the one this thread used last"""
+        preferred = getattr(self._local, 'conn', None)
+        for idx in range(len(self._idle) - 1, -1, -1):
+            if self._idle[idx][0] is preferred:
+                return self._idle.pop(idx)
+        return self._idle.pop()
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if there is room"""
+        deadline = None
+        with self._cond:
+            self._check_fork()
+            while True:
+                while self._idle:
+                    conn, released_at = self._take_idle()
+                    if self._is_healthy(conn, released_at):
+                        self._stats['hits'] += 1
+                        self._local.conn = conn
+                        return conn
+                    self._stats['health_check_failures'] += 1
+                    self._size -= 1
+                    _close_quietly(conn)
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._stats['misses'] += 1
+                    break
+
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout
+                    self._stats['waits'] += 1
+                    wait_started = time.perf_counter()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        self._stats['wait_seconds'] += time.perf_counter() - wait_started
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'No database connection available after {self.timeout}s'
+                        )
+
+            if deadline is not None:
+                self._stats['wait_seconds'] += time.perf_counter() - wait_started
+
+        # Open the connection outside the lock so other threads aren't blocked
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding it if it is unusable"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._cond:
+                self._size -= 1
+                self._stats['health_check_failures'] += 1
+                self._cond.notify()
+            _close_quietly(conn)
+            return
+
+        with self._cond:
+            if self._pid != os.getpid():
+                _close_quietly(conn)
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        """Pool counters, including an estimate of the connect time saved by reuse"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['max_size'] = self.max_size
+
+        requests = stats['hits'] + stats['misses']
+        avg_connect = stats['connect_seconds'] / stats['misses'] if stats['misses'] else 0.0
+        stats['hit_ratio'] = round(stats['hits'] / requests, 4) if requests else 0.0
+        stats['avg_connect_ms'] = round(avg_connect * 1000, 3)
+        stats['avg_wait_ms'] = round(
+            stats['wait_seconds'] * 1000 / stats['waits'], 3
+        ) if stats['waits'] else 0.0
+        stats['estimated_saved_ms'] = round(stats['hits'] * avg_connect * 1000, 3)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 6)
+        stats['connect_seconds'] = round(stats['connect_seconds'], 6)
+        return stats
+
+
+WriteResult = namedtuple('WriteResult', ['lastrowid', 'rowcount'])
+
+
+class DatabaseWriter:
+    """Single thread that owns the only writable connection.
+
+    Callers hand it a function taking the connection; the writer drains
+    whatever is queued (up to ``max_batch`` jobs), runs each job inside its
+    own SAVEPOINT and commits the whole batch once. A failing job is rolled
+    back on its own without affecting the others in the batch.
+
+    When other processes write to the same file, pass ``watch_interval``:
+    the writer then checks ``PRAGMA data_version`` (which only changes for
+    commits made by other connections) before each batch and whenever it
+    has been idle that long, and calls ``on_external_change()`` on the
+    writer thread when it moved.
+
+    The writer never attaches other databases: BEGIN IMMEDIATE takes the
+    write lock of every attached file, so a shard writer with the catalog
+    attached would serialize with every other shard's writes.
+    """
+
+    def __init__(self, database, pragmas=None, max_batch=64, timeout=30.0,
+                 factory=sqlite3.Connection, watch_interval=None, on_external_change=None):
+        self.database = database
+        self.factory = factory
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.watch_interval = watch_interval
+        self.on_external_change = on_external_change
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            'jobs': 0,
+            'failed_jobs': 0,
+            'batches': 0,
+            'commit_seconds': 0.0,
+            'external_changes': 0,
+        }
+
+    def _ensure_started(self):
+        """Start the writer thread (again, after a fork) if it isn't running"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run_loop, name='sqlite-writer', daemon=True
+            )
+            self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, isolation_level=None,
+                               check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _run_loop(self):
+        conn = self._connect()
+        jobs = self._queue
+        data_version = self._check_external_changes(conn, None)
+        while True:
+            try:
+                job = jobs.get(timeout=self.watch_interval)
+            except queue.Empty:
+                data_version = self._check_external_changes(conn, data_version)
+                continue
+            if job is None:
+                break
+            data_version = self._check_external_changes(conn, data_version)
+            batch = [job]
+            while len(batch) < self.max_batch:
+                try:
+                    job = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    jobs.put(None)
+                    break
+                batch.append(job)
+            self._run_batch(conn, batch)
+        conn.close()
+
+    def _check_external_changes(self, conn, last):
+        if self.on_external_change is None:
+            return last
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if last is not None and data_version != last:
+            with self._lock:
+                self._stats['external_changes'] += 1
+            try:
+                self.on_external_change()
+            except Exception as e:
+                print(f"Warning: external change callback failed: {e}")
+        return data_version
+
+    def _run_batch(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for future, fn, args in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT job')
+                try:
+                    result = fn(conn, *args)
+                    conn.execute('RELEASE job')
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    outcomes.append((future, None, e))
+            started = time.perf_counter()
+            conn.execute('COMMIT')
+            commit_seconds = time.perf_counter() - started
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['jobs'] += len(outcomes)
+            self._stats['commit_seconds'] += commit_seconds
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                with self._lock:
+                    self._stats['failed_jobs'] += 1
+                future.set_exception(error)
+
+    def submit(self, fn, *args):
+        """Queue ``fn(connection, *args)`` to run on the writer thread"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future
+
+    def run(self, fn, *args):
+        """Run ``fn(connection, *args)`` on the writer thread and return its result"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('DatabaseWriter.run() cannot be nested inside a write job')
+        return self.submit(fn, *args).result(timeout=self.timeout)
+
+    def execute(self, sql, params=()):
+        """Run a single write statement and return its lastrowid and rowcount"""
+        def job(conn):
+            cursor = conn.execute(sql, params)
+            return WriteResult(cursor.lastrowid, cursor.rowcount)
+        return self.run(job)
+
+    def executemany(self, sql, seq_of_params):
+        """Run one statement for every parameter tuple in a single transaction"""
+        def job(conn):
+            cursor = conn.executemany(sql, seq_of_params)
+            return WriteResult(cursor.lastrowid, cursor.rowcount)
+        return self.run(job)
+
+    def stop(self, timeout=10.0):
+        """Finish the queued writes and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None or self._pid != os.getpid():
+                return
+            self._queue.put(None)
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._queue.qsize() if self._queue else 0
+        stats['avg_batch_size'] = round(stats['jobs'] / stats['batches'], 3) if stats['batches'] else 0.0
+        stats['commit_seconds'] = round(stats['commit_seconds'], 6)
+        return stats
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
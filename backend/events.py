@@ -0,0 +1,251 @@
+"""
+In-process pub/sub bus behind the /api/events Server-Sent Events stream.
+
+Mutating endpoints already bump table versions; the bus listens to those
+bumps and publishes one ``change`` event naming the tables, so every write
+reaches subscribers without each handler publishing on its own. Clients
+pull the changed rows from /api/sync. An event carries the ``origin`` of
+the write (the X-Client-Id of the request that made it, if any), so a
+client can skip its own writes.
+
+Subscribers cost a small bounded queue each. A subscriber that falls more
+than ``queue_size`` events behind has its backlog replaced by a single
+``resync`` event instead of growing without bound. Recent events are kept
+in a replay buffer, so a client that reconnects with Last-Event-ID
+receives what it missed.
+
+How a subscriber waits depends on the server. The Flask view blocks its
+thread in ``take()`` between events, waking every ``heartbeat`` seconds to
+send a keep-alive comment, so under WSGI each open stream holds a thread
+(serve.py caps them). asgi.py sets a ``wake`` callback instead, called
+whenever the subscriber has something to take, and waits on an asyncio
+event, so an idle stream there costs no thread.
+
+Events can be published to a ``scope`` (a user id, with per-user shards):
+they only reach subscribers in that scope, while unscoped events reach
+everyone.
+"""
+
+import itertools
+import json
+import os
+import signal
+import threading
+import time
+from collections import deque, namedtuple
+
+Event = namedtuple('Event', ['id', 'type', 'data'])
+
+# How long browsers wait before reconnecting a dropped stream
+RETRY_MS = 3000
+
+
+class TooManySubscribers(Exception):
+    """Raised when the bus is at its subscriber limit"""
+
+
+class Subscriber:
+    def __init__(self, bus, queue_size, scope=None):
+        self._bus = bus
+        self.scope = scope
+        self._queue = deque()
+        self._queue_size = queue_size
+        self.overflowed = False
+        self.wake = None
+
+    def _push(self, event):
+        """Called with the bus lock held"""
+        if self.overflowed:
+            return
+        if len(self._queue) >= self._queue_size:
+            self._queue.clear()
+            self.overflowed = True
+        else:
+            self._queue.append(event)
+        if self.wake is not None:
+            self.wake()
+
+    def take(self, timeout):
+        """Wait up to ``timeout`` for events; returns them (empty on timeout)"""
+        with self._bus._changed:
+            if not self._queue and not self.overflowed:
+                self._bus._changed.wait_for(
+                    lambda: self._queue or self.overflowed or self._bus.closed, timeout
+                )
+            if self.overflowed:
+                self.overflowed = False
+                self._bus._stats['overflows'] += 1
+                return [Event(self._bus.last_id, 'resync', {})]
+            events = list(self._queue)
+            self._queue.clear()
+            return events
+
+
+class EventBus:
+    """Fan-out of published events to bounded per-subscriber queues"""
+
+    def __init__(self, max_subscribers=1000, queue_size=64, replay_size=256):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.closed = False
+
+        self._changed = threading.Condition()
+        self._subscribers = set()
+        self._replay = deque(maxlen=replay_size)  # (scope, event)
+        self._ids = itertools.count(1)
+        self.last_id = 0
+        self._stats = {
+            'published': 0,
+            'delivered': 0,
+            'overflows': 0,
+            'rejected': 0,
+            'subscribed': 0,
+        }
+
+    def publish(self, event_type, data, scope=None):
+        with self._changed:
+            self.last_id = next(self._ids)
+            event = Event(self.last_id, event_type, data)
+            self._replay.append((scope, event))
+            delivered = 0
+            for subscriber in self._subscribers:
+                if scope is None or subscriber.scope == scope:
+                    subscriber._push(event)
+                    delivered += 1
+            self._stats['published'] += 1
+            self._stats['delivered'] += delivered
+            self._changed.notify_all()
+
+    def subscribe(self, last_event_id=None, scope=None):
+        """Register a subscriber, queueing events after ``last_event_id``.
+
+        If that id has already left the replay buffer, the subscriber starts
+        with a ``resync`` event.
+        """
+        subscriber = Subscriber(self, self.queue_size, scope)
+        with self._changed:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._stats['rejected'] += 1
+                raise TooManySubscribers('Too many event subscribers')
+            if last_event_id is not None and last_event_id > self.last_id:
+                # An id from before a restart: nothing to replay from
+                subscriber.overflowed = True
+            elif last_event_id is not None and last_event_id < self.last_id:
+                oldest = self._replay[0][1].id if self._replay else self.last_id + 1
+                if last_event_id + 1 < oldest:
+                    subscriber.overflowed = True
+                else:
+                    for event_scope, event in self._replay:
+                        if event.id > last_event_id and event_scope in (None, scope):
+                            subscriber._push(event)
+            self._subscribers.add(subscriber)
+            self._stats['subscribed'] += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._changed:
+            self._subscribers.discard(subscriber)
+
+    def close(self):
+        """Wake every subscriber so its stream can end (at shutdown)"""
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+            for subscriber in self._subscribers:
+                if subscriber.wake is not None:
+                    subscriber.wake()
+
+    def install_signal_handler(self, signum=signal.SIGTERM):
+        """Close the bus as soon as the process receives ``signum``.
+
+        Open streams end right away instead of holding the server's
+        graceful shutdown until it times out. Only possible from the main
+        thread; elsewhere this is a no-op.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signum)
+
+        def handler(received, frame):
+            self.close()
+            if callable(previous):
+                previous(received, frame)
+            else:
+                signal.signal(received, previous or signal.SIG_DFL)
+                os.kill(os.getpid(), received)
+
+        signal.signal(signum, handler)
+
+    def table_listener(self, versions, scope=None, origin=None):
+        """TableVersions listener that publishes a ``change`` event per bump.
+
+        ``origin()``, if given, names the writer for the event's ``origin``;
+        changes announced by ``versions.refresh()`` have no known writer.
+        """
+        def listener(*tables):
+            known = origin is not None and not versions.refreshing
+            self.publish('change', {
+                'tables': list(tables),
+                'versions': {table: versions.get(table) for table in tables},
+                'origin': origin() if known else None,
+            }, scope)
+        return listener
+
+    def stats(self):
+        with self._changed:
+            stats = dict(self._stats)
+            stats['subscribers'] = len(self._subscribers)
+            stats['last_event_id'] = self.last_id
+            stats['replay_events'] = len(self._replay)
+        stats['max_subscribers'] = self.max_subscribers
+        stats['queue_size'] = self.queue_size
+        return stats
+
+
+def parse_event_id(value):
+    """Last-Event-ID header (or query parameter) as an int, or None"""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def retry_message(retry_ms):
+    return f'retry: {retry_ms}\n\n'
+
+
+def ping_message():
+    return f': ping {int(time.time())}\n\n'
+
+
+def format_events(events):
+    return ''.join(
+        f'id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n'
+        for event in events
+    )
+
+
+class EventStream:
+    """SSE response body for one subscriber.
+
+    The WSGI server calls close() when the client goes away or the response
+    is discarded, which unsubscribes even if iteration never started.
+    """
+
+    def __init__(self, bus, subscriber, heartbeat=15.0, retry_ms=RETRY_MS):
+        self.bus = bus
+        self.subscriber = subscriber
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+
+    def __iter__(self):
+        try:
+            yield retry_message(self.retry_ms)
+            while not self.bus.closed:
+                events = self.subscriber.take(self.heartbeat)
+                yield format_events(events) if events else ping_message()
+        finally:
+            self.close()
+
+    def close(self):
+        self.bus.unsubscribe(self.subscriber)
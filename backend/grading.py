@@ -0,0 +1,264 @@
+"""
+Grading queue in front of the test runner.
+
+Submissions are keyed by (problem_id, sha256(code), sha256(test_cases)):
+
+- a key with a cached verdict is answered from an LRU without running;
+  verdicts where the code hit the runner's per-test time budget are never
+  cached, since whether it does depends on how loaded the machine was
+- a key already queued or running joins that run instead of adding another
+- everything else waits in a per-problem queue; dispatcher threads (one
+  per runner worker) take up to ``max_batch`` submissions for one problem
+  at a time and send them to a single worker as one batch
+
+Test fixtures are loaded from the database once per problem and kept until
+the problems table changes, so a burst of submissions for one exercise
+reads and parses its test cases once.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+from runner import RunnerError
+
+Fixture = namedtuple('Fixture', ['problem_id', 'test_cases', 'digest'])
+
+_Job = namedtuple('_Job', ['key', 'code', 'fixture', 'future', 'enqueued_at'])
+
+# The error runner_worker.js reports when a step runs past the time budget
+TIMED_OUT = 'Timed out'
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _timed_out(verdict):
+    return verdict.get('error') == TIMED_OUT or any(
+        result.get('error') == TIMED_OUT for result in verdict.get('results', ())
+    )
+
+
+class GradingQueue:
+    """Deduplicating, caching, per-problem batching queue for runner jobs"""
+
+    def __init__(self, runner, load_test_cases, cache_size=1024, max_batch=16,
+                 result_timeout=120.0):
+        self.runner = runner
+        self.load_test_cases = load_test_cases
+        self.cache_size = cache_size
+        self.max_batch = max_batch
+        self.result_timeout = result_timeout
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._fixtures = {}
+        self._fixtures_generation = 0
+        self._verdicts = OrderedDict()
+        self._inflight = {}
+        self._pending = OrderedDict()
+        self._depth = 0
+        self._pid = None
+        self._stats = {
+            'submissions': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'cache_evictions': 0,
+            'deduplicated': 0,
+            'batches': 0,
+            'batched_jobs': 0,
+            'batch_retries': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'fixture_loads': 0,
+            'uncached_timeouts': 0,
+        }
+
+    # ---- fixtures ----
+
+    def fixture(self, problem_id):
+        """The problem's parsed test cases, or None if the problem doesn't exist"""
+        with self._lock:
+            fixture = self._fixtures.get(problem_id)
+            generation = self._fixtures_generation
+        if fixture is not None:
+            return fixture
+
+        text = self.load_test_cases(problem_id)
+        if text is None:
+            return None
+        fixture = Fixture(problem_id, json.loads(text) if text else [], _sha256(text or ''))
+        with self._lock:
+            self._stats['fixture_loads'] += 1
+            # Don't keep a fixture read before a concurrent change to problems
+            if generation == self._fixtures_generation:
+                self._fixtures[problem_id] = fixture
+        return fixture
+
+    def invalidate(self, *tables):
+        """TableVersions listener: drop fixtures when problems change"""
+        if 'problems' in tables:
+            with self._lock:
+                self._fixtures.clear()
+                self._fixtures_generation += 1
+
+    # ---- submissions ----
+
+    def grade(self, fixture, code):
+        """Grade ``code`` against ``fixture`` and return the runner's result dict.
+
+        The result also says whether it came from the verdict cache and how
+        long the submission waited in the queue.
+        """
+        key = (fixture.problem_id, _sha256(code), fixture.digest)
+        started = time.perf_counter()
+        with self._lock:
+            self._stats['submissions'] += 1
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+                self._stats['cache_hits'] += 1
+                return {**verdict, 'cached': True, 'queued_ms': 0.0}
+
+            self._stats['cache_misses'] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats['deduplicated'] += 1
+            else:
+                future = Future()
+                self._inflight[key] = future
+                group = (fixture.problem_id, fixture.digest)
+                self._pending.setdefault(group, []).append(
+                    _Job(key, code, fixture, future, started)
+                )
+                self._depth += 1
+                self._ready.notify()
+        self._ensure_started()
+
+        result, queued = future.result(timeout=self.result_timeout)
+        return {**result, 'cached': False, 'queued_ms': round(queued * 1000, 3)}
+
+    # ---- dispatch ----
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        for index in range(self.runner.size):
+            threading.Thread(
+                target=self._dispatch_loop, name=f'grading-{index}', daemon=True
+            ).start()
+
+    def _next_batch(self):
+        """Block until work is pending, then take one problem's oldest jobs"""
+        with self._ready:
+            while not self._pending:
+                self._ready.wait()
+            group, jobs = next(iter(self._pending.items()))
+            batch, rest = jobs[:self.max_batch], jobs[self.max_batch:]
+            del self._pending[group]
+            if rest:
+                # Back of the line, so one busy problem can't starve the others
+                self._pending[group] = rest
+            self._depth -= len(batch)
+
+            now = time.perf_counter()
+            waits = [now - job.enqueued_at for job in batch]
+            self._stats['batches'] += 1
+            self._stats['batched_jobs'] += len(batch)
+            self._stats['wait_seconds'] += sum(waits)
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], *waits)
+        return batch, waits
+
+    def _dispatch_loop(self):
+        while True:
+            batch, waits = self._next_batch()
+            try:
+                outcomes = self._run(batch)
+            except Exception as e:  # runner unavailable: fail the whole batch
+                outcomes = [e] * len(batch)
+            self._finish(batch, waits, outcomes)
+
+    def _run(self, batch):
+        """Run a batch, isolating submissions if the batch as a whole fails.
+
+        A submission that crashes its worker (e.g. by exhausting memory)
+        would otherwise take the rest of its batch down with it.
+        """
+        test_cases = batch[0].fixture.test_cases
+        try:
+            return self.runner.run_batch([job.code for job in batch], test_cases)
+        except RunnerError as e:
+            if len(batch) == 1:
+                return [e]
+
+        with self._lock:
+            self._stats['batch_retries'] += 1
+        outcomes = []
+        for job in batch:
+            try:
+                outcomes.append(self.runner.run(job.code, test_cases))
+            except RunnerError as e:
+                outcomes.append(e)
+        return outcomes
+
+    def _finish(self, batch, waits, outcomes):
+        for job, queued, outcome in zip(batch, waits, outcomes):
+            with self._lock:
+                self._inflight.pop(job.key, None)
+                if isinstance(outcome, RunnerError):
+                    # Crashes and deadlines can depend on load; never cached
+                    outcome = {'ok': False, 'passed': False, 'error': str(outcome), 'results': []}
+                elif not isinstance(outcome, Exception):
+                    if _timed_out(outcome):
+                        # Graded again next time, against the same fixed budget
+                        self._stats['uncached_timeouts'] += 1
+                    else:
+                        self._remember(job.key, outcome)
+
+            if isinstance(outcome, Exception):
+                job.future.set_exception(outcome)
+            else:
+                job.future.set_result((outcome, queued))
+
+    def _remember(self, key, verdict):
+        self._verdicts[key] = verdict
+        self._verdicts.move_to_end(key)
+        while len(self._verdicts) > self.cache_size:
+            self._verdicts.popitem(last=False)
+            self._stats['cache_evictions'] += 1
+
+    # ---- metrics ----
+
+    def clear_cache(self):
+        with self._lock:
+            self._verdicts.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._depth
+            stats['pending_problems'] = len(self._pending)
+            stats['inflight'] = len(self._inflight)
+            stats['cache_entries'] = len(self._verdicts)
+            stats['cached_fixtures'] = len(self._fixtures)
+        lookups = stats['cache_hits'] + stats['cache_misses']
+        stats['cache_hit_ratio'] = round(stats['cache_hits'] / lookups, 4) if lookups else 0.0
+        stats['avg_batch_size'] = (
+            round(stats['batched_jobs'] / stats['batches'], 2) if stats['batches'] else 0.0
+        )
+        stats['avg_wait_ms'] = (
+            round(stats['wait_seconds'] / stats['batched_jobs'] * 1000, 3)
+            if stats['batched_jobs'] else 0.0
+        )
+        stats['max_wait_ms'] = round(stats.pop('max_wait_seconds') * 1000, 3)
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        stats['cache_size'] = self.cache_size
+        stats['max_batch'] = self.max_batch
+        return stats
@@ -0,0 +1,144 @@
+"""
+Compressed, content-addressed history of saved code attempts.
+
+Every progress flush that changes a problem's code appends a version to
+attempt_history pointing at a blob in code_blobs, keyed by the SHA-256 of
+the code, so identical code (an undo, or the same snippet saved twice) is
+stored once. A blob is zlib-compressed with the previous version of the
+problem's code as a preset dictionary: consecutive attempts share most of
+their text, so the delta only encodes what changed. Decoding a delta needs
+its base, so chains are capped at MAX_CHAIN_DEPTH and a full snapshot is
+stored whenever the delta wouldn't be smaller.
+
+Blobs may be the base of other blobs, so they are kept when history rows
+are deleted.
+"""
+
+import hashlib
+import zlib
+
+ZLIB_LEVEL = 9
+MAX_CHAIN_DEPTH = 16
+
+DEFAULT_HISTORY_LIMIT = 50
+MAX_HISTORY_LIMIT = 500
+
+
+def code_hash(code):
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def _compress(data, base=None):
+    if base is None:
+        return zlib.compress(data, ZLIB_LEVEL)
+    compressor = zlib.compressobj(ZLIB_LEVEL, zdict=base)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(data, base=None):
+    if base is None:
+        return zlib.decompress(data)
+    decompressor = zlib.decompressobj(zdict=base)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def load_code(db, blob_hash):
+    """Decode a blob by walking its delta chain back to a full snapshot"""
+    chain = []
+    next_hash = blob_hash
+    while next_hash is not None:
+        row = db.execute(
+            'SELECT base_hash, data FROM code_blobs WHERE hash = ?', (next_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        chain.append(row['data'])
+        next_hash = row['base_hash']
+
+    data = None
+    for stored in reversed(chain):
+        data = _decompress(stored, data)
+    return data.decode('utf-8')
+
+
+def store_code(db, code, base_hash=None, base_code=None):
+    """Store ``code`` (as a delta against the base when that pays off); returns its hash"""
+    blob_hash = code_hash(code)
+    if db.execute('SELECT 1 FROM code_blobs WHERE hash = ?', (blob_hash,)).fetchone():
+        return blob_hash
+
+    data = code.encode('utf-8')
+    stored, depth, base = _compress(data), 0, None
+    if base_code is not None:
+        base_depth = db.execute(
+            'SELECT depth FROM code_blobs WHERE hash = ?', (base_hash,)
+        ).fetchone()
+        if base_depth is not None and base_depth[0] < MAX_CHAIN_DEPTH:
+            delta = _compress(data, base_code.encode('utf-8'))
+            if len(delta) < len(stored):
+                stored, depth, base = delta, base_depth[0] + 1, base_hash
+
+    db.execute('''
+        INSERT INTO code_blobs (hash, base_hash, depth, size, data)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (blob_hash, base, depth, len(data), stored))
+    return blob_hash
+
+
+def record_attempts(db, rows):
+    """Append a version for every progress row whose code changed.
+
+    Takes the rows of a progress flush (problem_id followed by
+    writebehind.PROGRESS_FIELDS) and runs in the same writer job.
+    """
+    for problem_id, user_code, completed, completed_at, last_attempted in rows:
+        if user_code is None:
+            continue
+        latest = db.execute('''
+            SELECT version, blob_hash FROM attempt_history
+            WHERE problem_id = ?
+            ORDER BY version DESC
+            LIMIT 1
+        ''', (problem_id,)).fetchone()
+        if latest is not None and latest['blob_hash'] == code_hash(user_code):
+            continue
+
+        base_hash = latest['blob_hash'] if latest else None
+        base_code = load_code(db, base_hash) if base_hash else None
+        blob_hash = store_code(db, user_code, base_hash, base_code)
+        db.execute('''
+            INSERT INTO attempt_history (problem_id, version, blob_hash, completed, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (problem_id, latest['version'] + 1 if latest else 1, blob_hash,
+              completed, last_attempted))
+
+
+def list_versions(db, problem_id, limit=DEFAULT_HISTORY_LIMIT, before=None):
+    """Version metadata, newest first, without decoding any code"""
+    params = [problem_id]
+    where = 'h.problem_id = ?'
+    if before is not None:
+        where += ' AND h.version < ?'
+        params.append(before)
+    rows = db.execute(f'''
+        SELECT h.version, h.created_at, h.completed, h.blob_hash AS hash,
+               b.size, length(b.data) AS stored_size
+        FROM attempt_history h
+        JOIN code_blobs b ON b.hash = h.blob_hash
+        WHERE {where}
+        ORDER BY h.version DESC
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_version(db, problem_id, version):
+    """One version with its decoded code, or None"""
+    row = db.execute('''
+        SELECT version, created_at, completed, blob_hash AS hash
+        FROM attempt_history
+        WHERE problem_id = ? AND version = ?
+    ''', (problem_id, version)).fetchone()
+    if row is None:
+        return None
+    return {**dict(row), 'code': load_code(db, row['hash'])}
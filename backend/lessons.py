@@ -0,0 +1,179 @@
+"""
+Lesson content served from a precompiled, memory-mapped index file.
+
+``compile_index`` turns lesson-data.json into one binary file:
+
+    header | lesson bodies | lesson ids | summaries | directory
+
+Each body is the lesson's compact JSON (plus its category), ready to send
+as is. The directory is a fixed-width array of entries sorted by lesson id,
+so a lookup is a binary search over the mapped file. Nothing is parsed
+when the index is opened, and only the pages a request touches are read, so
+startup time and memory don't grow with the number of lessons. Every body
+and the summaries carry a content hash used as a strong ETag.
+
+The file is rewritten (atomically, via rename) when the lesson file's hash
+changes. Readers notice the new file by its inode and remap it.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+from serialization import dumps
+
+MAGIC = b'SVLI'
+FORMAT_VERSION = 1
+
+# magic, format version, source sha256, lesson count, directory offset,
+# summaries offset, summaries length, summaries etag
+HEADER = struct.Struct('<4sI32sIQQQ16s')
+# id offset, id length, body offset, body length, body etag
+ENTRY = struct.Struct('<QIQI16s')
+
+SUMMARY_FIELDS = ('id', 'title', 'difficulty', 'timeComplexity', 'spaceComplexity', 'dataStructures')
+
+
+class LessonIndexError(Exception):
+    """Raised when the index file is missing or not a lesson index"""
+
+
+def _etag(data):
+    return hashlib.sha256(data).digest()[:16]
+
+
+def summary(category, lesson):
+    """The list view of a lesson: its headline fields and exercise id"""
+    item = {'category': category}
+    item.update((field, lesson[field]) for field in SUMMARY_FIELDS if field in lesson)
+    item['exerciseId'] = f"{lesson['id']}-exercise" if 'exercise' in lesson else None
+    return item
+
+
+def source_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def compile_index(lesson_data, digest, path):
+    """Write the index for ``lesson_data`` (parsed lesson-data.json) to ``path``.
+
+    Summaries keep the file's category and lesson order; the directory is
+    sorted by id. Returns the number of lessons.
+    """
+    bodies = []
+    summaries = {}
+    for category, lessons in lesson_data.items():
+        summaries[category] = []
+        for lesson in lessons:
+            bodies.append((lesson['id'].encode('utf-8'), dumps({**lesson, 'category': category})))
+            summaries[category].append(summary(category, lesson))
+    bodies.sort(key=lambda item: item[0])
+    summaries = dumps(summaries)
+
+    offset = HEADER.size
+    body_offsets = []
+    for _, body in bodies:
+        body_offsets.append(offset)
+        offset += len(body)
+    id_offsets = []
+    for lesson_id, _ in bodies:
+        id_offsets.append(offset)
+        offset += len(lesson_id)
+    summaries_offset = offset
+    directory_offset = summaries_offset + len(summaries)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, digest, len(bodies), directory_offset,
+                            summaries_offset, len(summaries), _etag(summaries)))
+        for _, body in bodies:
+            f.write(body)
+        for lesson_id, _ in bodies:
+            f.write(lesson_id)
+        f.write(summaries)
+        for (lesson_id, body), id_offset, body_offset in zip(bodies, id_offsets, body_offsets):
+            f.write(ENTRY.pack(id_offset, len(lesson_id), body_offset, len(body), _etag(body)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(bodies)
+
+
+class _Mapping:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.digest, self.count, self.directory_offset,
+         self.summaries_offset, self.summaries_length, self.summaries_etag) = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise LessonIndexError(f'{path} is not a lesson index (version {FORMAT_VERSION})')
+
+    def entry(self, index):
+        return ENTRY.unpack_from(self.data, self.directory_offset + index * ENTRY.size)
+
+    def find(self, lesson_id):
+        key = lesson_id.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            id_offset, id_length, body_offset, body_length, etag = self.entry(mid)
+            found = self.data[id_offset:id_offset + id_length]
+            if found == key:
+                return self.data[body_offset:body_offset + body_length], etag.hex()
+            if found < key:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+
+class LessonIndex:
+    """Read access to a compiled index; remaps the file after it is replaced"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapping = None
+
+    def _current(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            raise LessonIndexError('Lesson index has not been compiled') from None
+        mapping = self._mapping
+        if mapping is None or (mapping.stat.st_ino, mapping.stat.st_mtime_ns) != (stat.st_ino, stat.st_mtime_ns):
+            with self._lock:
+                # The replaced mapping is left to the garbage collector, since
+                # another thread may still be slicing it
+                mapping = self._mapping = _Mapping(self.path)
+        return mapping
+
+    def is_current(self, digest):
+        """Whether the compiled index was built from a file with this sha256"""
+        try:
+            return self._current().digest == digest
+        except LessonIndexError:
+            return False
+
+    def summaries(self):
+        """(JSON bytes, etag) of every lesson's summary, grouped by category"""
+        mapping = self._current()
+        start = mapping.summaries_offset
+        return mapping.data[start:start + mapping.summaries_length], mapping.summaries_etag.hex()
+
+    def lesson(self, lesson_id):
+        """(JSON bytes, etag) of one lesson, or None"""
+        return self._current().find(lesson_id)
+
+    def stats(self):
+        mapping = self._current()
+        return {
+            'path': self.path,
+            'lessons': mapping.count,
+            'bytes': mapping.stat.st_size,
+            'source_sha256': mapping.digest.hex(),
+        }
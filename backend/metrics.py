@@ -0,0 +1,328 @@
+"""
+Request, SQL and serialization instrumentation, exported as Prometheus text.
+
+app.py opens a RequestStats when a request starts and closes it after the
+handler. While it is open:
+
+- every statement run through a traced connection (``connection_factory``)
+  adds to its SQL count and time, measured around execute and the fetch
+  calls. Statements on threads with no open request (the writer, the
+  progress flush) are counted under the ``(background)`` endpoint
+- every JSON encode through the timed provider or a ``timed`` encoder adds
+  to its serialization time
+
+Latency goes into one fixed-bucket histogram per route. Requests slower
+than ``slow_request_seconds`` are logged along with their slowest
+statements, and ``EXPLAIN QUERY PLAN`` output for each of them.
+"""
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask.json.provider import DefaultJSONProvider
+
+PREFIX = 'dsa_tracker'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+BACKGROUND = '(background)'
+
+SLOW_STATEMENTS_LOGGED = 3
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (guarded by the Metrics lock)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestStats:
+    __slots__ = ('endpoint', 'method', 'started', 'status', 'sql_count', 'sql_seconds',
+                 'serialization_seconds', 'statements')
+
+    def __init__(self, endpoint, method):
+        self.endpoint = endpoint
+        self.method = method
+        self.started = time.perf_counter()
+        self.status = 500
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.statements = []
+
+
+class _Totals:
+    __slots__ = ('sql_count', 'sql_seconds', 'serialization_seconds', 'slow')
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.slow = 0
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class Metrics:
+    """Process-wide request/SQL/serialization metrics"""
+
+    def __init__(self, slow_request_seconds=None, max_statements=50, log=print):
+        self.slow_request_seconds = slow_request_seconds
+        self.max_statements = max_statements
+        self.log = log
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._requests = {}      # (method, endpoint, status) -> count
+        self._latency = {}       # (method, endpoint) -> Histogram
+        self._totals = {}        # endpoint -> _Totals
+
+    # ---- per-request state ----
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        """The innermost open request on this thread (batched sub-requests nest)"""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    def begin(self, endpoint, method):
+        stats = RequestStats(endpoint, method)
+        self._stack().append(stats)
+        return stats
+
+    def end(self):
+        """Close the innermost request and fold it into the totals"""
+        stack = self._stack()
+        if not stack:
+            return None
+        stats = stack.pop()
+        elapsed = time.perf_counter() - stats.started
+        with self._lock:
+            key = (stats.method, stats.endpoint, stats.status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._latency.get((stats.method, stats.endpoint))
+            if histogram is None:
+                histogram = self._latency[stats.method, stats.endpoint] = Histogram()
+            histogram.observe(elapsed)
+            totals = self._totals_for(stats.endpoint)
+            totals.sql_count += stats.sql_count
+            totals.sql_seconds += stats.sql_seconds
+            totals.serialization_seconds += stats.serialization_seconds
+            slow = self.is_slow(elapsed)
+            if slow:
+                totals.slow += 1
+        return stats, elapsed, slow
+
+    def is_slow(self, elapsed):
+        return self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds
+
+    def _totals_for(self, endpoint):
+        totals = self._totals.get(endpoint)
+        if totals is None:
+            totals = self._totals[endpoint] = _Totals()
+        return totals
+
+    # ---- SQL ----
+
+    def record_sql(self, sql, params, seconds):
+        stats = self.current()
+        if stats is None:
+            with self._lock:
+                totals = self._totals_for(BACKGROUND)
+                totals.sql_count += 1
+                totals.sql_seconds += seconds
+            return
+        stats.sql_count += 1
+        stats.sql_seconds += seconds
+        if self.slow_request_seconds is not None and len(stats.statements) < self.max_statements:
+            stats.statements.append((seconds, sql, params))
+
+    def connection_factory(self):
+        """sqlite3 connection class whose statements are timed into these metrics"""
+        metrics = self
+
+        class TracedCursor(sqlite3.Cursor):
+            def execute(self, sql, parameters=()):
+                started = time.perf_counter()
+                try:
+                    return super().execute(sql, parameters)
+                finally:
+                    metrics.record_sql(sql, parameters, time.perf_counter() - started)
+
+            def executemany(self, sql, seq_of_parameters):
+                started = time.perf_counter()
+                try:
+                    return super().executemany(sql, seq_of_parameters)
+                finally:
+                    metrics.record_sql(sql, None, time.perf_counter() - started)
+
+            def _timed_fetch(self, fetch, *args):
+                started = time.perf_counter()
+                try:
+                    return fetch(*args)
+                finally:
+                    stats = metrics.current()
+                    if stats is not None:
+                        stats.sql_seconds += time.perf_counter() - started
+
+            def fetchone(self):
+                return self._timed_fetch(super().fetchone)
+
+            def fetchmany(self, size=None):
+                return self._timed_fetch(super().fetchmany, *(() if size is None else (size,)))
+
+            def fetchall(self):
+                return self._timed_fetch(super().fetchall)
+
+        class TracedConnection(sqlite3.Connection):
+            def cursor(self, factory=TracedCursor):
+                return super().cursor(factory)
+
+            def execute(self, sql, parameters=()):
+                return self.cursor().execute(sql, parameters)
+
+            def executemany(self, sql, seq_of_parameters):
+                return self.cursor().executemany(sql, seq_of_parameters)
+
+        return TracedConnection
+
+    def explain(self, db, statements):
+        """EXPLAIN QUERY PLAN lines for the slowest of ``statements``"""
+        report = []
+        for seconds, sql, params in sorted(statements, key=lambda s: s[0], reverse=True)[:SLOW_STATEMENTS_LOGGED]:
+            try:
+                # The base class method, so the EXPLAIN itself isn't traced
+                rows = sqlite3.Connection.execute(db, f'EXPLAIN QUERY PLAN {sql}', params or ()).fetchall()
+                plan = [row[3] for row in rows]
+            except sqlite3.Error as e:
+                plan = [f'(no plan: {e})']
+            report.append((seconds, ' '.join(sql.split()), plan))
+        return report
+
+    def log_slow(self, stats, elapsed, path, db=None):
+        lines = [
+            f"Slow request: {stats.method} {path} -> {stats.status} in {elapsed * 1000:.1f}ms "
+            f"({stats.sql_count} SQL statements, {stats.sql_seconds * 1000:.1f}ms SQL, "
+            f"{stats.serialization_seconds * 1000:.1f}ms serialization)"
+        ]
+        if db is not None and stats.statements:
+            for seconds, sql, plan in self.explain(db, stats.statements):
+                lines.append(f"  {seconds * 1000:.2f}ms {sql}")
+                lines.extend(f"    {step}" for step in plan)
+        self.log('\n'.join(lines))
+
+    # ---- serialization ----
+
+    def add_serialization(self, seconds):
+        stats = self.current()
+        if stats is not None:
+            stats.serialization_seconds += seconds
+
+    def timed(self, encode):
+        """Wrap an encoder so its time counts as the request's serialization time"""
+        @wraps(encode)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return encode(*args, **kwargs)
+            finally:
+                self.add_serialization(time.perf_counter() - started)
+        return wrapper
+
+    # ---- export ----
+
+    def render(self, gauges=None):
+        """Prometheus text exposition of everything recorded, plus ``gauges``.
+
+        ``gauges`` maps a component name to a stats dict; its numeric values
+        are exported as ``<prefix>_<component>_<key>``.
+        """
+        with self._lock:
+            requests = dict(self._requests)
+            latency = {key: (list(h.cumulative()), h.sum) for key, h in self._latency.items()}
+            totals = {
+                endpoint: (t.sql_count, t.sql_seconds, t.serialization_seconds, t.slow)
+                for endpoint, t in self._totals.items()
+            }
+
+        lines = [
+            f'# HELP {PREFIX}_http_requests_total Requests handled, by route and status.',
+            f'# TYPE {PREFIX}_http_requests_total counter',
+        ]
+        for (method, endpoint, status), count in sorted(requests.items()):
+            lines.append(f'{PREFIX}_http_requests_total'
+                         f'{_labels(method=method, endpoint=endpoint, status=status)} {count}')
+
+        lines += [
+            f'# HELP {PREFIX}_http_request_duration_seconds Time to produce a response.',
+            f'# TYPE {PREFIX}_http_request_duration_seconds histogram',
+        ]
+        for (method, endpoint), (buckets, total) in sorted(latency.items()):
+            for bound, count in buckets:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{PREFIX}_http_request_duration_seconds_bucket'
+                             f'{_labels(method=method, endpoint=endpoint, le=le)} {count}')
+            labels = _labels(method=method, endpoint=endpoint)
+            lines.append(f'{PREFIX}_http_request_duration_seconds_sum{labels} {total:.6f}')
+            lines.append(f'{PREFIX}_http_request_duration_seconds_count{labels} {buckets[-1][1]}')
+
+        for index, (name, kind, help_text) in enumerate((
+            ('sql_statements_total', 'counter', 'SQL statements executed.'),
+            ('sql_seconds_total', 'counter', 'Time spent executing SQL and fetching rows.'),
+            ('serialization_seconds_total', 'counter', 'Time spent encoding JSON responses.'),
+            ('slow_requests_total', 'counter', 'Requests over the slow request threshold.'),
+        )):
+            lines += [f'# HELP {PREFIX}_{name} {help_text}', f'# TYPE {PREFIX}_{name} {kind}']
+            for endpoint, values in sorted(totals.items()):
+                value = values[index]
+                value = f'{value:.6f}' if isinstance(value, float) else value
+                lines.append(f'{PREFIX}_{name}{_labels(endpoint=endpoint)} {value}')
+
+        for component, stats in (gauges or {}).items():
+            for key, value in sorted(stats.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{PREFIX}_{component}_{key}'
+                lines += [f'# TYPE {name} gauge', f'{name} {value}']
+
+        return '\n'.join(lines) + '\n'
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that reports jsonify() encoding time to Metrics"""
+
+    def __init__(self, app, metrics):
+        super().__init__(app)
+        self.metrics = metrics
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            self.metrics.add_serialization(time.perf_counter() - started)
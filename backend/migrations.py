@@ -0,0 +1,728 @@
+"""
+Schema migrations for the DSA Tracker database.
+
+Each migration runs once, in order, on the writer connection. The number of
+applied migrations is stored in SQLite's ``PRAGMA user_version``.
+
+User shards (see tenants.py) have their own, shorter list: the same user
+tables, indexes and triggers, minus everything that involves the problems
+catalog. A persistent trigger can't reach into another database, so shard
+triggers never look at problems; the few things that need both are
+worked out at read time against the attached catalog instead.
+"""
+
+import hashlib
+import zlib
+
+# Tables that stay in the shared catalog when users have their own shards
+CATALOG_TABLES = ('problems',)
+
+
+def add_progress_unique_and_indexes(db):
+    """One progress row per problem, plus indexes for the problem list joins"""
+    # Keep the most recently attempted row for problems that have duplicates
+    db.execute('''
+        DELETE FROM user_progress
+        WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY problem_id
+                    ORDER BY last_attempted DESC, id DESC
+                ) AS rn
+                FROM user_progress
+            )
+            WHERE rn = 1
+        )
+    ''')
+    db.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_user_progress_problem_id ON user_progress(problem_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_problems_created_at ON problems(created_at)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_problems_category ON problems(category)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_problems_lesson_id ON problems(lesson_id)')
+
+
+def add_problems_keyset_index(db):
+    """Cover the (created_at, id) ordering used by keyset pagination"""
+    db.execute('DROP INDEX IF EXISTS idx_problems_created_at')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_problems_created_at_id ON problems(created_at, id)')
+    # Category is the common list filter, so let it page without a sort step too
+    db.execute('DROP INDEX IF EXISTS idx_problems_category')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_problems_category_created_at_id ON problems(category, created_at, id)')
+
+
+def compact_test_cases(db):
+    """Minify stored test_cases JSON, which is now served without re-encoding"""
+    db.execute('UPDATE problems SET test_cases = json(test_cases) WHERE json_valid(test_cases)')
+
+
+def add_app_meta(db):
+    """Key/value table for bookkeeping such as the seeded lesson file hash"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+
+# FTS5 index name -> (content table, rowid column, indexed columns)
+SEARCH_INDEXES = {
+    'notes_fts': ('notes', 'id', ('note_title', 'note_content', 'tags')),
+    'problems_fts': ('problems', 'rowid', ('title', 'description')),
+    'resources_fts': ('resources', 'id', ('resource_name',)),
+}
+
+
+def add_search_indexes(db):
+    """External-content FTS5 indexes over notes, problems and resources.
+
+    Triggers keep each index in sync with its table. problems has no
+    INTEGER PRIMARY KEY, so its index follows the implicit rowid; after a
+    VACUUM run `flask --app app rebuild-search`.
+    """
+    for index in SEARCH_INDEXES:
+        _create_search_index(db, index)
+
+
+def _create_search_index(db, index):
+    table, rowid, columns = SEARCH_INDEXES[index]
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+
+    db.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+            {column_list},
+            content='{table}', content_rowid='{rowid}',
+            tokenize='porter unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {index}(rowid, {column_list}) VALUES (new.{rowid}, {new_values});
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {index}({index}, rowid, {column_list})
+            VALUES ('delete', old.{rowid}, {old_values});
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {index}({index}, rowid, {column_list})
+            VALUES ('delete', old.{rowid}, {old_values});
+            INSERT INTO {index}(rowid, {column_list}) VALUES (new.{rowid}, {new_values});
+        END
+    ''')
+    db.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+# Tables whose row changes are recorded for GET /api/sync (all keyed by id)
+SYNC_TABLES = (
+    'problems',
+    'user_progress',
+    'lesson_completion',
+    'resources',
+    'notes',
+    'user_settings',
+    'custom_categories',
+)
+
+
+def _create_change_triggers(db, table):
+    def log(op, row):
+        # row_id has no affinity, so the unary + keeps new.id/old.id from
+        # forcing a numeric comparison that can't use idx_change_log_row
+        return f'''
+            DELETE FROM change_log WHERE table_name = '{table}' AND row_id = +{row}.id;
+            INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{op}');
+        '''
+
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_changes_ai AFTER INSERT ON {table} BEGIN
+            {log('upsert', 'new')}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_changes_au AFTER UPDATE ON {table} BEGIN
+            {log('upsert', 'new')}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_changes_au_id AFTER UPDATE OF id ON {table}
+        WHEN old.id IS NOT new.id BEGIN
+            {log('delete', 'old')}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_changes_ad AFTER DELETE ON {table} BEGIN
+            {log('delete', 'old')}
+        END
+    ''')
+
+
+def add_change_log(db):
+    """Change log behind GET /api/sync, maintained by triggers.
+
+    Holds one entry per changed row: each change deletes the row's previous
+    entry and appends a new one with the next seq, so the log grows with
+    the number of rows rather than the number of writes. Deletes stay as
+    tombstones until pruned. Existing rows are logged once as upserts so a
+    sync from zero returns everything.
+    """
+    _create_change_log(db, SYNC_TABLES)
+
+
+def _create_change_log(db, tables):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('upsert', 'delete')),
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    db.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_row ON change_log(table_name, row_id)')
+
+    for table in tables:
+        _create_change_triggers(db, table)
+        db.execute(f'''
+            INSERT OR IGNORE INTO change_log (table_name, row_id, op)
+            SELECT '{table}', id, 'upsert' FROM {table}
+        ''')
+
+
+# A problem row counts towards stats_problems.solved while its progress row
+# says completed; a completed progress row or a lesson completion counts
+# towards stats_activity on the day it happened
+PROBLEM_SOLVED = 'EXISTS (SELECT 1 FROM user_progress WHERE problem_id = {row}.id AND completed = 1)'
+PROGRESS_DAY = 'date(COALESCE({row}.completed_at, {row}.last_attempted))'
+
+
+def add_stats_tables(db):
+    """Summary tables behind GET /api/stats, maintained by triggers.
+
+    stats_problems keeps total and solved counts per (category, difficulty),
+    stats_activity keeps solved problems and completed lessons per day (for
+    streaks) and stats_counters keeps single totals. Every write to
+    problems, user_progress and lesson_completion adjusts them by its own
+    delta, so the dashboard never scans progress. `flask --app app
+    rebuild-stats` recomputes them from scratch.
+    """
+    _create_stats_tables(db, with_problems=True)
+    # Backfill as of this schema; stats.rebuild_stats follows later schemas
+    db.execute('''
+        INSERT INTO stats_problems (category, difficulty, total, solved)
+        SELECT p.category, p.difficulty, COUNT(*), COUNT(up.problem_id)
+        FROM problems p
+        LEFT JOIN user_progress up ON up.problem_id = p.id AND up.completed = 1
+        GROUP BY p.category, p.difficulty
+    ''')
+    db.execute('''
+        INSERT INTO stats_activity (day, problems_solved, lessons_completed)
+        SELECT day, SUM(problems_solved), SUM(lessons_completed) FROM (
+            SELECT date(COALESCE(completed_at, last_attempted)) AS day,
+                   1 AS problems_solved, 0 AS lessons_completed
+            FROM user_progress WHERE completed = 1
+            UNION ALL
+            SELECT date(completed_at), 0, 1 FROM lesson_completion
+        )
+        WHERE day IS NOT NULL
+        GROUP BY day
+    ''')
+    db.execute('''
+        INSERT INTO stats_counters (name, value)
+        SELECT 'lessons_completed', COUNT(*) FROM lesson_completion
+    ''')
+
+
+def _create_stats_tables(db, with_problems):
+    """Summary tables and their triggers (no stats_problems in a shard)"""
+    if with_problems:
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS stats_problems (
+                category TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                solved INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (category, difficulty)
+            ) WITHOUT ROWID
+        ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS stats_activity (
+            day TEXT PRIMARY KEY,
+            problems_solved INTEGER NOT NULL DEFAULT 0,
+            lessons_completed INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+    def count_problem(row, sign):
+        return f'''
+            INSERT INTO stats_problems (category, difficulty, total, solved)
+            VALUES ({row}.category, {row}.difficulty, {sign}1,
+                    {sign}{PROBLEM_SOLVED.format(row=row)})
+            ON CONFLICT(category, difficulty) DO UPDATE SET
+                total = total + excluded.total,
+                solved = solved + excluded.solved;
+        '''
+
+    def count_progress(row, sign):
+        day = PROGRESS_DAY.format(row=row)
+        solved = f'''
+            INSERT INTO stats_problems (category, difficulty, total, solved)
+            SELECT category, difficulty, 0, {sign}1 FROM problems
+            WHERE id = {row}.problem_id AND {row}.completed = 1
+            ON CONFLICT(category, difficulty) DO UPDATE SET solved = solved + excluded.solved;
+        ''' if with_problems else ''
+        return solved + f'''
+            INSERT INTO stats_activity (day, problems_solved)
+            SELECT {day}, {sign}1 WHERE {row}.completed = 1 AND {day} IS NOT NULL
+            ON CONFLICT(day) DO UPDATE SET problems_solved = problems_solved + excluded.problems_solved;
+        '''
+
+    def count_lesson(row, sign):
+        return f'''
+            INSERT INTO stats_counters (name, value) VALUES ('lessons_completed', {sign}1)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;
+            INSERT INTO stats_activity (day, lessons_completed)
+            SELECT date({row}.completed_at), {sign}1 WHERE date({row}.completed_at) IS NOT NULL
+            ON CONFLICT(day) DO UPDATE SET lessons_completed = lessons_completed + excluded.lessons_completed;
+        '''
+
+    if with_problems:
+        db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS problems_stats_ai AFTER INSERT ON problems BEGIN
+                {count_problem('new', '+')}
+            END
+        ''')
+        db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS problems_stats_ad AFTER DELETE ON problems BEGIN
+                {count_problem('old', '-')}
+            END
+        ''')
+        db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS problems_stats_au AFTER UPDATE OF id, category, difficulty ON problems
+            BEGIN
+                {count_problem('old', '-')}
+                {count_problem('new', '+')}
+            END
+        ''')
+
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_progress_stats_ai AFTER INSERT ON user_progress
+        WHEN new.completed = 1 BEGIN
+            {count_progress('new', '+')}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_progress_stats_ad AFTER DELETE ON user_progress
+        WHEN old.completed = 1 BEGIN
+            {count_progress('old', '-')}
+        END
+    ''')
+    # Autosaves of unfinished problems don't touch the summaries
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS user_progress_stats_au
+        AFTER UPDATE OF problem_id, completed, completed_at, last_attempted ON user_progress
+        WHEN (old.completed = 1 OR new.completed = 1) AND (
+            old.completed IS NOT new.completed
+            OR old.problem_id IS NOT new.problem_id
+            OR {PROGRESS_DAY.format(row='old')} IS NOT {PROGRESS_DAY.format(row='new')}
+        ) BEGIN
+            {count_progress('old', '-')}
+            {count_progress('new', '+')}
+        END
+    ''')
+
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS lesson_completion_stats_ai AFTER INSERT ON lesson_completion BEGIN
+            {count_lesson('new', '+')}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS lesson_completion_stats_ad AFTER DELETE ON lesson_completion BEGIN
+            {count_lesson('old', '-')}
+        END
+    ''')
+    db.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS lesson_completion_stats_au
+        AFTER UPDATE OF completed_at ON lesson_completion BEGIN
+            {count_lesson('old', '-')}
+            {count_lesson('new', '+')}
+        END
+    ''')
+
+
+# Review timestamps are UTC ISO-8601 text without an offset (SQLite's 'now'
+# and review.utc_now() agree), so due dates compare correctly as strings.
+# strftime() turns a completed_at with an offset into UTC too.
+REVIEW_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def add_review_schedule(db):
+    """Spaced-repetition schedule (SM-2) with an index on due date.
+
+    A problem is scheduled for its first review a day after it is first
+    completed; grading a review moves its due date (see review.py).
+    """
+    _create_review_schedule(db, with_problems=True)
+
+    db.execute(f'''
+        INSERT INTO review_schedule (problem_id, due_at)
+        SELECT problem_id, COALESCE(
+            strftime('{REVIEW_TIME_FORMAT}', completed_at, '+1 day'),
+            strftime('{REVIEW_TIME_FORMAT}', 'now', 'localtime')
+        )
+        FROM user_progress
+        WHERE completed = 1 AND problem_id IN (SELECT id FROM problems)
+        ON CONFLICT(problem_id) DO NOTHING
+    ''')
+
+
+def _create_review_schedule(db, with_problems):
+    """Schedule table and triggers.
+
+    In a shard, schedules of problems deleted from the catalog stay behind;
+    the review queries join problems, so they are never served.
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS review_schedule (
+            problem_id TEXT PRIMARY KEY,
+            ease REAL NOT NULL DEFAULT 2.5,
+            interval_days INTEGER NOT NULL DEFAULT 0,
+            repetitions INTEGER NOT NULL DEFAULT 0,
+            lapses INTEGER NOT NULL DEFAULT 0,
+            due_at TIMESTAMP NOT NULL,
+            last_grade INTEGER,
+            last_reviewed_at TIMESTAMP
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_review_schedule_due_at ON review_schedule(due_at, problem_id)')
+
+    _create_review_triggers(db, with_problems)
+    if not with_problems:
+        return
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS problems_review_ad AFTER DELETE ON problems BEGIN
+            DELETE FROM review_schedule WHERE problem_id = old.id;
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS problems_review_au AFTER UPDATE OF id ON problems
+        WHEN old.id IS NOT new.id BEGIN
+            UPDATE review_schedule SET problem_id = new.id WHERE problem_id = old.id;
+        END
+    ''')
+
+
+def _create_review_triggers(db, with_problems):
+    """Schedule a problem's first review when its progress is first completed.
+
+    Written as an upsert rather than INSERT OR IGNORE: the ON CONFLICT
+    clause of the statement that fires a trigger overrides an OR clause
+    inside it, so the progress upsert would turn a second save of a
+    completed problem into a primary key error.
+    """
+    first_due = (f"COALESCE(strftime('{REVIEW_TIME_FORMAT}', new.completed_at, '+1 day'), "
+                 f"strftime('{REVIEW_TIME_FORMAT}', 'now', '+1 day'))")
+    # The WHERE keeps the parser from reading ON CONFLICT as a join constraint
+    where = 'WHERE EXISTS (SELECT 1 FROM problems WHERE id = new.problem_id)' if with_problems else 'WHERE true'
+    for event in ('INSERT', 'UPDATE OF completed'):
+        name = 'ai' if event == 'INSERT' else 'au'
+        db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS user_progress_review_{name} AFTER {event} ON user_progress
+            WHEN new.completed = 1 BEGIN
+                INSERT INTO review_schedule (problem_id, due_at)
+                SELECT new.problem_id, {first_due}
+                {where}
+                ON CONFLICT(problem_id) DO NOTHING;
+            END
+        ''')
+
+
+def _recreate_review_triggers(db, with_problems):
+    for name in ('ai', 'au'):
+        db.execute(f'DROP TRIGGER IF EXISTS user_progress_review_{name}')
+    _create_review_triggers(db, with_problems)
+
+
+def add_attempt_history(db):
+    """Versioned code attempts over content-addressed, delta-compressed blobs.
+
+    Existing saved code becomes each problem's first version. See history.py.
+    """
+    _create_attempt_history(db, with_problems=True)
+    # One progress row per problem by now, so each is a version 1 stored as a
+    # full snapshot (the blob format as of this schema; see history.py)
+    rows = db.execute('''
+        SELECT problem_id, user_code, completed, last_attempted
+        FROM user_progress
+        WHERE user_code IS NOT NULL
+    ''').fetchall()
+    for problem_id, user_code, completed, last_attempted in rows:
+        data = user_code.encode('utf-8')
+        blob_hash = hashlib.sha256(data).hexdigest()
+        db.execute('''
+            INSERT OR IGNORE INTO code_blobs (hash, base_hash, depth, size, data)
+            VALUES (?, NULL, 0, ?, ?)
+        ''', (blob_hash, len(data), zlib.compress(data, 9)))
+        db.execute('''
+            INSERT INTO attempt_history (problem_id, version, blob_hash, completed, created_at)
+            VALUES (?, 1, ?, ?, ?)
+        ''', (problem_id, blob_hash, completed, last_attempted))
+
+
+def _create_attempt_history(db, with_problems):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS code_blobs (
+            hash TEXT PRIMARY KEY,
+            base_hash TEXT REFERENCES code_blobs(hash),
+            depth INTEGER NOT NULL DEFAULT 0,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS attempt_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            problem_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            blob_hash TEXT NOT NULL REFERENCES code_blobs(hash),
+            completed INTEGER DEFAULT 0,
+            created_at TIMESTAMP,
+            UNIQUE (problem_id, version)
+        )
+    ''')
+    if with_problems:
+        db.execute('''
+            CREATE TRIGGER IF NOT EXISTS problems_history_ad AFTER DELETE ON problems BEGIN
+                DELETE FROM attempt_history WHERE problem_id = old.id;
+            END
+        ''')
+
+
+def fix_change_log_lookups(db):
+    """Recreate the change log triggers so they look rows up by index"""
+    for table in SYNC_TABLES:
+        for suffix in ('ai', 'au', 'au_id', 'ad'):
+            db.execute(f'DROP TRIGGER IF EXISTS {table}_changes_{suffix}')
+        _create_change_triggers(db, table)
+
+
+def add_users(db):
+    """Accounts for per-user shards (see tenants.py).
+
+    Only a hash of each API token is stored. shard_path is fixed when the
+    account is created, so adding shard directories later only places new
+    users.
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            token_hash TEXT NOT NULL UNIQUE,
+            shard_path TEXT NOT NULL DEFAULT '',
+            is_admin INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def fix_review_schedule_upserts(db):
+    """Recreate the first-review triggers as upserts (see _create_review_triggers)"""
+    _recreate_review_triggers(db, with_problems=True)
+
+
+# Tables whose versions drive ETags, the response cache and change events
+VERSIONED_TABLES = (*SYNC_TABLES, 'review_schedule')
+VERSIONS_EPOCH_KEY = 'table_versions_epoch'
+
+
+def add_table_versions(db):
+    """Per-table change counters shared by every process (see versioning.py).
+
+    Triggers bump a table's row in the same transaction as each write to
+    it, so writes from other workers, CLI commands or outside tools are
+    counted too. The epoch goes into ETags so a recreated database never
+    matches tags handed out for an earlier one.
+    """
+    _create_table_versions(db, VERSIONED_TABLES)
+
+
+def _create_table_versions(db, tables):
+    now = "(julianday('now') - 2440587.5) * 86400.0"
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            modified REAL NOT NULL
+        )
+    ''')
+    db.execute('INSERT OR IGNORE INTO app_meta (key, value) VALUES (?, lower(hex(randomblob(4))))',
+               (VERSIONS_EPOCH_KEY,))
+    for table in tables:
+        db.execute(f"INSERT OR IGNORE INTO table_versions (table_name, modified) VALUES ('{table}', {now})")
+        for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+            db.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_versions_{suffix} AFTER {event} ON {table} BEGIN
+                    UPDATE table_versions SET version = version + 1, modified = {now}
+                    WHERE table_name = '{table}';
+                END
+            ''')
+
+
+def use_utc_review_times(db):
+    """Schedule in UTC: recreate the first-review triggers and convert stored times.
+
+    The triggers, review.py and the add_review_schedule backfill (left as it
+    was, so a database upgraded in one go converts the same values) wrote
+    the server's local time; the conversion assumes it hasn't changed
+    timezone since.
+    """
+    _convert_review_times_to_utc(db)
+    _recreate_review_triggers(db, with_problems=True)
+
+
+def _convert_review_times_to_utc(db):
+    db.execute(f'''
+        UPDATE review_schedule SET
+            due_at = strftime('{REVIEW_TIME_FORMAT}', due_at, 'utc'),
+            last_reviewed_at = strftime('{REVIEW_TIME_FORMAT}', last_reviewed_at, 'utc')
+    ''')
+
+
+def move_table_versions_epoch(db):
+    """Keep the versions epoch in its own table instead of app_meta.
+
+    A user shard needs an epoch too, and an app_meta of its own would hide
+    the catalog's (the lesson count, the pruned change-log position) from
+    connections that attach the catalog. The catalog's epoch is kept, so
+    tags already handed out stay valid.
+    """
+    _create_table_versions_epoch(db)
+    db.execute('DELETE FROM app_meta WHERE key = ?', (VERSIONS_EPOCH_KEY,))
+
+
+def _create_table_versions_epoch(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions_epoch (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch TEXT NOT NULL
+        )
+    ''')
+    db.execute('''
+        INSERT OR IGNORE INTO table_versions_epoch (id, epoch)
+        SELECT 1, COALESCE((SELECT value FROM app_meta WHERE key = ?), lower(hex(randomblob(4))))
+    ''', (VERSIONS_EPOCH_KEY,))
+
+
+MIGRATIONS = [
+    add_progress_unique_and_indexes,
+    add_problems_keyset_index,
+    compact_test_cases,
+    add_app_meta,
+    add_search_indexes,
+    add_change_log,
+    add_stats_tables,
+    add_review_schedule,
+    add_attempt_history,
+    fix_change_log_lookups,
+    add_users,
+    fix_review_schedule_upserts,
+    add_table_versions,
+    use_utc_review_times,
+    move_table_versions_epoch,
+]
+
+
+# A user shard logs its own tables; problem changes stay in the catalog's log
+SHARD_SYNC_TABLES = tuple(table for table in SYNC_TABLES if table not in CATALOG_TABLES)
+
+
+def add_shard_progress_index(db):
+    """One progress row per problem (the shard's user tables start empty)"""
+    db.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_user_progress_problem_id ON user_progress(problem_id)')
+
+
+def add_shard_search_indexes(db):
+    """FTS5 indexes over the shard's notes and resources (problems_fts is in the catalog)"""
+    for index, (table, _, _) in SEARCH_INDEXES.items():
+        if table not in CATALOG_TABLES:
+            _create_search_index(db, index)
+
+
+def add_shard_change_log(db):
+    """Change log for the shard's own tables (GET /api/sync merges it with the catalog's)"""
+    _create_change_log(db, SHARD_SYNC_TABLES)
+
+
+def add_shard_stats_tables(db):
+    """Daily activity and lesson counters (solved counts are read against the catalog)"""
+    _create_stats_tables(db, with_problems=False)
+
+
+def add_shard_review_schedule(db):
+    _create_review_schedule(db, with_problems=False)
+
+
+def add_shard_attempt_history(db):
+    _create_attempt_history(db, with_problems=False)
+
+
+def fix_shard_review_schedule_upserts(db):
+    _recreate_review_triggers(db, with_problems=False)
+
+
+SHARD_VERSIONED_TABLES = tuple(table for table in VERSIONED_TABLES if table not in CATALOG_TABLES)
+
+
+def add_shard_table_versions(db):
+    """The shard's own table versions; problem versions come from the catalog"""
+    add_app_meta(db)
+    _create_table_versions(db, SHARD_VERSIONED_TABLES)
+
+
+def use_shard_utc_review_times(db):
+    _convert_review_times_to_utc(db)
+    _recreate_review_triggers(db, with_problems=False)
+
+
+def move_shard_table_versions_epoch(db):
+    """Drop the shard's app_meta, which only held the versions epoch.
+
+    Shard reads attach the catalog, and the shard's copy shadowed
+    catalog.app_meta for them (see move_table_versions_epoch).
+    """
+    _create_table_versions_epoch(db)
+    db.execute('DROP TABLE app_meta')
+
+
+SHARD_MIGRATIONS = [
+    add_shard_progress_index,
+    add_shard_search_indexes,
+    add_shard_change_log,
+    add_shard_stats_tables,
+    add_shard_review_schedule,
+    add_shard_attempt_history,
+    fix_shard_review_schedule_upserts,
+    add_shard_table_versions,
+    use_shard_utc_review_times,
+    move_shard_table_versions_epoch,
+]
+
+
+def apply_migrations(db, migrations=MIGRATIONS):
+    """Apply every migration newer than the database's user_version"""
+    version = db.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(migrations[version:], start=version + 1):
+        migration(db)
+        db.execute(f'PRAGMA user_version = {number}')
+    return len(migrations)
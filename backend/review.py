@@ -0,0 +1,132 @@
+"""
+SM-2 spaced-repetition scheduling over the review_schedule table.
+
+Each scheduled problem has an ease factor, an interval and a due date.
+Grading a review (0-5, 3 and up is a pass) updates all three in one
+primary-key upsert, and "what's next" is a range scan of the
+(due_at, problem_id) index, so both stay cheap however many problems are
+scheduled or reviews are recorded.
+
+Times are stored as UTC ISO-8601 text without an offset, the same as
+SQLite's own 'now' in the scheduling triggers, so due dates compare
+correctly as strings whatever the server's timezone.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+MIN_GRADE = 0
+MAX_GRADE = 5
+PASSING_GRADE = 3
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+DEFAULT_REVIEW_LIMIT = 10
+MAX_REVIEW_LIMIT = 100
+
+SCHEDULE_COLUMNS = (
+    'problem_id', 'ease', 'interval_days', 'repetitions', 'lapses',
+    'due_at', 'last_grade', 'last_reviewed_at',
+)
+
+
+def utc_now():
+    """The current UTC time as a naive datetime, like the stored times"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def now_iso():
+    return utc_now().isoformat(timespec='seconds')
+
+
+def next_schedule(schedule, grade, now):
+    """The schedule after a review graded ``grade`` at ``now`` (SM-2)"""
+    ease = schedule['ease']
+    repetitions = schedule['repetitions']
+    interval = schedule['interval_days']
+    lapses = schedule['lapses']
+
+    if grade < PASSING_GRADE:
+        repetitions = 0
+        interval = 1
+        lapses += 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval = 1
+        elif repetitions == 2:
+            interval = 6
+        else:
+            interval = max(round(interval * ease), interval + 1)
+
+    miss = MAX_GRADE - grade
+    ease = max(MIN_EASE, round(ease + 0.1 - miss * (0.08 + miss * 0.02), 4))
+
+    return {
+        'problem_id': schedule['problem_id'],
+        'ease': ease,
+        'interval_days': interval,
+        'repetitions': repetitions,
+        'lapses': lapses,
+        'due_at': (now + timedelta(days=interval)).isoformat(timespec='seconds'),
+        'last_grade': grade,
+        'last_reviewed_at': now.isoformat(timespec='seconds'),
+    }
+
+
+def record_review(db, problem_id, grade, now, check_problem=True):
+    """Apply a graded review (runs on the writer); None if the problem doesn't exist.
+
+    Problems that were never scheduled start from the SM-2 defaults. A
+    shard's writer can't see the catalog, so there the caller checks that
+    the problem exists and passes ``check_problem=False``.
+    """
+    if check_problem and db.execute('SELECT 1 FROM problems WHERE id = ?', (problem_id,)).fetchone() is None:
+        return None
+
+    row = db.execute('SELECT * FROM review_schedule WHERE problem_id = ?', (problem_id,)).fetchone()
+    schedule = dict(row) if row else {
+        'problem_id': problem_id,
+        'ease': DEFAULT_EASE,
+        'interval_days': 0,
+        'repetitions': 0,
+        'lapses': 0,
+    }
+    updated = next_schedule(schedule, grade, now)
+
+    columns = ', '.join(SCHEDULE_COLUMNS)
+    placeholders = ', '.join('?' for _ in SCHEDULE_COLUMNS)
+    assignments = ', '.join(f'{c} = excluded.{c}' for c in SCHEDULE_COLUMNS[1:])
+    db.execute(f'''
+        INSERT INTO review_schedule ({columns}) VALUES ({placeholders})
+        ON CONFLICT(problem_id) DO UPDATE SET {assignments}
+    ''', [updated[c] for c in SCHEDULE_COLUMNS])
+    return updated
+
+
+def due_reviews(db, now, limit=DEFAULT_REVIEW_LIMIT):
+    """Up to ``limit`` problems due by ``now``, most overdue first.
+
+    Also returns when the next review falls due, for clients to schedule a
+    refresh when nothing is due yet.
+    """
+    rows = db.execute('''
+        SELECT rs.*, p.title, p.category, p.difficulty
+        FROM review_schedule rs
+        JOIN problems p ON p.id = rs.problem_id
+        WHERE rs.due_at <= ?
+        ORDER BY rs.due_at, rs.problem_id
+        LIMIT ?
+    ''', (now, limit)).fetchall()
+    next_due_at = None
+    if len(rows) < limit:
+        row = db.execute('''
+            SELECT rs.due_at
+            FROM review_schedule rs
+            JOIN problems p ON p.id = rs.problem_id
+            WHERE rs.due_at > ?
+            ORDER BY rs.due_at
+            LIMIT 1
+        ''', (now,)).fetchone()
+        next_due_at = row[0] if row else None
+    return [dict(row) for row in rows], next_due_at
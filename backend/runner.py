@@ -0,0 +1,256 @@
+"""
+Server-side test runner for submitted JavaScript solutions.
+
+Code runs in a pool of pre-warmed Node.js worker processes
+(runner_worker.js), each handling one job at a time over a line-based JSON
+protocol. Every worker is isolated at several levels:
+
+- a fresh vm context per job, without require/process and with string code
+  generation disabled, and a per-test-case vm timeout
+- Node's permission model, so the process can read only its own script
+- a V8 heap cap plus RLIMIT_AS/CPU/FSIZE/NOFILE/CORE resource limits
+- a wall-clock deadline per job, after which the worker is killed
+
+A worker that crashes, times out or has served ``max_jobs`` jobs is
+replaced, so the pool always holds ``size`` warm processes.
+"""
+
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, the vm timeout and deadline still apply
+    resource = None
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runner_worker.js')
+
+# Address space V8 needs on top of the heap (code range, stacks, thread pools)
+ADDRESS_SPACE_OVERHEAD_MB = 1024
+
+
+class RunnerUnavailable(Exception):
+    """Raised when Node.js is missing or no worker frees up in time"""
+
+
+class RunnerError(Exception):
+    """Raised when a worker dies or blows its deadline while running a job"""
+
+
+class _Worker:
+    def __init__(self, process):
+        self.process = process
+        self.jobs = 0
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class RunnerPool:
+    """Fixed-size pool of Node.js worker processes running test jobs"""
+
+    def __init__(self, node=None, size=2, test_timeout_ms=2000, memory_mb=128,
+                 cpu_seconds=60, max_jobs=200, acquire_timeout=10.0):
+        self.node = node or shutil.which('node')
+        self.size = size
+        self.test_timeout_ms = test_timeout_ms
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.max_jobs = max_jobs
+        self.acquire_timeout = acquire_timeout
+
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._pid = None
+        self._stats = {
+            'jobs': 0,
+            'batches': 0,
+            'passed_jobs': 0,
+            'failed_jobs': 0,
+            'timeouts': 0,
+            'crashes': 0,
+            'spawned': 0,
+            'recycled': 0,
+            'run_seconds': 0.0,
+        }
+
+    @property
+    def available(self):
+        return self.node is not None
+
+    def _limit_resources(self):
+        """Runs in the child between fork and exec"""
+        if resource is None:
+            return
+        address_space = (self.memory_mb + ADDRESS_SPACE_OVERHEAD_MB) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (address_space, address_space))
+        resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    def _spawn(self):
+        process = subprocess.Popen(
+            [
+                self.node,
+                '--no-warnings',
+                '--experimental-permission',
+                f'--allow-fs-read={WORKER_SCRIPT}',
+                f'--max-old-space-size={self.memory_mb}',
+                WORKER_SCRIPT,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(WORKER_SCRIPT),
+            env={'PATH': os.environ.get('PATH', '')},
+            preexec_fn=self._limit_resources if resource is not None else None,
+            start_new_session=True,
+            text=True,
+            bufsize=1,
+        )
+        worker = _Worker(process)
+        with self._lock:
+            self._workers.add(worker)
+            self._stats['spawned'] += 1
+        return worker
+
+    def start(self):
+        """Spawn the pool's workers (once per process; safe to call repeatedly)"""
+        if not self.available:
+            raise RunnerUnavailable('Node.js is not installed')
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Workers inherited from a parent process are not ours to use
+            self._pid = os.getpid()
+            self._workers = set()
+            self._idle = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _retire(self, worker):
+        """Kill ``worker`` and put a fresh one in its place"""
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+        self._idle.put(self._spawn())
+
+    def run(self, code, test_cases):
+        """Run ``code`` against ``test_cases`` and return the worker's result dict"""
+        return self.run_batch([code], test_cases)[0]
+
+    def run_batch(self, codes, test_cases):
+        """Run every submission in ``codes`` against the same ``test_cases``.
+
+        The batch goes to a single worker, which serializes the fixtures once
+        and runs the submissions one after another, each in its own context;
+        separate calls run concurrently on different workers. Returns one
+        result dict per submission, in order.
+        """
+        self.start()
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RunnerUnavailable('All test runner workers are busy')
+
+        job = json.dumps({
+            'submissions': codes,
+            'test_cases': test_cases,
+            'timeout_ms': self.test_timeout_ms,
+        })
+        # Compiling plus every test case at its own timeout, with slack for IPC
+        deadline = self.test_timeout_ms * (len(test_cases) + 1) * len(codes) / 1000 + 1.0
+
+        started = time.perf_counter()
+        reply = {}
+
+        def exchange():
+            try:
+                worker.process.stdin.write(job + '\n')
+                worker.process.stdin.flush()
+                reply['line'] = worker.process.stdout.readline()
+            except (OSError, ValueError):
+                pass  # the worker died; handled below as a crash
+
+        thread = threading.Thread(target=exchange, daemon=True)
+        thread.start()
+        thread.join(deadline)
+
+        if thread.is_alive():
+            self._record('timeouts')
+            self._retire(worker)
+            raise RunnerError(f'Run exceeded {deadline:.1f}s and was stopped')
+
+        line = reply.get('line')
+        if not line:
+            self._record('crashes')
+            self._retire(worker)
+            raise RunnerError('Worker crashed (memory limit exceeded?)')
+
+        try:
+            results = json.loads(line)['results']
+            if len(results) != len(codes):
+                raise ValueError('result count mismatch')
+        except (ValueError, KeyError, TypeError):
+            self._record('crashes')
+            self._retire(worker)
+            raise RunnerError('Worker sent an invalid reply')
+
+        worker.jobs += len(codes)
+        if worker.jobs >= self.max_jobs:
+            self._record('recycled')
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+        elapsed = time.perf_counter() - started
+        passed_count = 0
+        for result in results:
+            result['passed'] = result['ok'] and all(r['passed'] for r in result['results'])
+            passed_count += result['passed']
+        with self._lock:
+            self._stats['jobs'] += len(codes)
+            self._stats['batches'] += 1
+            self._stats['passed_jobs'] += passed_count
+            self._stats['failed_jobs'] += len(codes) - passed_count
+            self._stats['run_seconds'] += elapsed
+        return results
+
+    def _record(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stop(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers = set()
+            self._pid = None
+        for worker in workers:
+            worker.kill()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['workers'] = len(self._workers)
+        stats['idle'] = self._idle.qsize()
+        stats['avg_run_ms'] = (
+            round(stats['run_seconds'] / stats['jobs'] * 1000, 3) if stats['jobs'] else 0.0
+        )
+        stats['run_seconds'] = round(stats['run_seconds'], 3)
+        stats['size'] = self.size
+        stats['node'] = self.node
+        return stats
@@ -0,0 +1,157 @@
+// Test runner worker, spawned and pooled by runner.py.
+//
+// Reads one JSON job per line on stdin:
+//   {"submissions": ["..."], "test_cases": [{"input": {...}, "expected": ...}], "timeout_ms": 2000}
+// and writes one JSON line per job on stdout: {"results": [...]}, one entry
+// per submission. Fixtures are serialized once per job and shared by all of
+// its submissions. Each submission gets a fresh vm context with no require/process and string code generation disabled.
+// Inputs and outputs only cross the context boundary as JSON strings, so
+// submitted code never holds a reference to an object from this realm.
+// The vm is not a security boundary on its own; runner.py adds Node's
+// permission model and OS resource limits around the process.
+// Mirrors the browser grader: the code must evaluate to a function, which is
+// called with Object.values(input) and compared via JSON.stringify.
+
+'use strict';
+
+const readline = require('readline');
+const vm = require('vm');
+
+const MAX_LOG_LINES = 50;
+
+function elapsedMs(started) {
+  return Number(process.hrtime.bigint() - started) / 1e6;
+}
+
+function describeError(error) {
+  if (error && error.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT') {
+    return 'Timed out';
+  }
+  return error && error.message ? String(error.message) : String(error);
+}
+
+// Defined inside the context before any submitted code runs. It keeps its own
+// references to JSON and Object.values, so later reassigning those globals
+// doesn't change how results are serialized.
+const HARNESS = `
+(() => {
+  const stringify = JSON.stringify;
+  const parse = JSON.parse;
+  const values = Object.values;
+  const logs = [];
+  let result;
+  const log = (...args) => {
+    if (logs.length < ${MAX_LOG_LINES}) {
+      logs.push(args.map(String).join(' '));
+    }
+  };
+  Object.defineProperty(globalThis, 'console', {
+    value: Object.freeze({ log, info: log, warn: log, error: log }),
+  });
+  Object.defineProperty(globalThis, '__call', {
+    value: (solution, input) => {
+      logs.length = 0;
+      result = undefined;
+      result = solution(...values(parse(input)));
+    },
+  });
+  Object.defineProperty(globalThis, '__report', {
+    value: () => stringify({ actual: stringify(result), logs }),
+  });
+})();
+`;
+
+function createSandbox() {
+  // A null-prototype global keeps every reachable constructor inside the
+  // context, where string code generation is disabled
+  const context = vm.createContext(Object.create(null), {
+    codeGeneration: { strings: false, wasm: false },
+    microtaskMode: 'afterEvaluate',
+  });
+  vm.runInContext(HARNESS, context);
+  return context;
+}
+
+const CALL = new vm.Script('__call(__solution, __input)', { filename: 'test.js' });
+const REPORT = new vm.Script('__report()', { filename: 'report.js' });
+
+function runSubmission(code, fixtures, timeout) {
+  const context = createSandbox();
+
+  try {
+    // Same shape as `new Function("return " + userCode)()` in the browser
+    new vm.Script(`globalThis.__solution = (function () { return ${code}\n})();`, {
+      filename: 'solution.js',
+    }).runInContext(context, { timeout });
+    if (vm.runInContext('typeof __solution', context) !== 'function') {
+      throw new Error('Code must evaluate to a function');
+    }
+  } catch (error) {
+    return { ok: false, error: describeError(error), results: [] };
+  }
+
+  const results = fixtures.map((fixture, index) => {
+    context.__input = fixture.input;
+    const started = process.hrtime.bigint();
+    let error = null;
+    try {
+      CALL.runInContext(context, { timeout });
+    } catch (e) {
+      error = describeError(e);
+    }
+    const durationMs = elapsedMs(started);
+
+    let actual;
+    let logs = [];
+    try {
+      ({ actual, logs } = JSON.parse(REPORT.runInContext(context, { timeout })));
+    } catch (e) {
+      error = error || describeError(e);
+    }
+    return {
+      case: index + 1,
+      input: fixture.testCase.input,
+      expected: fixture.testCase.expected,
+      actual: error === null && actual !== undefined ? JSON.parse(actual) : null,
+      error,
+      passed: error === null && actual === fixture.expected,
+      duration_ms: Math.round(durationMs * 1000) / 1000,
+      logs,
+    };
+  });
+
+  return { ok: true, error: null, results };
+}
+
+function runJob(job) {
+  const fixtures = job.test_cases.map((testCase) => ({
+    testCase,
+    input: JSON.stringify(testCase.input),
+    expected: JSON.stringify(testCase.expected),
+  }));
+  return {
+    results: job.submissions.map((code) => {
+      const started = process.hrtime.bigint();
+      let result;
+      try {
+        result = runSubmission(code, fixtures, job.timeout_ms);
+      } catch (error) {
+        result = { ok: false, error: describeError(error), results: [] };
+      }
+      result.duration_ms = Math.round(elapsedMs(started) * 1000) / 1000;
+      return result;
+    }),
+  };
+}
+
+const lines = readline.createInterface({ input: process.stdin });
+lines.on('line', (line) => {
+  let response;
+  try {
+    response = runJob(JSON.parse(line));
+  } catch (error) {
+    response = { error: describeError(error), results: [] };
+  }
+  process.stdout.write(JSON.stringify(response) + '\n');
+});
+lines.on('close', () => process.exit(0));
@@ -0,0 +1,139 @@
+"""
+Ranked full-text search over notes, problems and resources.
+
+Backed by the FTS5 indexes created in migrations.add_search_indexes. User
+input is turned into a safe FTS5 query: every word is quoted (so operators
+and punctuation can't cause syntax errors) and the last word is matched as a
+prefix for search-as-you-type.
+
+Titles and snippets are returned as HTML: the indexed text is escaped and
+only the match markers become ``<mark>`` tags, so the client can render
+them as-is.
+"""
+
+import html
+import re
+
+# type -> (ranking SQL, detail SQL). Ranking returns the top (rowid, rank)
+# for a MATCH parameter, with bm25 weights favouring title matches; detail
+# builds the highlighted row for those rowids only, so highlight() and
+# snippet() never run on matches that don't make the page.
+SEARCH_SOURCES = {
+    'notes': (
+        '''
+        SELECT rowid, bm25(notes_fts, 5.0, 1.0, 2.0) AS rank
+        FROM notes_fts WHERE notes_fts MATCH ?
+        ORDER BY rank LIMIT ?
+        ''',
+        '''
+        SELECT notes_fts.rowid AS rowid, n.id AS id,
+               highlight(notes_fts, 0, '\x02', '\x03') AS title,
+               snippet(notes_fts, -1, '\x02', '\x03', '…', 16) AS snippet
+        FROM notes_fts
+        JOIN notes n ON n.id = notes_fts.rowid
+        WHERE notes_fts MATCH ? AND notes_fts.rowid IN ({rowids})
+        ''',
+    ),
+    'problems': (
+        '''
+        SELECT rowid, bm25(problems_fts, 5.0, 1.0) AS rank
+        FROM problems_fts WHERE problems_fts MATCH ?
+        ORDER BY rank LIMIT ?
+        ''',
+        '''
+        SELECT problems_fts.rowid AS rowid, p.id AS id,
+               highlight(problems_fts, 0, '\x02', '\x03') AS title,
+               snippet(problems_fts, 1, '\x02', '\x03', '…', 16) AS snippet
+        FROM problems_fts
+        JOIN problems p ON p.rowid = problems_fts.rowid
+        WHERE problems_fts MATCH ? AND problems_fts.rowid IN ({rowids})
+        ''',
+    ),
+    'resources': (
+        '''
+        SELECT rowid, bm25(resources_fts) AS rank
+        FROM resources_fts WHERE resources_fts MATCH ?
+        ORDER BY rank LIMIT ?
+        ''',
+        '''
+        SELECT resources_fts.rowid AS rowid, r.id AS id,
+               highlight(resources_fts, 0, '\x02', '\x03') AS title,
+               NULL AS snippet
+        FROM resources_fts
+        JOIN resources r ON r.id = resources_fts.rowid
+        WHERE resources_fts MATCH ? AND resources_fts.rowid IN ({rowids})
+        ''',
+    ),
+}
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# highlight()/snippet() wrap matches in these control characters, which
+# survive html.escape() and are swapped for tags afterwards
+_MARKS = str.maketrans({'\x02': '<mark>', '\x03': '</mark>'})
+
+
+def marked_html(text):
+    """Escape highlighted text as HTML, turning the match markers into <mark> tags"""
+    if text is None:
+        return None
+    return html.escape(text, quote=False).translate(_MARKS)
+
+
+def build_match_query(text):
+    """Convert free text into an FTS5 MATCH expression, or None if it has no words"""
+    tokens = _TOKEN.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(db, text, types, limit, offset):
+    """Top matches across ``types``, best first, with one extra row for paging.
+
+    Each source is cut to its own top (offset + limit + 1) by rank before
+    merging, and only the rows on the returned page are highlighted.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    window = offset + limit + 1
+    # One read snapshot, so every ranked row is still there for its details
+    own_transaction = not db.in_transaction
+    if own_transaction:
+        db.execute('BEGIN')
+    try:
+        ranked = []
+        for source in types:
+            rank_sql, _ = SEARCH_SOURCES[source]
+            for rowid, rank in db.execute(rank_sql, (match, window)):
+                ranked.append((rank, source, rowid))
+        ranked.sort()
+        page = ranked[offset:offset + limit + 1]
+
+        details = {}
+        for source in {source for _, source, _ in page}:
+            rowids = [rowid for _, kind, rowid in page if kind == source]
+            detail_sql = SEARCH_SOURCES[source][1].format(rowids=', '.join('?' for _ in rowids))
+            for row in db.execute(detail_sql, (match, *rowids)):
+                details[source, row['rowid']] = row
+    finally:
+        if own_transaction:
+            db.execute('COMMIT')
+
+    results = []
+    for rank, source, rowid in page:
+        row = details.get((source, rowid))
+        if row is None:
+            continue  # an index entry without its row; nothing to show
+        results.append({
+            'type': source,
+            'id': row['id'],
+            'title': marked_html(row['title']),
+            'snippet': marked_html(row['snippet']),
+            'rank': rank,
+        })
+    return results
@@ -1,10 +1,14 @@
 """
 Seed script to populate the database with lesson exercises from lesson-data.json
+
+The API seeds on startup as well (skipping the work when the lesson file is
+unchanged); this script always applies the file, e.g. after editing it.
 """
 
 import json
 import sqlite3
-from datetime import datetime
+
+from seeding import lesson_exercise_rows, upsert_lesson_exercises
 
 DATABASE = 'dsa_tracker.db'
 
@@ -14,47 +18,14 @@ def seed_exercises():
         lesson_data = json.load(f)
 
     db = sqlite3.connect(DATABASE)
-    cursor = db.cursor()
-
-    count = 0
-    for category, lessons in lesson_data.items():
-        for lesson in lessons:
-            if 'exercise' in lesson:
-                exercise = lesson['exercise']
-                problem_id = f"{lesson['id']}-exercise"
-
-                # Check if already exists
-                cursor.execute('SELECT id FROM problems WHERE id = ?', (problem_id,))
-                if cursor.fetchone():
-                    print(f"Skipping {problem_id} - already exists")
-                    continue
-
-                # Insert the exercise as a problem
-                cursor.execute('''
-                    INSERT INTO problems (
-                        id, title, category, difficulty, description,
-                        is_lesson_exercise, lesson_id, starter_code,
-                        solution, test_cases
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    problem_id,
-                    exercise.get('title', lesson['title']),
-                    category,
-                    exercise.get('difficulty', lesson['difficulty']),
-                    exercise.get('description'),
-                    1,  # is_lesson_exercise
-                    lesson['id'],
-                    exercise.get('starterCode'),
-                    exercise.get('solution'),
-                    json.dumps(exercise.get('testCases', []))
-                ))
-                count += 1
-                print(f"Added: {exercise.get('title', lesson['title'])}")
+
+    rows = lesson_exercise_rows(lesson_data)
+    count = upsert_lesson_exercises(db, rows)
 
     db.commit()
     db.close()
 
-    print(f"\n✓ Successfully seeded {count} exercises!")
+    print(f"\n✓ Successfully seeded {count} of {len(rows)} exercises (new or changed)")
 
 if __name__ == '__main__':
     seed_exercises()
@@ -0,0 +1,120 @@
+"""
+Seeding lesson exercises from lesson-data.json into the problems table.
+
+The SHA-256 of the lesson file is stored in ``app_meta`` after a successful
+seed, so startup skips the JSON parse and every query when the file hasn't
+changed. When it has, all exercises are applied in one ``executemany``
+upsert that only rewrites rows whose content actually differs. A file lock
+next to the database makes concurrent workers seed one at a time; the ones
+that wait find the hash already up to date.
+"""
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from serialization import dumps
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, seeding is still idempotent
+    fcntl = None
+
+LESSON_DATA_HASH_KEY = 'lesson_data_sha256'
+LESSON_COUNT_KEY = 'lesson_count'
+
+EXERCISE_COLUMNS = [
+    'id', 'title', 'category', 'difficulty', 'description',
+    'is_lesson_exercise', 'lesson_id', 'starter_code', 'solution', 'test_cases',
+]
+
+
+def lesson_exercise_rows(lesson_data):
+    """Problem rows (in EXERCISE_COLUMNS order) for every lesson with an exercise"""
+    rows = []
+    for category, lessons in lesson_data.items():
+        for lesson in lessons:
+            if 'exercise' in lesson:
+                exercise = lesson['exercise']
+                rows.append((
+                    f"{lesson['id']}-exercise",
+                    exercise.get('title', lesson['title']),
+                    category,
+                    exercise.get('difficulty', lesson['difficulty']),
+                    exercise.get('description'),
+                    1,
+                    lesson['id'],
+                    exercise.get('starterCode'),
+                    exercise.get('solution'),
+                    dumps(exercise.get('testCases', [])).decode(),
+                ))
+    return rows
+
+
+def upsert_lesson_exercises(db, rows):
+    """Insert new exercises and update changed ones; returns rows written"""
+    columns = ', '.join(EXERCISE_COLUMNS)
+    placeholders = ', '.join('?' for _ in EXERCISE_COLUMNS)
+    updated = [c for c in EXERCISE_COLUMNS if c != 'id']
+    assignments = ', '.join(f'{c} = excluded.{c}' for c in updated)
+    changed = ' OR '.join(f'problems.{c} IS NOT excluded.{c}' for c in updated)
+
+    # rowcount, unlike total_changes, leaves out rows written by triggers
+    return db.executemany(f'''
+        INSERT INTO problems ({columns}) VALUES ({placeholders})
+        ON CONFLICT(id) DO UPDATE SET {assignments}
+        WHERE {changed}
+    ''', rows).rowcount
+
+
+def get_meta(db, key):
+    row = db.execute('SELECT value FROM app_meta WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(db, key, value):
+    db.execute('''
+        INSERT INTO app_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    ''', (key, value))
+
+
+@contextmanager
+def startup_lock(database):
+    """Serialize startup work across worker processes sharing ``database``"""
+    if fcntl is None:
+        yield
+        return
+    with open(f'{database}.startup.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def seed_from_file(writer, lesson_data_path):
+    """Seed exercises from ``lesson_data_path`` unless its hash is unchanged.
+
+    Returns (rows_written, seconds) with rows_written None when skipped.
+    """
+    started = time.perf_counter()
+    with open(lesson_data_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+
+    def apply(db):
+        if (get_meta(db, LESSON_DATA_HASH_KEY) == digest
+                and get_meta(db, LESSON_COUNT_KEY) is not None):
+            return None
+        lesson_data = json.loads(content)
+        written = upsert_lesson_exercises(db, lesson_exercise_rows(lesson_data))
+        # Denominator of the lesson completion ratio in GET /api/stats
+        set_meta(db, LESSON_COUNT_KEY, sum(len(lessons) for lessons in lesson_data.values()))
+        set_meta(db, LESSON_DATA_HASH_KEY, digest)
+        return written
+
+    written = writer.run(apply)
+    return written, time.perf_counter() - started
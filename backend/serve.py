@@ -0,0 +1,124 @@
+"""
+Production entry point for the API.
+
+    python serve.py
+
+Runs asgi.py under uvicorn or, with SERVER_MODE=wsgi, app.py under
+gunicorn's threaded workers. Neither server is a hard dependency; install
+the one you use (``pip install uvicorn`` or ``pip install gunicorn``). Like
+``python app.py``, it uses dsa_tracker.db in the working directory.
+
+ASGI is the default because it serves /api/events streams on the event
+loop. Under WSGI every open stream holds a request thread, so a few browser
+tabs could take all of them. WSGI mode therefore caps open streams per
+worker at half of SERVER_THREADS (EVENTS_MAX_SUBSCRIBERS overrides that);
+streams past the cap get a 503.
+
+Configured with environment variables:
+    SERVER_BIND              host:port to listen on (127.0.0.1:5001)
+    SERVER_MODE              asgi or wsgi (asgi)
+    SERVER_WORKERS           worker processes (1)
+    SERVER_THREADS           request threads per worker (16)
+    SERVER_KEEPALIVE         seconds an idle keep-alive connection stays open (5)
+    SERVER_GRACEFUL_TIMEOUT  seconds in-flight requests get to finish on SIGTERM (30)
+    SERVER_TIMEOUT           seconds before gunicorn restarts a stuck worker (60)
+
+Table versions live in the database (see versioning.py), so ETags match
+and cached responses are checked against the same counters in every
+worker. Each worker's writer notices the others' commits within
+DB_WATCH_INTERVAL seconds (default 0.25) and only then pushes them to its
+own /api/events streams. Autosaves are buffered per worker and reach the
+others when that worker flushes (PROGRESS_FLUSH_INTERVAL).
+"""
+
+import os
+
+
+def wsgi_stream_limit(threads):
+    """Event streams a WSGI worker accepts: half its threads stay free for requests"""
+    return threads // 2
+
+
+def settings():
+    return {
+        'bind': os.environ.get('SERVER_BIND', '127.0.0.1:5001'),
+        'mode': os.environ.get('SERVER_MODE', 'asgi'),
+        'workers': int(os.environ.get('SERVER_WORKERS', 1)),
+        'threads': int(os.environ.get('SERVER_THREADS', 16)),
+        'keepalive': int(os.environ.get('SERVER_KEEPALIVE', 5)),
+        'graceful_timeout': int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30)),
+        'timeout': int(os.environ.get('SERVER_TIMEOUT', 60)),
+    }
+
+
+def end_event_streams_on_exit(worker):
+    """Close the event bus as soon as a worker is told to stop"""
+    import app
+    app.event_bus.install_signal_handler()
+
+
+def serve_wsgi(config):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit('gunicorn is not installed (pip install gunicorn)') from None
+
+    options = {
+        'bind': [config['bind']],
+        'workers': config['workers'],
+        'worker_class': 'gthread',
+        'threads': config['threads'],
+        'keepalive': config['keepalive'],
+        'graceful_timeout': config['graceful_timeout'],
+        'timeout': config['timeout'],
+        # The writer thread, connection pool and runner have to start in each
+        # worker, after the fork
+        'preload_app': False,
+        'post_worker_init': end_event_streams_on_exit,
+    }
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import app
+            return app.app
+
+    Server().run()
+
+
+def serve_asgi(config):
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit('uvicorn is not installed (pip install uvicorn)') from None
+
+    host, port = config['bind'].rsplit(':', 1)
+    uvicorn.run(
+        'asgi:application',
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=host,
+        port=int(port),
+        workers=config['workers'],
+        timeout_keep_alive=config['keepalive'],
+        timeout_graceful_shutdown=config['graceful_timeout'],
+        lifespan='on',
+        access_log=False,
+    )
+
+
+def main():
+    config = settings()
+    if config['mode'] == 'asgi':
+        serve_asgi(config)
+    elif config['mode'] == 'wsgi':
+        os.environ.setdefault('EVENTS_MAX_SUBSCRIBERS', str(wsgi_stream_limit(config['threads'])))
+        serve_wsgi(config)
+    else:
+        raise SystemExit(f"Unknown SERVER_MODE {config['mode']!r} (expected wsgi or asgi)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Dashboard statistics from the trigger-maintained summary tables.
+
+migrations.add_stats_tables keeps per-(category, difficulty) problem counts,
+per-day activity and single counters up to date on every write, so reading
+the dashboard costs O(categories + active days) however many problems and
+progress rows there are. ``rebuild_stats`` recomputes the summaries from the
+source tables and reports any drift it corrected.
+
+A user shard (see tenants.py) has no stats_problems: the per-category
+totals come from the catalog's and the user's solved counts from a join
+of their completed progress with the catalog, which costs
+O(problems solved) rather than O(problems).
+"""
+
+from datetime import date, timedelta
+
+from seeding import LESSON_COUNT_KEY
+
+DIFFICULTY_ORDER = ('Easy', 'Medium', 'Hard')
+
+RECENT_ACTIVITY_DAYS = 30
+
+# (table, key columns, SELECT producing the table from the source tables)
+SUMMARIES = (
+    ('stats_problems', ('category', 'difficulty'), '''
+        SELECT p.category, p.difficulty, COUNT(*), COUNT(up.problem_id)
+        FROM problems p
+        LEFT JOIN user_progress up ON up.problem_id = p.id AND up.completed = 1
+        GROUP BY p.category, p.difficulty
+    '''),
+    ('stats_activity', ('day',), '''
+        SELECT day, SUM(problems_solved), SUM(lessons_completed) FROM (
+            SELECT date(COALESCE(completed_at, last_attempted)) AS day,
+                   1 AS problems_solved, 0 AS lessons_completed
+            FROM user_progress WHERE completed = 1
+            UNION ALL
+            SELECT date(completed_at), 0, 1 FROM lesson_completion
+        )
+        WHERE day IS NOT NULL
+        GROUP BY day
+    '''),
+    ('stats_counters', ('name',), '''
+        SELECT 'lessons_completed', COUNT(*) FROM lesson_completion
+    '''),
+)
+
+
+PROBLEM_ROWS = 'SELECT category, difficulty, total, solved FROM stats_problems WHERE total > 0'
+
+SHARD_PROBLEM_ROWS = '''
+    SELECT s.category, s.difficulty, s.total, COALESCE(mine.solved, 0) AS solved
+    FROM catalog.stats_problems s
+    LEFT JOIN (
+        SELECT p.category, p.difficulty, COUNT(*) AS solved
+        FROM user_progress up
+        JOIN catalog.problems p ON p.id = up.problem_id
+        WHERE up.completed = 1
+        GROUP BY p.category, p.difficulty
+    ) mine ON mine.category = s.category AND mine.difficulty = s.difficulty
+    WHERE s.total > 0
+'''
+
+
+def _summary_rows(db, table, keys):
+    """Rows of a summary table by key, leaving out all-zero rows"""
+    rows = {}
+    for row in db.execute(f'SELECT * FROM {table}'):
+        row = tuple(row)
+        if any(row[len(keys):]):
+            rows[row[:len(keys)]] = row[len(keys):]
+    return rows
+
+
+def rebuild_stats(db):
+    """Recompute every summary table; returns the keys that had drifted.
+
+    Runs on the writer, so nothing changes between the comparison and the
+    rewrite.
+    """
+    drifted = []
+    for table, keys, select in SUMMARIES:
+        before = _summary_rows(db, table, keys)
+        db.execute(f'DELETE FROM {table}')
+        db.execute(f'INSERT INTO {table} {select}')
+        after = _summary_rows(db, table, keys)
+        for key in sorted(before.keys() | after.keys()):
+            if before.get(key) != after.get(key):
+                drifted.append((table, *key))
+    return drifted
+
+
+def _ratio(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def streaks(days, today):
+    """(current, longest) runs of consecutive active days.
+
+    The current streak still counts when the last active day was yesterday,
+    since today isn't over.
+    """
+    current = longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    if previous is not None and today - previous <= timedelta(days=1):
+        current = run
+    return current, longest
+
+
+def get_stats(db, today=None, shard=False):
+    """Dashboard statistics as a dict (see GET /api/stats)"""
+    today = today or date.today()
+
+    db.execute('BEGIN')
+    try:
+        problem_rows = db.execute(SHARD_PROBLEM_ROWS if shard else PROBLEM_ROWS).fetchall()
+        activity_rows = db.execute('''
+            SELECT day, problems_solved, lessons_completed FROM stats_activity
+            WHERE problems_solved > 0 OR lessons_completed > 0
+            ORDER BY day
+        ''').fetchall()
+        counter = db.execute(
+            "SELECT value FROM stats_counters WHERE name = 'lessons_completed'"
+        ).fetchone()
+        lesson_count = db.execute(
+            'SELECT value FROM app_meta WHERE key = ?', (LESSON_COUNT_KEY,)
+        ).fetchone()
+    finally:
+        db.execute('COMMIT')
+
+    by_category = {}
+    by_difficulty = {}
+    for row in problem_rows:
+        for groups, name in ((by_category, row['category']), (by_difficulty, row['difficulty'])):
+            group = groups.setdefault(name, {'total': 0, 'solved': 0})
+            group['total'] += row['total']
+            group['solved'] += row['solved']
+
+    def summarize(groups, label, order):
+        return [
+            {label: name, **counts, 'ratio': _ratio(counts['solved'], counts['total'])}
+            for name, counts in sorted(groups.items(), key=order)
+        ]
+
+    total = sum(group['total'] for group in by_category.values())
+    solved = sum(group['solved'] for group in by_category.values())
+    lessons_completed = counter[0] if counter else 0
+    lessons_total = int(lesson_count[0]) if lesson_count else None
+
+    days = [date.fromisoformat(row['day']) for row in activity_rows]
+    current, longest = streaks(days, today)
+    since = (today - timedelta(days=RECENT_ACTIVITY_DAYS - 1)).isoformat()
+
+    return {
+        'problems': {'total': total, 'solved': solved, 'ratio': _ratio(solved, total)},
+        'by_category': summarize(by_category, 'category', lambda item: item[0]),
+        'by_difficulty': summarize(
+            by_difficulty, 'difficulty',
+            lambda item: (DIFFICULTY_ORDER.index(item[0]) if item[0] in DIFFICULTY_ORDER
+                          else len(DIFFICULTY_ORDER), item[0]),
+        ),
+        'lessons': {
+            'completed': lessons_completed,
+            'total': lessons_total,
+            'ratio': _ratio(lessons_completed, lessons_total),
+        },
+        'streak': {
+            'current': current,
+            'longest': longest,
+            'last_active': days[-1].isoformat() if days else None,
+        },
+        'recent_activity': [
+            {
+                'day': row['day'],
+                'problems_solved': row['problems_solved'],
+                'lessons_completed': row['lessons_completed'],
+            }
+            for row in activity_rows if row['day'] >= since
+        ],
+    }
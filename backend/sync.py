@@ -0,0 +1,165 @@
+"""
+Delta sync over the trigger-maintained change_log (see migrations.add_change_log).
+
+A client keeps the ``next_since`` of its last sync and asks for the changes
+after it: current rows for inserts and updates, tombstones for deletes. The
+log holds only the latest change per row, so a sync costs O(rows changed
+since), however often they changed. Tombstones older than a retention
+window can be pruned; clients whose position predates the pruned range get
+``reset: true`` and must start over from zero.
+
+A client that loads everything through the regular endpoints instead can
+ask for ``since=None`` ("now") first: an empty page whose next_since is the
+current end of the log. Pulling from there later may repeat changes that
+its reads already saw, but never misses one.
+"""
+
+from migrations import CATALOG_TABLES
+from serialization import dumps, encode_row
+
+PRUNED_SEQ_KEY = 'change_log_pruned_seq'
+
+DEFAULT_SYNC_LIMIT = 1000
+MAX_SYNC_LIMIT = 5000
+
+
+def pruned_seq(db):
+    row = db.execute('SELECT value FROM app_meta WHERE key = ?', (PRUNED_SEQ_KEY,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def _read_changes(db, since, limit, schema='main', tables=None):
+    """Log entries after ``since`` (at most ``limit``), whether there are more,
+    and the current rows behind their upserts.
+    """
+    tables = tables or ()
+    only = f"AND table_name IN ({', '.join('?' for _ in tables)})" if tables else ''
+    entries = db.execute(f'''
+        SELECT seq, table_name, row_id, op FROM {schema}.change_log
+        WHERE seq > ? {only}
+        ORDER BY seq
+        LIMIT ?
+    ''', (since, *tables, limit + 1)).fetchall()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # One query per table for the rows behind this page's upserts
+    upserts = {}
+    for entry in entries:
+        if entry['op'] == 'upsert':
+            upserts.setdefault(entry['table_name'], []).append(entry['row_id'])
+    rows = {}
+    for table, ids in upserts.items():
+        placeholders = ', '.join('?' for _ in ids)
+        for row in db.execute(f'SELECT * FROM {schema}.{table} WHERE id IN ({placeholders})', ids):
+            rows[table, row['id']] = row
+    return entries, has_more, rows
+
+
+def _head(db, schema='main'):
+    """The newest position in the log"""
+    return db.execute(f'SELECT COALESCE(MAX(seq), 0) FROM {schema}.change_log').fetchone()[0]
+
+
+def _encode_changes(entries, rows):
+    parts = []
+    for entry in entries:
+        head = (b'{"seq":' + str(entry['seq']).encode()
+                + b',"table":' + dumps(entry['table_name']))
+        row = rows.get((entry['table_name'], entry['row_id']))
+        if entry['op'] == 'upsert' and row is not None:
+            parts.append(head + b',"op":"upsert","row":' + encode_row(dict(row)) + b'}')
+        else:
+            parts.append(head + b',"op":"delete","id":' + dumps(entry['row_id']) + b'}')
+    return parts
+
+
+def _response(parts, has_more, next_since):
+    return (b'{"changes":[' + b','.join(parts) + b'],"has_more":'
+            + (b'true' if has_more else b'false')
+            + b',"next_since":' + next_since + b',"reset":false}')
+
+
+def changes_since(db, since, limit=DEFAULT_SYNC_LIMIT, tables=None):
+    """Encoded sync response for changes after ``since``, oldest first.
+
+    ``since=None`` returns no changes, just the current position. ``tables``
+    limits the changes to those tables. Reads the log and the changed rows
+    in one snapshot, so a page never mixes states from before and after a
+    concurrent write.
+    """
+    db.execute('BEGIN')
+    try:
+        if since is None:
+            return _response([], False, str(_head(db)).encode())
+        if 0 < since < pruned_seq(db):
+            return b'{"changes":[],"has_more":false,"next_since":0,"reset":true}'
+        entries, has_more, rows = _read_changes(db, since, limit, tables=tables)
+    finally:
+        db.execute('COMMIT')
+
+    next_since = entries[-1]['seq'] if entries else since
+    return _response(_encode_changes(entries, rows), has_more, str(next_since).encode())
+
+
+def parse_shard_since(value):
+    """(catalog seq, shard seq) from a shard sync position like "120.45" ("0" to start)"""
+    if value in (None, '', '0'):
+        return 0, 0
+    catalog_since, shard_since = value.split('.')
+    return max(int(catalog_since), 0), max(int(shard_since), 0)
+
+
+def shard_changes_since(db, since, limit=DEFAULT_SYNC_LIMIT, tables=None):
+    """Sync response for a user shard (see tenants.py), oldest first per log.
+
+    The shard and the attached catalog keep separate logs, so the position
+    is a (catalog seq, shard seq) pair, returned as the string
+    "catalog.shard" in next_since; ``since=None`` returns just the current
+    pair. Each page holds catalog problem changes first, then the user's
+    own. Only the catalog's tombstones are pruned.
+    """
+    catalog_tables = [t for t in tables or CATALOG_TABLES if t in CATALOG_TABLES]
+    shard_tables = [t for t in tables if t not in CATALOG_TABLES] if tables else None
+    db.execute('BEGIN')
+    try:
+        if since is None:
+            return _response([], False, dumps(f"{_head(db, 'catalog')}.{_head(db)}"))
+        catalog_since, shard_since = since
+        if 0 < catalog_since < pruned_seq(db):
+            return b'{"changes":[],"has_more":false,"next_since":"0","reset":true}'
+        catalog_entries, catalog_more, catalog_rows = [], False, {}
+        if catalog_tables:
+            catalog_entries, catalog_more, catalog_rows = _read_changes(
+                db, catalog_since, limit, 'catalog', catalog_tables)
+        shard_entries, shard_more, shard_rows = [], False, {}
+        if shard_tables != []:
+            shard_entries, shard_more, shard_rows = _read_changes(
+                db, shard_since, limit - len(catalog_entries), tables=shard_tables)
+    finally:
+        db.execute('COMMIT')
+
+    if catalog_entries:
+        catalog_since = catalog_entries[-1]['seq']
+    if shard_entries:
+        shard_since = shard_entries[-1]['seq']
+    parts = _encode_changes(catalog_entries, catalog_rows) + _encode_changes(shard_entries, shard_rows)
+    return _response(parts, catalog_more or shard_more, dumps(f'{catalog_since}.{shard_since}'))
+
+
+def prune_tombstones(db, days):
+    """Drop delete entries older than ``days``; returns how many were removed"""
+    cutoff = db.execute('''
+        SELECT MAX(seq) FROM change_log
+        WHERE op = 'delete' AND changed_at < datetime('now', ?)
+    ''', (f'-{days} days',)).fetchone()[0]
+    if cutoff is None:
+        return 0
+    removed = db.execute(
+        "DELETE FROM change_log WHERE op = 'delete' AND seq <= ?", (cutoff,)
+    ).rowcount
+    db.execute('''
+        INSERT INTO app_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = MAX(CAST(value AS INTEGER), excluded.value)
+    ''', (PRUNED_SEQ_KEY, cutoff))
+    return removed
@@ -0,0 +1,310 @@
+"""
+User accounts and per-user SQLite shards.
+
+With USER_SHARD_DIRS set, every account gets a database file of its own for
+the tables that belong to one user: progress, notes, resources, settings,
+categories, lesson completions, the review schedule and attempt history.
+The file is placed in one of the shard directories by a hash of the user
+id when the account is created, so adding a directory spreads new users
+over it while existing ones stay where they are. Each open shard has its
+own writer thread and its own file lock, so one user's writes never wait
+on another's.
+
+The problems catalog, lessons and the users table stay in the main
+database, which shard readers ATTACH as ``catalog``. A shard has no
+problems table, so an unqualified ``problems`` in existing queries
+resolves to the catalog. Shard writers don't attach it (see
+db.DatabaseWriter), and nothing a shard writer runs touches the catalog.
+
+Open shards are kept in a bounded LRU; one that falls out is flushed and
+closed as soon as no request holds it.
+"""
+
+import hashlib
+import os
+import secrets
+import signal
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# The main database's single-user tables, in the order a new shard adopts them
+ADOPTED_TABLES = (
+    'user_settings',
+    'custom_categories',
+    'lesson_completion',
+    'resources',
+    'notes',
+    'user_progress',
+    'review_schedule',
+    'code_blobs',
+    'attempt_history',
+)
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def bearer_token(authorization):
+    """The token from an ``Authorization: Bearer <token>`` header value, or None"""
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    return token.strip() or None
+
+
+def shard_path(user_id, shard_dirs):
+    """Database file for a new user: a shard directory picked by hashing the id"""
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    directory = shard_dirs[int.from_bytes(digest, 'big') % len(shard_dirs)]
+    return os.path.join(directory, f'user-{user_id}.db')
+
+
+def create_user(db, username, shard_dirs, is_admin=False):
+    """Add an account (runs on the catalog writer); returns (id, shard path, token).
+
+    The token is only ever returned here; the table keeps its hash.
+    """
+    token = secrets.token_urlsafe(32)
+    user_id = db.execute(
+        'INSERT INTO users (username, token_hash, is_admin) VALUES (?, ?, ?)',
+        (username, hash_token(token), int(is_admin)),
+    ).lastrowid
+    path = shard_path(user_id, shard_dirs)
+    db.execute('UPDATE users SET shard_path = ? WHERE id = ?', (path, user_id))
+    return user_id, path, token
+
+
+def adopt_user_tables(shard, catalog, busy_timeout=5000):
+    """Replace a new shard's user tables with the main database's single-user data.
+
+    For moving an existing install to accounts. Uses its own connection,
+    since the shard writer never attaches the catalog; the catalog is only
+    read.
+    """
+    conn = sqlite3.connect(shard, isolation_level=None)
+    try:
+        conn.execute(f'PRAGMA busy_timeout = {busy_timeout}')
+        conn.execute('ATTACH DATABASE ? AS catalog', (catalog,))
+        # Deferred, so only the shard is locked for writing
+        conn.execute('BEGIN')
+        try:
+            counts = {}
+            for table in ADOPTED_TABLES:
+                columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA main.table_info({table})'))
+                conn.execute(f'DELETE FROM main.{table}')
+                counts[table] = conn.execute(
+                    f'INSERT INTO main.{table} ({columns}) SELECT {columns} FROM catalog.{table}'
+                ).rowcount
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return counts
+    finally:
+        conn.close()
+
+
+class UserDirectory:
+    """Token lookups against the catalog's users table, cached in memory"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._by_token = {}
+
+    def authenticate(self, token):
+        """The account (id, username, shard_path, is_admin) for an API token, or None"""
+        if not token:
+            return None
+        token_hash = hash_token(token)
+        with self._lock:
+            user = self._by_token.get(token_hash)
+        if user is not None:
+            return user
+
+        db = self.pool.acquire()
+        try:
+            row = db.execute(
+                'SELECT id, username, shard_path, is_admin FROM users WHERE token_hash = ?',
+                (token_hash,),
+            ).fetchone()
+        finally:
+            self.pool.release(db)
+        if row is None:
+            return None
+        user = dict(row)
+        with self._lock:
+            self._by_token[token_hash] = user
+        return user
+
+
+class Tenant:
+    """The pool, writer, table versions and progress buffer of one database"""
+
+    def __init__(self, user_id, pool, writer, versions, progress_buffer):
+        self.user_id = user_id  # None for the main database
+        self.pool = pool
+        self.writer = writer
+        self.versions = versions
+        self.progress_buffer = progress_buffer
+        # Cache keys are scoped to this opening rather than just the user, so
+        # no entry outlives the shard file it was built from
+        self.cache_scope = '' if user_id is None else f'{user_id}-{secrets.token_hex(4)}:'
+        self.active = 0
+
+    @property
+    def sharded(self):
+        return self.user_id is not None
+
+    def close(self):
+        self.progress_buffer.close()
+        self.writer.stop()
+        self.pool.close_all()
+
+
+class TenantRegistry:
+    """Open user shards, least recently used first, at most ``max_open`` of them.
+
+    ``open_tenant(user)`` builds a user's Tenant. Requests hold their shard
+    between acquire() and release(); a shard in use is never closed, so
+    the registry can briefly exceed ``max_open`` under load. Neither is a
+    shard whose buffered progress can't be written: it stays open, buffer
+    and all, until a later eviction manages to flush it.
+    """
+
+    def __init__(self, open_tenant, max_open=64):
+        self.open_tenant = open_tenant
+        self.max_open = max_open
+
+        self._lock = threading.Lock()
+        self._tenants = OrderedDict()
+        # Held while a user's shard is being opened or closed; dropped with
+        # the shard, so only users with an open shard have one
+        self._user_locks = {}
+        self._stats = {
+            'hits': 0,
+            'opens': 0,
+            'evictions': 0,
+            'failed_evictions': 0,
+        }
+
+    def acquire(self, user):
+        """The user's open shard, opening it if needed; release() it when done"""
+        user_id = user['id']
+        while True:
+            with self._lock:
+                tenant = self._tenants.get(user_id)
+                if tenant is not None:
+                    tenant.active += 1
+                    self._tenants.move_to_end(user_id)
+                    self._stats['hits'] += 1
+                    return tenant
+                user_lock = self._user_locks.setdefault(user_id, threading.Lock())
+
+            with user_lock:
+                with self._lock:
+                    if self._user_locks.get(user_id) is not user_lock:
+                        continue  # the shard was closed meanwhile; take the new lock
+                    if user_id in self._tenants:
+                        continue  # opened by another request meanwhile
+                try:
+                    tenant = self.open_tenant(user)
+                except Exception:
+                    with self._lock:
+                        del self._user_locks[user_id]
+                    raise
+                with self._lock:
+                    tenant.active = 1
+                    self._tenants[user_id] = tenant
+                    self._stats['opens'] += 1
+            self._evict()
+            return tenant
+
+    def release(self, tenant):
+        with self._lock:
+            tenant.active -= 1
+        self._evict()
+
+    def _evict(self):
+        """Close idle shards, least recently used first, while over ``max_open``"""
+        kept = set()
+        while True:
+            with self._lock:
+                if len(self._tenants) <= self.max_open:
+                    return
+                for user_id, tenant in self._tenants.items():
+                    if (tenant.active == 0 and user_id not in kept
+                            and self._user_locks[user_id].acquire(blocking=False)):
+                        break
+                else:
+                    return
+                del self._tenants[user_id]
+            # A request for this user waits on its lock until the close is done
+            user_lock = self._user_locks[user_id]
+            try:
+                tenant.progress_buffer.flush()
+            except Exception as e:
+                # Keep the shard, and with it the buffered progress
+                print(f"Warning: keeping the shard of user {user_id} open, flushing it failed: {e}")
+                with self._lock:
+                    self._tenants[user_id] = tenant
+                    self._stats['failed_evictions'] += 1
+                kept.add(user_id)
+                user_lock.release()
+                continue
+            try:
+                tenant.close()
+            except Exception as e:
+                print(f"Warning: closing the shard of user {user_id} failed: {e}")
+            with self._lock:
+                del self._user_locks[user_id]
+                self._stats['evictions'] += 1
+            user_lock.release()
+
+    def flush(self):
+        """Write every open shard's buffered progress"""
+        with self._lock:
+            tenants = list(self._tenants.values())
+        for tenant in tenants:
+            tenant.progress_buffer.flush()
+
+    def close_all(self):
+        """Flush and close every open shard (at shutdown)"""
+        with self._lock:
+            tenants, self._tenants = list(self._tenants.values()), OrderedDict()
+        for tenant in tenants:
+            try:
+                tenant.close()
+            except Exception as e:
+                print(f"Warning: closing the shard of user {tenant.user_id} failed: {e}")
+
+    def install_signal_handler(self, signum=signal.SIGTERM):
+        """Flush every open shard before the process is terminated by ``signum``.
+
+        Only possible from the main thread; elsewhere this is a no-op.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signum)
+
+        def handler(received, frame):
+            try:
+                self.flush()
+            finally:
+                if callable(previous):
+                    previous(received, frame)
+                else:
+                    signal.signal(received, previous or signal.SIG_DFL)
+                    os.kill(os.getpid(), received)
+
+        signal.signal(signum, handler)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open'] = len(self._tenants)
+            stats['active'] = sum(1 for tenant in self._tenants.values() if tenant.active)
+        stats['max_open'] = self.max_open
+        return stats
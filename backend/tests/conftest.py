@@ -0,0 +1,65 @@
+import os
+import sqlite3
+
+import pytest
+
+from db import ConnectionPool, DatabaseWriter, configure_database
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'test.db')
+    configure_database(path)
+    return path
+
+
+@pytest.fixture
+def writer(db_path):
+    writer = DatabaseWriter(db_path)
+    yield writer
+    writer.stop()
+
+
+@pytest.fixture
+def pool(db_path):
+    pool = ConnectionPool(db_path, max_size=2, timeout=0.2)
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def connect(db_path):
+    """Open extra plain connections to the test database"""
+    conns = []
+
+    def open_connection():
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conns.append(conn)
+        return conn
+
+    yield open_connection
+    for conn in conns:
+        conn.close()
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    """The app module, started against a fresh database in a temporary directory.
+
+    app.py opens dsa_tracker.db relative to the working directory (lazily,
+    from the pool and the writer thread), so the session stays in that
+    directory and all app tests share one database; they use their own rows.
+    """
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    os.environ.setdefault('PROGRESS_FLUSH_INTERVAL', '3600')
+    import app
+    yield app
+    app.catalog_progress_buffer.flush()
+    os.chdir(cwd)
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
@@ -0,0 +1,20 @@
+def test_problem_crud_roundtrip(client):
+    created = client.post('/api/problems', json={
+        'title': 'Two Sum', 'category': 'Arrays', 'difficulty': 'Easy', 'description': 'd',
+    })
+    assert created.status_code == 201
+    problem_id = created.get_json()['id']
+
+    assert client.get(f'/api/problems/{problem_id}').get_json()['title'] == 'Two Sum'
+    assert client.put(f'/api/problems/{problem_id}', json={
+        'title': 'Two Sum II', 'category': 'Arrays', 'difficulty': 'Medium',
+    }).status_code == 200
+    assert client.get(f'/api/problems/{problem_id}').get_json()['difficulty'] == 'Medium'
+
+    assert client.delete(f'/api/problems/{problem_id}').status_code == 200
+    assert client.get(f'/api/problems/{problem_id}').status_code == 404
+
+
+def test_settings_update(client):
+    assert client.put('/api/settings', json={'appName': 'Tracker'}).status_code == 200
+    assert client.get('/api/settings').get_json()['app_name'] == 'Tracker'
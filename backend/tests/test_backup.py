@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from backup import ImportFormatError, import_ndjson
+
+
+def export(client, tables=None):
+    url = '/api/export' + (f'?tables={tables}' if tables else '')
+    return client.get(url).get_data()
+
+
+def records(body):
+    return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+
+def test_export_import_roundtrip(api, client):
+    problem_id = client.post('/api/problems', json={
+        'title': 'Roundtrip', 'category': 'Graphs', 'difficulty': 'Hard', 'testCases': [{'input': [1]}],
+    }).get_json()['id']
+    client.post(f'/api/progress/{problem_id}', json={
+        'user_code': 'done', 'completed': 1, 'completed_at': '2026-02-01T00:00:00',
+    })
+    client.post('/api/notes', json={'noteTitle': 'roundtrip note', 'noteContent': 'body'})
+    body = export(client)
+
+    response = client.post('/api/import', data=body)
+    assert response.status_code == 200
+    imported = response.get_json()['imported']
+    assert imported['problems'] >= 1 and imported['user_progress'] >= 1
+    assert records(export(client)) == records(body)
+
+
+def test_import_is_all_or_nothing(api, client):
+    before = export(client, 'notes')
+    body = b'\n'.join([
+        json.dumps({'table': 'notes', 'row': {'note_title': 'partial', 'note_content': 'x'}}).encode(),
+        b'{"table": "notes", "row": {"bogus": 1}}',
+    ])
+    response = client.post('/api/import', data=body)
+    assert response.status_code == 400
+    assert response.get_json()['imported'] == {}
+    assert export(client, 'notes') == before
+
+
+def test_import_rolls_back_a_failed_write(writer, connect):
+    connect().executescript('''
+        CREATE TABLE notes (id INTEGER PRIMARY KEY, note_title TEXT NOT NULL);
+    ''')
+    lines = [
+        json.dumps({'table': 'notes', 'row': {'id': 1, 'note_title': 'ok'}}),
+        json.dumps({'table': 'notes', 'row': {'id': 2, 'note_title': None}}),
+    ]
+    with pytest.raises(Exception):
+        import_ndjson(lines, writer, {'notes': ['id', 'note_title']}, batch_size=1)
+    assert connect().execute('SELECT COUNT(*) FROM notes').fetchone()[0] == 0
+
+
+def test_import_reports_the_bad_line(writer):
+    with pytest.raises(ImportFormatError) as raised:
+        import_ndjson(['', '{"table": "nope", "row": {}}'], writer, {'notes': ['id']})
+    assert raised.value.line_number == 2
+
+
+def test_import_invalidates_cached_reads(client):
+    before = client.get('/api/notes')
+    body = json.dumps({'table': 'notes', 'row': {'note_title': 'imported note', 'note_content': 'x'}})
+    assert client.post('/api/import', data=body).status_code == 200
+
+    after = client.get('/api/notes', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert 'imported note' in [note['note_title'] for note in after.get_json()]
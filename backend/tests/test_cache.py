@@ -0,0 +1,30 @@
+from cache import ResponseCache
+
+
+def test_entries_are_only_served_at_the_versions_they_were_built_at():
+    cache = ResponseCache()
+    cache.set('/api/notes?', b'[]', 'application/json', ('notes',), (1,))
+    assert cache.get('/api/notes?', (1,)).body == b'[]'
+    assert cache.get('/api/notes?', (2,)) is None
+    assert cache.get('/api/notes?', (1,)) is None
+
+
+def test_invalidate_drops_entries_built_from_the_table():
+    cache = ResponseCache()
+    cache.set('/api/notes?', b'[]', 'application/json', ('notes',), (1,))
+    cache.set('/api/resources?', b'[]', 'application/json', ('resources',), (1,))
+    cache.invalidate('notes')
+    assert cache.get('/api/notes?', (1,)) is None
+    assert cache.get('/api/resources?', (1,)) is not None
+
+
+def test_limits_evict_least_recently_used():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.set('a', b'1234', 'application/json', ('notes',), (1,))
+    cache.set('b', b'1234', 'application/json', ('notes',), (1,))
+    cache.get('a', (1,))
+    cache.set('c', b'1234', 'application/json', ('notes',), (1,))
+    assert cache.get('b', (1,)) is None
+    assert cache.get('a', (1,)) is not None
+    cache.set('d', b'123456789', 'application/json', ('notes',), (1,))
+    assert cache.stats()['bytes'] <= 10
@@ -0,0 +1,54 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db import PoolTimeout
+
+
+def test_pool_reuses_the_released_connection(pool):
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_pool_times_out_when_exhausted(pool):
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(held.pop())
+    assert pool.acquire() is not None
+
+
+def test_pool_rolls_back_open_transactions_on_release(pool, writer):
+    writer.execute('CREATE TABLE t (x INTEGER)')
+    conn = pool.acquire()
+    conn.execute('BEGIN')
+    conn.execute('SELECT * FROM t').fetchall()
+    pool.release(conn)
+    assert not conn.in_transaction
+
+
+def test_writer_isolates_a_failing_job_in_its_batch(writer, connect):
+    writer.execute('CREATE TABLE t (x INTEGER UNIQUE)')
+    gate = threading.Event()
+    # Hold the writer so the next three jobs are committed as one batch
+    blocker = writer.submit(lambda conn: gate.wait(5))
+    ok = writer.submit(lambda conn: conn.execute('INSERT INTO t VALUES (1)'))
+    bad = writer.submit(lambda conn: conn.execute('INSERT INTO t VALUES (1)'))
+    also_ok = writer.submit(lambda conn: conn.execute('INSERT INTO t VALUES (2)'))
+    gate.set()
+    blocker.result(5)
+    ok.result(5)
+    also_ok.result(5)
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(5)
+    rows = connect().execute('SELECT x FROM t ORDER BY x').fetchall()
+    assert [r['x'] for r in rows] == [1, 2]
+
+
+def test_writer_run_cannot_be_nested(writer):
+    with pytest.raises(RuntimeError):
+        writer.run(lambda conn: writer.run(lambda inner: None))
@@ -0,0 +1,45 @@
+from grading import TIMED_OUT, GradingQueue
+
+
+class FakeRunner:
+    """Passes every submission except those that spin, which time out"""
+
+    size = 1
+
+    def __init__(self):
+        self.runs = 0
+
+    def run_batch(self, codes, test_cases):
+        self.runs += len(codes)
+        return [self._verdict(code) for code in codes]
+
+    def run(self, code, test_cases):
+        return self.run_batch([code], test_cases)[0]
+
+    def _verdict(self, code):
+        error = TIMED_OUT if 'while (true)' in code else None
+        return {'ok': True, 'error': None, 'passed': error is None,
+                'results': [{'case': 1, 'error': error, 'passed': error is None}]}
+
+
+def make_queue():
+    runner = FakeRunner()
+    return runner, GradingQueue(runner, lambda problem_id: '[{"input": {}, "expected": 1}]')
+
+
+def test_verdicts_are_cached():
+    runner, grading = make_queue()
+    fixture = grading.fixture('p1')
+    assert not grading.grade(fixture, 'function f() { return 1 }')['cached']
+    assert grading.grade(fixture, 'function f() { return 1 }')['cached']
+    assert runner.runs == 1
+
+
+def test_timed_out_verdicts_are_graded_again():
+    runner, grading = make_queue()
+    fixture = grading.fixture('p1')
+    for _ in range(2):
+        verdict = grading.grade(fixture, 'function f() { while (true) {} }')
+        assert not verdict['cached'] and not verdict['passed']
+    assert runner.runs == 2
+    assert grading.stats()['uncached_timeouts'] == 2
@@ -0,0 +1,136 @@
+import re
+import sqlite3
+
+from history import load_code
+from migrations import MIGRATIONS, REVIEW_TIME_FORMAT, SYNC_TABLES, VERSIONED_TABLES
+
+
+def test_change_log_triggers_look_rows_up_by_index(api, client):
+    # EXPLAIN QUERY PLAN doesn't descend into triggers, so plan each
+    # trigger's DELETE on its own, with new.id/old.id standing in as a
+    # subquery on the same INTEGER column
+    assert client.get('/api/settings').status_code == 200
+    db = sqlite3.connect(api.DATABASE)
+    try:
+        for table in SYNC_TABLES:
+            for trigger in ('ai', 'ad'):
+                sql = db.execute('SELECT sql FROM sqlite_master WHERE name = ?',
+                                 (f'{table}_changes_{trigger}',)).fetchone()[0]
+                delete = re.search(r'DELETE FROM change_log [^;]*', sql).group(0)
+                delete = re.sub(r'\b(new|old)\.id\b', f'(SELECT id FROM {table} LIMIT 1)', delete)
+                plan = ' '.join(row[3] for row in db.execute('EXPLAIN QUERY PLAN ' + delete))
+                assert 'idx_change_log_row (table_name=? AND row_id=?)' in plan, (table, plan)
+    finally:
+        db.close()
+
+
+# The schema before migrations existed (the original init_db)
+BASELINE_SCHEMA = '''
+    CREATE TABLE problems (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        category TEXT NOT NULL,
+        difficulty TEXT NOT NULL,
+        description TEXT,
+        platform TEXT,
+        is_lesson_exercise INTEGER DEFAULT 0,
+        lesson_id TEXT,
+        starter_code TEXT,
+        solution TEXT,
+        test_cases TEXT,
+        time_complexity TEXT,
+        space_complexity TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE user_progress (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        problem_id TEXT NOT NULL,
+        user_code TEXT,
+        completed INTEGER DEFAULT 0,
+        completed_at TIMESTAMP,
+        last_attempted TIMESTAMP,
+        FOREIGN KEY (problem_id) REFERENCES problems(id)
+    );
+    CREATE TABLE lesson_completion (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        lesson_id TEXT NOT NULL UNIQUE,
+        completed_at TIMESTAMP
+    );
+    CREATE TABLE resources (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        resource_name TEXT NOT NULL,
+        resource_type TEXT NOT NULL,
+        resource_link TEXT,
+        data_structure TEXT,
+        is_favorite INTEGER DEFAULT 0,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        note_title TEXT NOT NULL,
+        note_content TEXT,
+        data_structure TEXT,
+        tags TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE user_settings (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        app_name TEXT DEFAULT 'Study Tracker',
+        study_subject TEXT DEFAULT 'Data Structures & Algorithms',
+        category_label TEXT DEFAULT 'Topic',
+        category_label_plural TEXT DEFAULT 'Topics',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE custom_categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        display_order INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    INSERT INTO user_settings (id) VALUES (1);
+    INSERT INTO problems (id, title, category, difficulty, test_cases)
+    VALUES ('p1', 'Two Sum', 'Arrays', 'Easy', '[ {"input": [1, 2], "expected": 3} ]');
+    INSERT INTO user_progress (problem_id, user_code, completed, completed_at, last_attempted) VALUES
+        ('p1', 'old', 0, NULL, '2024-01-01T09:00:00'),
+        ('p1', 'new', 1, '2024-01-02T09:00:00', '2024-01-02T09:00:00');
+    INSERT INTO notes (note_title, note_content) VALUES ('Sliding window', 'two pointers');
+'''
+
+
+def test_upgrade_from_the_baseline_schema(api, connect, writer):
+    connect().executescript(BASELINE_SCHEMA)
+
+    writer.run(api.create_tables)
+    writer.run(api.create_tables)  # and again, as on every startup
+
+    db = connect()
+    assert db.execute('PRAGMA user_version').fetchone()[0] == len(MIGRATIONS)
+    progress = db.execute('SELECT user_code, completed FROM user_progress').fetchall()
+    assert [tuple(row) for row in progress] == [('new', 1)]
+    assert db.execute("SELECT test_cases FROM problems").fetchone()[0] == '[{"input":[1,2],"expected":3}]'
+    stats = db.execute('SELECT category, difficulty, total, solved FROM stats_problems').fetchall()
+    assert [tuple(row) for row in stats] == [('Arrays', 'Easy', 1, 1)]
+    activity = db.execute('SELECT day, problems_solved FROM stats_activity').fetchall()
+    assert [tuple(row) for row in activity] == [('2024-01-02', 1)]
+    versions = db.execute('SELECT problem_id, version, completed FROM attempt_history').fetchall()
+    assert [tuple(row) for row in versions] == [('p1', 1, 1)]
+    blob_hash = db.execute('SELECT blob_hash FROM attempt_history').fetchone()[0]
+    assert load_code(db, blob_hash) == 'new'
+    # Backfilled a day after completion in local time, then converted to UTC
+    due_at, expected = db.execute(f'''
+        SELECT due_at, strftime('{REVIEW_TIME_FORMAT}', '2024-01-03T09:00:00', 'utc') FROM review_schedule
+    ''').fetchone()
+    assert due_at == expected
+    assert db.execute("SELECT rowid FROM notes_fts WHERE notes_fts MATCH 'pointer'").fetchall()
+    logged = {row[0] for row in db.execute('SELECT table_name FROM change_log')}
+    assert {'problems', 'user_progress', 'notes', 'user_settings'} <= logged
+    assert db.execute('SELECT COUNT(*) FROM table_versions').fetchone()[0] == len(VERSIONED_TABLES)
+    assert db.execute('SELECT COUNT(*) FROM table_versions_epoch').fetchone()[0] == 1
+
+    # The progress upsert works on the upgraded table
+    db.execute('''
+        INSERT INTO user_progress (problem_id, user_code) VALUES ('p1', 'newer')
+        ON CONFLICT(problem_id) DO UPDATE SET user_code = excluded.user_code
+    ''')
+    assert db.execute('SELECT COUNT(*) FROM user_progress').fetchone()[0] == 1
@@ -0,0 +1,45 @@
+def create_problem(client, title):
+    response = client.post('/api/problems', json={
+        'title': title, 'category': 'Arrays', 'difficulty': 'Easy',
+    })
+    return response.get_json()['id']
+
+
+def progress_rows(client, problem_id):
+    return [row for row in client.get('/api/progress').get_json() if row['problem_id'] == problem_id]
+
+
+def test_progress_batch_upserts_one_row_per_problem(client):
+    problem_id = create_problem(client, 'Batch upsert')
+    response = client.post('/api/progress/batch', json=[
+        {'problem_id': problem_id, 'user_code': 'first'},
+        {'problem_id': problem_id, 'user_code': 'second', 'completed': 1},
+        {'user_code': 'no problem'},
+    ])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['status'] for r in body['results']] == ['saved', 'saved', 'error']
+    assert (body['saved'], body['failed']) == (2, 1)
+
+    client.post('/api/progress/batch', json=[{'problem_id': problem_id, 'user_code': 'third', 'completed': 1}])
+    rows = progress_rows(client, problem_id)
+    assert [(row['user_code'], row['completed']) for row in rows] == [('third', 1)]
+
+
+def test_progress_save_upserts(api, client):
+    problem_id = create_problem(client, 'Single upsert')
+    for code in ('one', 'two'):
+        assert client.post(f'/api/progress/{problem_id}', json={'user_code': code}).status_code == 200
+    api.catalog_progress_buffer.flush()
+    assert [row['user_code'] for row in progress_rows(client, problem_id)] == ['two']
+
+
+def test_lesson_completion_batch_is_idempotent(client):
+    response = client.post('/api/lessons/complete/batch', json=['batch-a', 'batch-b', 'batch-a', ''])
+    assert [r['status'] for r in response.get_json()['results']] == [
+        'completed', 'completed', 'already_completed', 'error',
+    ]
+    again = client.post('/api/lessons/complete/batch', json=['batch-a', 'batch-b'])
+    assert again.get_json()['completed'] == 0
+    completed = [row['lesson_id'] for row in client.get('/api/lessons/completed').get_json()]
+    assert completed.count('batch-a') == 1 and completed.count('batch-b') == 1
@@ -0,0 +1,112 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import DatabaseWriter, configure_database
+from migrations import REVIEW_TIME_FORMAT, use_shard_utc_review_times
+from review import due_reviews, now_iso
+from writebehind import ProgressBuffer
+
+
+def create_problem(client, title='Review me'):
+    response = client.post('/api/problems', json={
+        'title': title, 'category': 'Arrays', 'difficulty': 'Easy',
+    })
+    return response.get_json()['id']
+
+
+def test_resaving_a_completed_problem_flushes(api, client):
+    problem_id = create_problem(client)
+    for code in ('first', 'second'):
+        client.post(f'/api/progress/{problem_id}', json={
+            'user_code': code, 'completed': 1, 'completed_at': '2026-01-01T10:00:00',
+        })
+        assert api.catalog_progress_buffer.flush() == 1
+
+    progress = client.get('/api/progress')
+    assert progress.status_code == 200
+    saved = [row for row in progress.get_json() if row['problem_id'] == problem_id]
+    assert saved[0]['user_code'] == 'second'
+
+    db = api.catalog_pool.acquire()
+    try:
+        due = db.execute('SELECT due_at FROM review_schedule WHERE problem_id = ?', (problem_id,)).fetchall()
+    finally:
+        api.catalog_pool.release(db)
+    assert [row['due_at'] for row in due] == ['2026-01-02T10:00:00']
+
+
+def test_shard_resaving_a_completed_problem_flushes(api, tmp_path):
+    path = str(tmp_path / 'shard.db')
+    configure_database(path)
+    writer = DatabaseWriter(path)
+    try:
+        writer.run(api.create_shard_tables)
+        buffer = ProgressBuffer(writer)
+        for code in ('first', 'second'):
+            buffer.save('p1', code, 1, '2026-01-01T10:00:00', '2026-01-01T10:00:00')
+            assert buffer.flush() == 1
+        count = writer.run(lambda db: db.execute('SELECT COUNT(*) FROM review_schedule').fetchone()[0])
+        assert count == 1
+    finally:
+        writer.stop()
+
+
+@pytest.fixture
+def non_utc_timezone(monkeypatch):
+    monkeypatch.setenv('TZ', 'Etc/GMT+5')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_review_times_are_utc_on_both_sides(api, client, non_utc_timezone):
+    problem_id = create_problem(client, 'Due in UTC')
+    client.post(f'/api/progress/{problem_id}', json={'user_code': '', 'completed': 1})
+    api.catalog_progress_buffer.flush()
+
+    db = api.catalog_pool.acquire()
+    try:
+        due_at, sqlite_now = db.execute(f'''
+            SELECT due_at, strftime('{REVIEW_TIME_FORMAT}', 'now') FROM review_schedule
+            WHERE problem_id = ?
+        ''', (problem_id,)).fetchone()
+    finally:
+        api.catalog_pool.release(db)
+    now = datetime.fromisoformat(now_iso())
+    assert abs((now - datetime.fromisoformat(sqlite_now)).total_seconds()) < 5
+    assert abs((datetime.fromisoformat(due_at) - now - timedelta(days=1)).total_seconds()) < 5
+
+    graded = client.post(f'/api/review/{problem_id}', json={'grade': 4}).get_json()
+    assert abs((datetime.fromisoformat(graded['last_reviewed_at']) - now).total_seconds()) < 5
+
+
+def test_local_review_times_are_converted(connect, non_utc_timezone):
+    db = connect()
+    db.execute('CREATE TABLE review_schedule (problem_id TEXT PRIMARY KEY, due_at TEXT, last_reviewed_at TEXT)')
+    db.execute("INSERT INTO review_schedule VALUES ('p1', '2026-01-02T10:00:00', NULL)")
+    db.execute('CREATE TABLE user_progress (problem_id TEXT, completed INTEGER, completed_at TEXT)')
+    use_shard_utc_review_times(db)
+    assert tuple(db.execute('SELECT due_at, last_reviewed_at FROM review_schedule').fetchone()) == (
+        '2026-01-02T15:00:00', None)
+
+
+def test_next_due_skips_problems_removed_from_the_catalog(api, client, tmp_path):
+    problem_id = create_problem(client, 'Still here')
+    shard = api.open_shard({'id': 1, 'shard_path': str(tmp_path / 'due.db')})
+    try:
+        shard.writer.executemany('INSERT INTO review_schedule (problem_id, due_at) VALUES (?, ?)', [
+            ('removed-from-catalog', '2099-01-01T00:00:00'),
+            (problem_id, '2099-06-01T00:00:00'),
+        ])
+        db = shard.pool.acquire()
+        try:
+            due, next_due_at = due_reviews(db, '2098-01-01T00:00:00')
+        finally:
+            shard.pool.release(db)
+        assert due == []
+        assert next_due_at == '2099-06-01T00:00:00'
+    finally:
+        shard.close()
@@ -0,0 +1,53 @@
+from search import build_match_query, search
+
+
+def test_match_query_quotes_words_and_prefixes_the_last():
+    assert build_match_query('two-sum AND "x"') == '"two" "sum" "AND" "x"*'
+    assert build_match_query('  ?! ') is None
+
+
+def test_highlights_escape_the_indexed_text(client):
+    client.post('/api/notes', json={'noteTitle': '<b>zebra</b> & co', 'noteContent': 'x'})
+    results = client.get('/api/search?q=zebra&types=notes').get_json()['results']
+    assert results[0]['title'] == '&lt;b&gt;<mark>zebra</mark>&lt;/b&gt; &amp; co'
+
+
+class DeleteAfterRanking:
+    """Connection wrapper that deletes a note once the ranking queries have run"""
+
+    def __init__(self, db, delete):
+        self.db = db
+        self.delete = delete
+        self.ranked = 0
+
+    @property
+    def in_transaction(self):
+        return self.db.in_transaction
+
+    def execute(self, sql, params=()):
+        if 'bm25' not in sql and sql.strip() not in ('BEGIN', 'COMMIT'):
+            self.delete()
+        return self.db.execute(sql, params)
+
+
+def test_rows_deleted_mid_search_still_resolve(api, client):
+    note_id = client.post('/api/notes', json={'noteTitle': 'quokka', 'noteContent': 'x'}).get_json()['id']
+
+    def delete():
+        api.catalog_writer.execute('DELETE FROM notes WHERE id = ?', (note_id,))
+
+    db = api.catalog_pool.acquire()
+    try:
+        results = search(DeleteAfterRanking(db, delete), 'quokka', ['notes'], 10, 0)
+    finally:
+        api.catalog_pool.release(db)
+    assert [result['id'] for result in results] == [note_id]
+    assert search_ids(api, 'quokka') == []
+
+
+def search_ids(api, text):
+    db = api.catalog_pool.acquire()
+    try:
+        return [result['id'] for result in search(db, text, ['notes'], 10, 0)]
+    finally:
+        api.catalog_pool.release(db)
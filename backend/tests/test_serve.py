@@ -0,0 +1,24 @@
+import serve
+
+
+def test_asgi_is_the_default_mode(monkeypatch):
+    monkeypatch.delenv('SERVER_MODE', raising=False)
+    assert serve.settings()['mode'] == 'asgi'
+
+
+def test_wsgi_mode_caps_event_streams(monkeypatch):
+    started = []
+    monkeypatch.setattr(serve, 'serve_wsgi', started.append)
+    monkeypatch.setenv('SERVER_MODE', 'wsgi')
+    monkeypatch.setenv('SERVER_THREADS', '16')
+    monkeypatch.delenv('EVENTS_MAX_SUBSCRIBERS', raising=False)
+    serve.main()
+    assert started and serve.os.environ['EVENTS_MAX_SUBSCRIBERS'] == '8'
+
+
+def test_wsgi_stream_cap_can_be_overridden(monkeypatch):
+    monkeypatch.setattr(serve, 'serve_wsgi', lambda config: None)
+    monkeypatch.setenv('SERVER_MODE', 'wsgi')
+    monkeypatch.setenv('EVENTS_MAX_SUBSCRIBERS', '100')
+    serve.main()
+    assert serve.os.environ['EVENTS_MAX_SUBSCRIBERS'] == '100'
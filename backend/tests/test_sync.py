@@ -0,0 +1,63 @@
+def add_resource(client, name, **headers):
+    response = client.post('/api/resources', headers=headers, json={
+        'resourceName': name, 'resourceType': 'Article',
+    })
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_since_now_returns_the_current_position(client):
+    add_resource(client, 'Before')
+    head = client.get('/api/sync?since=now').get_json()
+    assert head['changes'] == [] and not head['has_more']
+
+    resource_id = add_resource(client, 'After')
+    changes = client.get(f"/api/sync?since={head['next_since']}").get_json()['changes']
+    assert [(c['table'], c['row']['id']) for c in changes] == [('resources', resource_id)]
+
+
+def test_tables_filter(client):
+    since = client.get('/api/sync?since=now').get_json()['next_since']
+    add_resource(client, 'Filtered')
+    assert client.put('/api/settings', json={'appName': 'Synced'}).status_code == 200
+
+    changes = client.get(f'/api/sync?since={since}&tables=user_settings').get_json()['changes']
+    assert [c['table'] for c in changes] == ['user_settings']
+    assert client.get('/api/sync?tables=nope').status_code == 400
+
+
+def test_change_events_carry_the_writing_client(api, client):
+    subscriber = api.event_bus.subscribe()
+    try:
+        add_resource(client, 'Mine', **{'X-Client-Id': 'tab-1'})
+        add_resource(client, 'Anonymous')
+        events = subscriber.take(0)
+    finally:
+        api.event_bus.unsubscribe(subscriber)
+
+    changes = [event.data for event in events if event.type == 'change']
+    assert [(c['tables'], c['origin']) for c in changes] == [
+        (['resources'], 'tab-1'),
+        (['resources'], None),
+    ]
+
+
+def test_buffered_progress_is_announced_when_flushed(api, client):
+    problem_id = client.post('/api/problems', json={
+        'title': 'Announced save', 'category': 'Arrays', 'difficulty': 'Easy',
+    }).get_json()['id']
+    api.catalog_progress_buffer.flush()
+    subscriber = api.event_bus.subscribe()
+    try:
+        client.post(f'/api/progress/{problem_id}', json={'user_code': 'buffered'},
+                    headers={'X-Client-Id': 'tab-1'})
+        assert [event for event in subscriber.take(0) if event.type == 'change'] == []
+        api.catalog_progress_buffer.flush()
+        events = subscriber.take(0)
+    finally:
+        api.event_bus.unsubscribe(subscriber)
+
+    changes = [event.data for event in events if event.type == 'change']
+    assert len(changes) == 1
+    assert 'user_progress' in changes[0]['tables']
+    assert changes[0]['origin'] is None
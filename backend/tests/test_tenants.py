@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+from seeding import LESSON_COUNT_KEY, get_meta, set_meta
+from stats import get_stats
+from sync import PRUNED_SEQ_KEY, shard_changes_since
+from tenants import TenantRegistry
+
+
+class FakeBuffer:
+    def __init__(self):
+        self.failures = 0
+
+    def flush(self):
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError('database is locked')
+
+
+class FakeTenant:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.progress_buffer = FakeBuffer()
+        self.active = 0
+        self.closed = False
+
+    def close(self):
+        self.progress_buffer.flush()
+        self.closed = True
+
+
+def visit(registry, user_id):
+    tenant = registry.acquire({'id': user_id})
+    registry.release(tenant)
+    return tenant
+
+
+def test_evicting_a_shard_drops_its_lock():
+    registry = TenantRegistry(FakeTenant, max_open=2)
+    for user_id in range(10):
+        visit(registry, user_id)
+    assert registry.stats()['open'] == 2
+    assert set(registry._user_locks) == {8, 9}
+
+
+def test_a_failed_open_drops_its_lock():
+    def open_tenant(user):
+        raise OSError('no space left on device')
+
+    registry = TenantRegistry(open_tenant)
+    with pytest.raises(OSError):
+        registry.acquire({'id': 1})
+    assert registry._user_locks == {}
+
+
+def test_a_shard_that_fails_to_flush_stays_open():
+    registry = TenantRegistry(FakeTenant, max_open=1)
+    failing = visit(registry, 1)
+    failing.progress_buffer.failures = 1
+
+    other = visit(registry, 2)
+    assert not failing.closed
+    assert registry.acquire({'id': 1}) is failing
+    registry.release(failing)
+    assert registry.stats()['failed_evictions'] == 1
+
+    # Flushing works again: the next eviction closes it
+    visit(registry, 3)
+    assert failing.closed and other.closed
+    assert registry.stats()['open'] == 1
+
+
+def test_shards_are_isolated(api, tmp_path):
+    one = api.open_shard({'id': 1, 'shard_path': str(tmp_path / 'one.db')})
+    other = api.open_shard({'id': 2, 'shard_path': str(tmp_path / 'two.db')})
+    try:
+        one.writer.execute("INSERT INTO notes (note_title, note_content) VALUES ('Mine', '')")
+
+        def titles(tenant):
+            db = tenant.pool.acquire()
+            try:
+                return [row['note_title'] for row in db.execute('SELECT note_title FROM notes')]
+            finally:
+                tenant.pool.release(db)
+
+        assert titles(one) == ['Mine']
+        assert titles(other) == []
+    finally:
+        one.close()
+        other.close()
+
+
+def read_shard(tenant, read, *args):
+    db = tenant.pool.acquire()
+    try:
+        return read(db, *args)
+    finally:
+        tenant.pool.release(db)
+
+
+def test_shard_reads_see_the_catalog_meta(api, tmp_path):
+    saved = {key: api.catalog_writer.run(get_meta, key) for key in (LESSON_COUNT_KEY, PRUNED_SEQ_KEY)}
+    shard = api.open_shard({'id': 1, 'shard_path': str(tmp_path / 'meta.db')})
+    try:
+        api.catalog_writer.run(set_meta, LESSON_COUNT_KEY, 12)
+        api.catalog_writer.run(set_meta, PRUNED_SEQ_KEY, 5)
+
+        stats = read_shard(shard, lambda db: get_stats(db, shard=True))
+        assert stats['lessons']['total'] == 12
+
+        body = json.loads(read_shard(shard, shard_changes_since, (2, 0)))
+        assert body['reset'] is True
+    finally:
+        shard.close()
+        for key, value in saved.items():
+            if value is None:
+                api.catalog_writer.execute('DELETE FROM app_meta WHERE key = ?', (key,))
+            else:
+                api.catalog_writer.run(set_meta, key, value)
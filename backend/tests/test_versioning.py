@@ -0,0 +1,80 @@
+import sqlite3
+
+from versioning import TableVersions
+
+
+def add_note(database, title):
+    db = sqlite3.connect(database)
+    try:
+        with db:
+            db.execute('INSERT INTO notes (note_title, note_content) VALUES (?, ?)', (title, ''))
+    finally:
+        db.close()
+
+
+def test_writes_by_other_processes_change_etags_and_skip_the_cache(api, client):
+    first = client.get('/api/notes')
+    etag = first.headers['ETag']
+    assert client.get('/api/notes', headers={'If-None-Match': etag}).status_code == 304
+
+    add_note(api.DATABASE, 'Written outside the app')
+
+    second = client.get('/api/notes', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    assert 'Written outside the app' in [note['note_title'] for note in second.get_json()]
+
+
+def test_versions_are_shared_between_instances(api):
+    one, other = TableVersions(api.DATABASE), TableVersions(api.DATABASE)
+    assert one.etag(('notes', 'resources')) == other.etag(('notes', 'resources'))
+
+    announced = []
+    other.add_listener(lambda *tables: announced.append(tables))
+    add_note(api.DATABASE, 'Shared')
+
+    assert one.etag(('notes',))[0] == other.etag(('notes',))[0]
+    assert announced == []
+    other.refresh()
+    assert announced == [('notes',)]
+    other.refresh()
+    assert announced == [('notes',)]
+
+
+def test_bump_announces_only_tables_that_changed(api):
+    versions = TableVersions(api.DATABASE)
+    announced = []
+    versions.add_listener(lambda *tables: announced.append(tables))
+    versions.get('notes')
+
+    add_note(api.DATABASE, 'Bumped')
+    versions.bump('notes', 'resources')
+    assert announced == [('notes',)]
+
+
+def test_in_memory_versions():
+    versions = TableVersions()
+    tag, _ = versions.etag(('notes',))
+    versions.bump('notes')
+    assert versions.get('notes') == 1
+    assert versions.etag(('notes',))[0] != tag
+
+
+def test_buffered_progress_saves_skip_validators_until_flushed(api, client):
+    problem_id = client.post('/api/problems', json={
+        'title': 'Buffered save', 'category': 'Arrays', 'difficulty': 'Easy',
+    }).get_json()['id']
+    api.catalog_progress_buffer.flush()
+    etag = client.get(f'/api/problems/{problem_id}').headers['ETag']
+
+    client.post(f'/api/progress/{problem_id}', json={'user_code': 'buffered'})
+    pending = client.get(f'/api/problems/{problem_id}', headers={'If-None-Match': etag})
+    assert pending.status_code == 200
+    assert pending.get_json()['user_code'] == 'buffered'
+    assert 'ETag' not in pending.headers
+
+    api.catalog_progress_buffer.flush()
+    flushed = client.get(f'/api/problems/{problem_id}', headers={'If-None-Match': etag})
+    assert flushed.status_code == 200
+    assert flushed.headers['ETag'] != etag
+    assert flushed.get_json()['user_code'] == 'buffered'
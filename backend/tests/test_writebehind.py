@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+from writebehind import ProgressBuffer
+
+SCHEMA = '''
+    CREATE TABLE user_progress (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        problem_id TEXT NOT NULL UNIQUE,
+        user_code TEXT,
+        completed INTEGER DEFAULT 0,
+        completed_at TIMESTAMP,
+        last_attempted TIMESTAMP
+    );
+    CREATE TRIGGER reject_bad BEFORE INSERT ON user_progress
+    WHEN new.problem_id = 'bad' BEGIN
+        SELECT RAISE(ABORT, 'bad row');
+    END;
+'''
+
+
+@pytest.fixture
+def progress_db(writer, connect):
+    connect().executescript(SCHEMA)
+    return writer
+
+
+def saved(writer):
+    rows = writer.run(lambda db: db.execute('SELECT problem_id, user_code FROM user_progress').fetchall())
+    return {row['problem_id']: row['user_code'] for row in rows}
+
+
+def save(buffer, problem_id, code):
+    buffer.save(problem_id, code, 0, None, '2026-01-01T00:00:00')
+
+
+def test_saves_are_coalesced_per_problem(progress_db):
+    buffer = ProgressBuffer(progress_db)
+    save(buffer, 'a', 'one')
+    save(buffer, 'a', 'two')
+    assert buffer.pending('a')['user_code'] == 'two'
+    assert buffer.flush() == 1
+    assert saved(progress_db) == {'a': 'two'}
+    assert buffer.stats()['coalesced'] == 1
+
+
+def test_a_failing_row_does_not_block_the_batch(progress_db):
+    buffer = ProgressBuffer(progress_db, max_attempts=3)
+    save(buffer, 'a', 'a code')
+    save(buffer, 'bad', 'bad code')
+    save(buffer, 'b', 'b code')
+
+    assert buffer.flush() == 2
+    assert saved(progress_db) == {'a': 'a code', 'b': 'b code'}
+    assert buffer.pending('bad')['user_code'] == 'bad code'
+
+    assert buffer.flush() == 0
+    assert buffer.pending('bad') is not None
+    assert buffer.flush() == 0
+    assert buffer.pending('bad') is None
+    stats = buffer.stats()
+    assert (stats['failed_rows'], stats['dropped_rows'], stats['pending']) == (3, 1, 0)
+
+
+def test_a_new_save_gets_its_own_attempts(progress_db):
+    buffer = ProgressBuffer(progress_db, max_attempts=2)
+    save(buffer, 'bad', 'first')
+    buffer.flush()
+    save(buffer, 'bad', 'second')
+    buffer.flush()
+    assert buffer.pending('bad')['user_code'] == 'second'
+
+
+def test_transient_errors_put_the_whole_batch_back(progress_db):
+    def locked(db, rows):
+        raise sqlite3.OperationalError('database is locked')
+
+    buffer = ProgressBuffer(progress_db, after_write=locked)
+    save(buffer, 'a', 'a code')
+    save(buffer, 'b', 'b code')
+    with pytest.raises(sqlite3.OperationalError):
+        buffer.flush()
+    assert set(buffer.pending()) == {'a', 'b'}
+    assert saved(progress_db) == {}
+
+    buffer.after_write = None
+    assert buffer.flush() == 2
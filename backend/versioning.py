@@ -0,0 +1,258 @@
+"""
+Per-table version counters and conditional GET support.
+
+Every mutating endpoint bumps the version of the tables it writes. Read
+endpoints derive a weak ETag and Last-Modified header from the versions of
+the tables they read, so a client revalidating with If-None-Match (or
+If-Modified-Since) gets a 304 without the handler or the database running.
+
+Given a database, the versions are shared by every process using it: the
+``table_versions`` table (see migrations.py) is bumped by triggers in the
+same transaction as each write, and is re-read whenever ``PRAGMA
+data_version`` says another connection committed. That check touches only
+shared memory, so a revalidation still never runs a query while nothing
+changed, and every worker, CLI command or outside tool writing the file
+moves the same counters. Without a database the versions live in process
+memory, behind a random epoch that keeps tags from a previous run from
+matching. Views can also be given a ResponseCache, in which case the
+serialized body is cached against the same versions.
+
+Listeners hear about a bump from the thread that made it. Changes made by
+other connections are picked up by reads without notifying anyone; call
+``refresh()`` (the writer's watch does) to announce them.
+
+A user shard's versions (see tenants.py) inherit the catalog tables from
+the catalog's versions, so a change to the shared problems reaches every
+user's tags without being copied into each of them.
+"""
+
+import hashlib
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import Response, g, make_response, request
+
+
+class TableVersions:
+    """Monotonic change counters for each table, plus when they last changed"""
+
+    def __init__(self, database=None, parent=None, inherited=()):
+        # ``inherited`` tables are read from and bumped on ``parent`` instead
+        self.database = database
+        self.parent = parent
+        self.inherited = frozenset(inherited) if parent is not None else frozenset()
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._modified = {}
+        self._epoch = secrets.token_hex(4)
+        self._started = time.time()
+        self._listeners = []
+        self._local = threading.local()
+        # Shared mode: tables kept in the database, and changes read from it
+        # that no listener has heard about yet
+        self._shared = frozenset()
+        self._unannounced = set()
+        self._conn = None
+        self._pid = None
+        self._data_version = None
+
+    def add_listener(self, callback):
+        """Call ``callback(*tables)`` after every bump (e.g. cache invalidation)"""
+        self._listeners.append(callback)
+
+    def bump(self, *tables):
+        """Record that the given tables changed"""
+        shared = [table for table in tables if table in self.inherited]
+        if shared:
+            self.parent.bump(*shared)
+            tables = [table for table in tables if table not in self.inherited]
+            if not tables:
+                return
+        now = time.time()
+        with self._lock:
+            first = self._load()
+            changed = []
+            for table in tables:
+                if table in self._shared:
+                    # The triggers already counted the write; a table whose
+                    # change was announced elsewhere (or that didn't change)
+                    # is left out
+                    if first or table in self._unannounced:
+                        self._unannounced.discard(table)
+                        changed.append(table)
+                else:
+                    self._versions[table] = self._versions.get(table, 0) + 1
+                    self._modified[table] = now
+                    changed.append(table)
+        self._notify(changed)
+
+    def refresh(self):
+        """Announce changes other connections committed to the shared versions"""
+        with self._lock:
+            self._load()
+            changed = list(self._unannounced)
+            self._unannounced.clear()
+        self._local.refreshing = True
+        try:
+            self._notify(changed)
+        finally:
+            self._local.refreshing = False
+
+    @property
+    def refreshing(self):
+        """Whether this thread is announcing changes found by ``refresh()``.
+
+        Those may have been written by anyone, so listeners shouldn't credit
+        them to the request the thread happens to be serving.
+        """
+        return getattr(self._local, 'refreshing', False)
+
+    def _notify(self, tables):
+        if not tables:
+            return
+        for callback in self._listeners:
+            callback(*tables)
+
+    def _load(self):
+        """Re-read the shared versions if the database changed (lock held).
+
+        Returns True the first time they are read, when there is nothing to
+        compare them with.
+        """
+        if self.database is None:
+            return False
+        try:
+            if self._conn is None or self._pid != os.getpid():
+                self._conn = sqlite3.connect(self.database, isolation_level=None,
+                                             check_same_thread=False)
+                self._conn.execute('PRAGMA query_only = ON')
+                self._pid = os.getpid()
+                self._data_version = None
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version:
+                return False
+            rows = self._conn.execute('SELECT table_name, version, modified FROM table_versions').fetchall()
+            epoch = self._conn.execute('SELECT epoch FROM table_versions_epoch').fetchone()
+        except sqlite3.Error:
+            # Not migrated yet: keep counting in memory and look again next time
+            return False
+        first = self._data_version is None
+        self._data_version = data_version
+        if epoch is not None:
+            self._epoch = epoch[0]
+        self._shared = frozenset(table for table, _, _ in rows)
+        for table, version, modified in rows:
+            if self._versions.get(table) != version and not first:
+                self._unannounced.add(table)
+            self._versions[table] = version
+            self._modified[table] = modified
+        return first
+
+    def get(self, table):
+        if table in self.inherited:
+            return self.parent.get(table)
+        with self._lock:
+            self._load()
+            return self._versions.get(table, 0)
+
+    def snapshot(self, tables):
+        """Current versions of the given tables and the time the newest one changed"""
+        shared = [table for table in tables if table in self.inherited]
+        if not shared:
+            return self._snapshot(tables)
+        own = [table for table in tables if table not in self.inherited]
+        shared_versions, modified = self.parent.snapshot(shared)
+        by_table = dict(zip(shared, shared_versions))
+        if own:
+            own_versions, own_modified = self._snapshot(own)
+            by_table.update(zip(own, own_versions))
+            modified = max(modified, own_modified)
+        return tuple(by_table[table] for table in tables), modified
+
+    def _snapshot(self, tables):
+        with self._lock:
+            self._load()
+            versions = tuple(self._versions.get(table, 0) for table in tables)
+            modified = max(
+                (self._modified.get(table, self._started) for table in tables),
+                default=self._started,
+            )
+        return versions, modified
+
+    def etag(self, tables, variant=''):
+        """Opaque tag for the current state of ``tables`` (and a request variant)"""
+        tag, modified, _ = self.validators(tables, variant)
+        return tag, modified
+
+    def validators(self, tables, variant=''):
+        """ETag, change time and raw version tuple for ``tables``"""
+        versions, modified = self.snapshot(tables)
+        tag = f"{self._epoch}-{'.'.join(map(str, versions))}"
+        if variant:
+            tag += '-' + hashlib.blake2b(variant.encode(), digest_size=6).hexdigest()
+        return tag, modified, versions
+
+
+def cache_key():
+    """Cache key for the current request: path plus sorted query arguments.
+
+    Prefixed with ``g.cache_scope`` when the request sets one, so users with
+    their own shards never share cached responses (or ETags).
+    """
+    args = sorted(request.args.items(multi=True))
+    return g.get('cache_scope', '') + request.path + '?' + '&'.join(f'{k}={v}' for k, v in args)
+
+
+def conditional(versions, *tables, cache=None, bypass=None):
+    """Decorate a GET view with ETag/Last-Modified validation against ``tables``.
+
+    The validators are captured before the view runs, so a write that lands
+    while the response is being built can only make the tag stale (forcing
+    a refetch next time), never mislabel older data as newer. With a
+    ``cache``, 200 responses are stored and replayed until one of the
+    tables changes. While ``bypass()`` is true (e.g. writes are buffered
+    that the version counters can't see yet) the view runs uncached and
+    the response carries no validators.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if bypass is not None and bypass():
+                response = make_response(view(*args, **kwargs))
+                response.cache_control.no_store = True
+                return response
+
+            etag, modified, current = versions.validators(tables, cache_key())
+            last_modified = int(modified)
+
+            not_modified = False
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since:
+                # Compare against the exact change time: the header is truncated
+                # to whole seconds and must not hide a change later in that second
+                not_modified = modified <= request.if_modified_since.timestamp()
+
+            entry = None
+            if not_modified:
+                response = make_response('', 304)
+            elif cache is not None and (entry := cache.get(cache_key(), current)):
+                response = Response(entry.body, mimetype=entry.mimetype)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if cache is not None:
+                    cache.set(cache_key(), response.get_data(), response.mimetype,
+                              tables, current)
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,265 @@
+"""
+Write-behind buffer for progress autosaves.
+
+The editor saves user_progress on every edit, but only the latest save per
+problem matters. Saves are kept in memory, newest per problem, and written
+in one executemany upsert when the flush interval elapses or the buffer
+reaches ``max_pending`` problems, turning a burst of autosaves into a
+single transaction.
+
+If a batch fails, its rows are written again one per savepoint, so one bad
+row can't hold back the rest. A row that keeps failing is retried on the
+next ``max_attempts - 1`` flushes and then dropped with a warning; errors
+that aren't about the rows (a locked or unwritable database, a writer
+timeout) put the whole batch back for the next flush instead.
+
+Buffered rows are flushed at interpreter exit and on SIGTERM. Readers call
+``pending()`` *before* querying and lay the result over what they read
+(``apply``), so a save is visible to reads while it waits in the buffer
+and while its flush is being committed.
+"""
+
+import os
+import signal
+import sqlite3
+import threading
+import time
+
+PROGRESS_FIELDS = ('user_code', 'completed', 'completed_at', 'last_attempted')
+
+UPSERT_PROGRESS = '''
+    INSERT INTO user_progress (problem_id, user_code, completed, completed_at, last_attempted)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(problem_id) DO UPDATE SET
+        user_code = excluded.user_code,
+        completed = excluded.completed,
+        completed_at = excluded.completed_at,
+        last_attempted = excluded.last_attempted
+'''
+
+
+# Failures that say nothing about the rows being written
+TRANSIENT_ERRORS = (sqlite3.OperationalError, TimeoutError)
+
+
+class ProgressBuffer:
+    """Coalesces user_progress upserts per problem and flushes them in batches"""
+
+    def __init__(self, writer, flush_interval=1.0, max_pending=256, after_write=None, max_attempts=3,
+                 after_flush=None):
+        self.writer = writer
+        # Called as after_write(db, rows) in the same writer job as the upsert
+        self.after_write = after_write
+        # Called with no arguments once a flush has committed rows
+        self.after_flush = after_flush
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+
+        # Reentrant: the SIGTERM handler flushes on whatever thread it interrupts
+        self._lock = threading.RLock()
+        self._flush_lock = threading.RLock()
+        self._wake = threading.Event()
+        self._pending = {}
+        self._flushing = {}
+        self._attempts = {}  # problem_id -> failed writes of its pending save
+        self._pid = None
+        self._closed = False
+        self._stats = {
+            'saves': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'rows_flushed': 0,
+            'failed_flushes': 0,
+            'failed_rows': 0,
+            'dropped_rows': 0,
+            'flush_seconds': 0.0,
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked child inherits the parent's buffer contents; those are
+            # the parent's to flush
+            self._pid = os.getpid()
+            self._pending = {}
+            self._flushing = {}
+        threading.Thread(target=self._run_loop, name='progress-flush', daemon=True).start()
+
+    def _run_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass  # the batch was put back; the next tick retries
+
+    def save(self, problem_id, user_code, completed, completed_at, last_attempted):
+        """Buffer a progress upsert, replacing any pending one for the problem"""
+        self._ensure_started()
+        with self._lock:
+            if problem_id in self._pending:
+                self._stats['coalesced'] += 1
+            # A new save gets its own attempts
+            self._attempts.pop(problem_id, None)
+            self._pending[problem_id] = {
+                'user_code': user_code,
+                'completed': completed,
+                'completed_at': completed_at,
+                'last_attempted': last_attempted,
+            }
+            self._stats['saves'] += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write every buffered save in one transaction; returns rows written"""
+        written = self._flush()
+        if written and self.after_flush is not None:
+            self.after_flush()
+        return written
+
+    def _flush(self):
+        with self._flush_lock:
+            with self._lock:
+                # _flushing is only non-empty here when a signal handler
+                # interrupted a flush on this thread; write that batch too
+                batch = {**self._flushing, **self._pending}
+                if not batch:
+                    return 0
+                self._flushing, self._pending = batch, {}
+
+            rows = [
+                (problem_id, *(fields[name] for name in PROGRESS_FIELDS))
+                for problem_id, fields in batch.items()
+            ]
+            started = time.perf_counter()
+            failed = {}
+            try:
+                self.writer.run(self._write, rows)
+            except TRANSIENT_ERRORS:
+                self._requeue(batch)
+                raise
+            except Exception:
+                failed = self._write_each(rows)
+                if failed is None:
+                    self._requeue(batch)
+                    raise
+
+            with self._lock:
+                self._flushing = {}
+                self._stats['flushes'] += 1
+                self._stats['rows_flushed'] += len(rows) - len(failed)
+                self._stats['flush_seconds'] += time.perf_counter() - started
+                if self._attempts:
+                    for problem_id in batch.keys() - failed.keys():
+                        self._attempts.pop(problem_id, None)
+                for problem_id, error in failed.items():
+                    self._stats['failed_rows'] += 1
+                    if problem_id in self._pending:
+                        continue  # superseded by a newer save, which gets its own tries
+                    attempts = self._attempts.get(problem_id, 0) + 1
+                    if attempts < self.max_attempts:
+                        self._attempts[problem_id] = attempts
+                        self._pending[problem_id] = batch[problem_id]
+                    else:
+                        self._attempts.pop(problem_id, None)
+                        self._stats['dropped_rows'] += 1
+                        print(f"Warning: dropped buffered progress for problem {problem_id} "
+                              f"after {attempts} failed writes: {error}")
+            return len(rows) - len(failed)
+
+    def _write_each(self, rows):
+        """Write rows one per job, so each gets its own savepoint.
+
+        Returns {problem_id: error} for the rows that failed, or None when a
+        failure wasn't about the row (see TRANSIENT_ERRORS).
+        """
+        futures = [(row[0], self.writer.submit(self._write, [row])) for row in rows]
+        failed = {}
+        transient = False
+        for problem_id, future in futures:
+            try:
+                future.result(timeout=self.writer.timeout)
+            except TRANSIENT_ERRORS:
+                transient = True
+            except Exception as e:
+                failed[problem_id] = e
+        return None if transient else failed
+
+    def _requeue(self, batch):
+        with self._lock:
+            # Keep anything saved since the swap; it is newer
+            self._pending = {**batch, **self._pending}
+            self._flushing = {}
+            self._stats['failed_flushes'] += 1
+
+    def _write(self, db, rows):
+        db.executemany(UPSERT_PROGRESS, rows)
+        if self.after_write is not None:
+            self.after_write(db, rows)
+
+    def close(self):
+        """Flush what is buffered and stop the flush thread (see tenants.py)"""
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+    def pending(self, problem_id=None):
+        """Buffered fields by problem id (or for one problem, or None).
+
+        Call before reading user_progress: a save that is flushed while the
+        read runs is then still covered by this snapshot.
+        """
+        with self._lock:
+            if problem_id is not None:
+                return self._pending.get(problem_id) or self._flushing.get(problem_id)
+            if not self._pending and not self._flushing:
+                return {}
+            return {**self._flushing, **self._pending}
+
+    @staticmethod
+    def apply(item, fields):
+        """Overlay buffered ``fields`` on a row dict, for the columns it has"""
+        for name, value in fields.items():
+            if name in item:
+                item[name] = value
+        return item
+
+    def install_signal_handler(self, signum=signal.SIGTERM):
+        """Flush before the process is terminated by ``signum``.
+
+        Only possible from the main thread; elsewhere this is a no-op and
+        the atexit flush still covers normal interpreter shutdown.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signum)
+
+        def handler(received, frame):
+            try:
+                self.flush()
+            finally:
+                if callable(previous):
+                    previous(received, frame)
+                else:
+                    signal.signal(received, previous or signal.SIG_DFL)
+                    os.kill(os.getpid(), received)
+
+        signal.signal(signum, handler)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+            stats['flushing'] = len(self._flushing)
+        stats['flush_seconds'] = round(stats['flush_seconds'], 3)
+        stats['avg_rows_per_flush'] = (
+            round(stats['rows_flushed'] / stats['flushes'], 2) if stats['flushes'] else 0.0
+        )
+        stats['flush_interval'] = self.flush_interval
+        stats['max_pending'] = self.max_pending
+        return stats
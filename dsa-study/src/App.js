@@ -5,13 +5,60 @@ import Navbar from "./components/Navbar";
 import ProblemsPage from "./components/Lessons/ProblemsPage";
 import ResourcesPage from "./components/ResourcesPage";
 import LessonsPage from "./components/Lessons/LessonsPage";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import lessonData from "./components/lesson-data.json";
 import NotesPage from "./components/NotesPage";
 import NoteView from "./components/NoteView";
 import Modal from "./components/Modal";
 import SettingsPage from "./components/SettingsPage";
-import { resourcesAPI, notesAPI, lessonsAPI, settingsAPI, categoriesAPI } from "./services/api";
+import { resourcesAPI, notesAPI, lessonsAPI, settingsAPI, categoriesAPI, batchAPI, syncAPI, subscribeToChanges } from "./services/api";
+
+// Tables whose changes this component keeps in state
+const SYNCED_TABLES = ["user_settings", "custom_categories", "lesson_completion", "resources", "notes"];
+
+// Convert snake_case rows from the backend to the frontend format
+const formatSettings = (data) => ({
+  appName: data.app_name || data.appName || "Study Tracker",
+  studySubject: data.study_subject || data.studySubject || "Data Structures & Algorithms",
+  categoryLabel: data.category_label || data.categoryLabel || "Topic",
+  categoryLabelPlural: data.category_label_plural || data.categoryLabelPlural || "Topics",
+});
+
+const formatLesson = (l) => ({
+  id: l.id,
+  lessonId: l.lesson_id,
+  completedAt: l.completed_at,
+});
+
+const formatResource = (r) => ({
+  ...r,
+  resourceName: r.resource_name || r.resourceName,
+  resourceType: r.resource_type || r.resourceType,
+  resourceLink: r.resource_link || r.resourceLink,
+  dataStructure: r.data_structure || r.dataStructure,
+  isFavorite: r.is_favorite === 1 || r.isFavorite,
+  addedAt: r.added_at || r.addedAt,
+});
+
+const formatNote = (n) => ({
+  ...n,
+  noteTitle: n.note_title || n.noteTitle,
+  noteContent: n.note_content || n.noteContent,
+  dataStructure: n.data_structure || n.dataStructure,
+  createdAt: n.created_at || n.createdAt,
+});
+
+// Apply one upsert/delete from /api/sync to a list, keeping `order`
+const applyChange = (items, change, format, same, order) => {
+  if (change.op === "delete") return items.filter((item) => item.id !== change.id);
+  const row = format(change.row);
+  const rest = items.filter((item) => item.id !== row.id && !same(item, row));
+  return order ? [...rest, row].sort(order) : [...rest, row];
+};
+
+// For lists where only the id identifies a row
+const idOnly = () => false;
+const newestFirst = (field) => (a, b) => String(b[field] || "").localeCompare(String(a[field] || ""));
 
 function App() {
   const [completedLessons, setCompletedLessons] = useState([]);
@@ -38,84 +85,160 @@ function App() {
     tags: "",
   });
 
+  // Position in the server's change log (see syncAPI) that local state is
+  // up to date with; pulls run one at a time so changes apply in order
+  const syncCursor = useRef(null);
+  const syncQueue = useRef(Promise.resolve());
+
   useEffect(() => {
-    loadSettings();
-    loadCategories();
-    loadCompletedLessons();
-    loadResourcesAndNotes();
+    loadInitialData();
   }, []);
 
-  const loadSettings = async () => {
+  // Pick up changes made in other tabs and devices without polling: an
+  // event only says which tables changed, the rows come from /api/sync
+  useEffect(() => {
+    return subscribeToChanges((tables) => {
+      if (!tables) {
+        loadInitialData();
+      } else if (tables.some((table) => SYNCED_TABLES.includes(table))) {
+        queuePull();
+      }
+    });
+  }, []);
+
+  const queuePull = () => {
+    syncQueue.current = syncQueue.current.then(pullChanges).catch((error) => {
+      console.error("Error syncing changes:", error);
+    });
+  };
+
+  const pullChanges = async () => {
+    // Nothing to pull from until the first load has set the cursor
+    while (syncCursor.current !== null) {
+      const data = await syncAPI.changes(syncCursor.current, 1000, SYNCED_TABLES);
+      if (data.reset) {
+        await loadInitialData();
+        return;
+      }
+      data.changes.forEach(applySyncChange);
+      syncCursor.current = data.next_since;
+      if (!data.has_more) return;
+    }
+  };
+
+  const applySyncChange = (change) => {
+    switch (change.table) {
+      case "user_settings":
+        if (change.op === "upsert") setSettings(formatSettings(change.row));
+        break;
+      case "custom_categories":
+        setCategories((items) =>
+          applyChange(items, change, (c) => c, idOnly, (a, b) => a.display_order - b.display_order)
+        );
+        break;
+      case "lesson_completion":
+        setCompletedLessons((items) =>
+          applyChange(items, change, formatLesson, (a, b) => a.lessonId === b.lessonId)
+        );
+        break;
+      case "resources":
+        setResources((items) =>
+          applyChange(items, change, formatResource, idOnly, newestFirst("addedAt"))
+        );
+        break;
+      case "notes":
+        setNotes((items) =>
+          applyChange(items, change, formatNote, idOnly, newestFirst("createdAt"))
+        );
+        break;
+      default:
+        break;
+    }
+  };
+
+  // First load in one round trip; anything the batch can't deliver is
+  // fetched on its own by the loader. The sync position is read first, so
+  // pulling from it later can repeat a change these reads already saw but
+  // never misses one.
+  const loadInitialData = async () => {
+    const cursorPath = "/api/sync?since=now";
+    const paths = [
+      cursorPath,
+      "/api/settings",
+      "/api/categories",
+      "/api/lessons/completed",
+      "/api/resources",
+      "/api/notes",
+    ];
+    let bodies = {};
+    try {
+      const responses = await batchAPI.get(paths);
+      responses.forEach((r) => {
+        if (r.status === 200) bodies[r.path] = r.body;
+      });
+    } catch (error) {
+      bodies = {};
+    }
+    if (bodies[cursorPath]) {
+      syncCursor.current = bodies[cursorPath].next_since;
+    } else {
+      syncCursor.current = await syncAPI.changes("now").then((data) => data.next_since, () => null);
+    }
+    await Promise.all([
+      loadSettings(bodies["/api/settings"]),
+      loadCategories(bodies["/api/categories"]),
+      loadCompletedLessons(bodies["/api/lessons/completed"]),
+      loadResourcesAndNotes(bodies["/api/resources"], bodies["/api/notes"]),
+    ]);
+  };
+
+  const loadSettings = async (prefetched) => {
     try {
-      const data = await settingsAPI.get();
+      const data = prefetched !== undefined ? prefetched : await settingsAPI.get();
       if (data) {
-        setSettings({
-          appName: data.app_name || data.appName || "Study Tracker",
-          studySubject: data.study_subject || data.studySubject || "Data Structures & Algorithms",
-          categoryLabel: data.category_label || data.categoryLabel || "Topic",
-          categoryLabelPlural: data.category_label_plural || data.categoryLabelPlural || "Topics",
-        });
+        setSettings(formatSettings(data));
       }
     } catch (error) {
       console.log("First load - using defaults");
     }
   };
 
-  const loadCategories = async () => {
+  const loadCategories = async (prefetched) => {
     try {
-      const data = await categoriesAPI.getAll();
+      const data = prefetched !== undefined ? prefetched : await categoriesAPI.getAll();
       setCategories(data || []);
     } catch (error) {
       console.log("First load - using defaults");
     }
   };
 
-  const loadCompletedLessons = async () => {
+  const loadCompletedLessons = async (prefetched) => {
     try {
-      const data = await lessonsAPI.getCompleted().catch(() => []);
+      const data =
+        prefetched !== undefined ? prefetched : await lessonsAPI.getCompleted().catch(() => []);
       if (data) {
-        // Convert from backend format to frontend format
-        const formatted = data.map(l => ({
-          lessonId: l.lesson_id,
-          completedAt: l.completed_at
-        }));
-        setCompletedLessons(formatted);
+        setCompletedLessons(data.map(formatLesson));
       }
     } catch (error) {
       console.log("First load");
     }
   };
 
-  const loadResourcesAndNotes = async () => {
+  const loadResourcesAndNotes = async (prefetchedResources, prefetchedNotes) => {
     try {
       const [apiResources, apiNotes] = await Promise.all([
-        resourcesAPI.getAll().catch(() => []),
-        notesAPI.getAll().catch(() => []),
+        prefetchedResources !== undefined
+          ? prefetchedResources
+          : resourcesAPI.getAll().catch(() => []),
+        prefetchedNotes !== undefined ? prefetchedNotes : notesAPI.getAll().catch(() => []),
       ]);
 
-      // Convert snake_case from backend to camelCase for frontend
       if (apiResources) {
-        const formattedResources = apiResources.map(r => ({
-          ...r,
-          resourceName: r.resource_name || r.resourceName,
-          resourceType: r.resource_type || r.resourceType,
-          resourceLink: r.resource_link || r.resourceLink,
-          dataStructure: r.data_structure || r.dataStructure,
-          isFavorite: r.is_favorite === 1 || r.isFavorite,
-          addedAt: r.added_at || r.addedAt,
-        }));
-        setResources(formattedResources);
+        setResources(apiResources.map(formatResource));
       }
 
       if (apiNotes) {
-        const formattedNotes = apiNotes.map(n => ({
-          ...n,
-          noteTitle: n.note_title || n.noteTitle,
-          noteContent: n.note_content || n.noteContent,
-          dataStructure: n.data_structure || n.dataStructure,
-          createdAt: n.created_at || n.createdAt,
-        }));
-        setNotes(formattedNotes);
+        setNotes(apiNotes.map(formatNote));
       }
     } catch (error) {
       console.log("First load");
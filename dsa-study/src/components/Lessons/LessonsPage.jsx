@@ -103,49 +103,23 @@ export default function LessonsPage({
   const runCode = async () => {
     if (!selectedLesson) return;
     try {
-      const results = selectedLesson.exercise.testCases.map((testCase, idx) => {
-        try {
-          // eslint-disable-next-line no-new-func
-          const func = new Function("return " + userCode)();
-          const inputs = Object.values(testCase.input);
-          const result = func(...inputs);
-          const passed =
-            JSON.stringify(result) === JSON.stringify(testCase.expected);
-          return {
-            case: idx + 1,
-            input: testCase.input,
-            expected: testCase.expected,
-            actual: result,
-            passed,
-          };
-        } catch (error) {
-          return {
-            case: idx + 1,
-            input: testCase.input,
-            expected: testCase.expected,
-            actual: error.message,
-            passed: false,
-          };
-        }
-      });
+      // Graded by the backend's sandboxed runner, which also records progress
+      const { problemsAPI } = await import("../../services/api");
+      const problemId = `${selectedLesson.id}-exercise`;
+      const run = await problemsAPI.run(problemId, userCode);
+      if (!run.ok) {
+        setTestResults([{ case: "Error", passed: false, actual: run.error }]);
+        return;
+      }
+      const results = run.results.map((result) => ({
+        ...result,
+        actual: result.error !== null ? result.error : result.actual,
+      }));
       setTestResults(results);
 
-      // If all tests pass, mark as complete and update backend
-      if (results.every((r) => r.passed)) {
+      // If all tests pass, mark as complete
+      if (run.passed) {
         onMarkComplete(selectedLesson.id);
-
-        // Update backend progress
-        try {
-          const { progressAPI } = await import("../../services/api");
-          const problemId = `${selectedLesson.id}-exercise`;
-          await progressAPI.update(problemId, {
-            user_code: userCode,
-            completed: 1,
-            completed_at: new Date().toISOString(),
-          });
-        } catch (error) {
-          console.error("Failed to update backend progress:", error);
-        }
       }
     } catch (error) {
       setTestResults([{ case: "Error", passed: false, actual: error.message }]);
@@ -1,13 +1,32 @@
 const API_BASE_URL = 'http://localhost:5001/api';
 
+// API token for a server with user accounts (see backend/README.md); a
+// single-user server needs none
+const TOKEN_KEY = 'apiToken';
+
+export const setApiToken = (token) =>
+  token ? localStorage.setItem(TOKEN_KEY, token) : localStorage.removeItem(TOKEN_KEY);
+
+const getApiToken = () => localStorage.getItem(TOKEN_KEY);
+
+// Identifies this tab to the server, which echoes it as the `origin` of the
+// change events its writes cause, so the tab can skip its own changes
+export const CLIENT_ID =
+  typeof crypto !== 'undefined' && crypto.randomUUID
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
 // Helper function for API requests
 async function apiRequest(endpoint, options = {}) {
+  const token = getApiToken();
   const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+    ...options,
     headers: {
       'Content-Type': 'application/json',
+      'X-Client-Id': CLIENT_ID,
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
       ...options.headers,
     },
-    ...options,
   });
 
   if (!response.ok) {
@@ -23,8 +42,21 @@ async function apiRequest(endpoint, options = {}) {
 export const problemsAPI = {
   getAll: () => apiRequest('/problems'),
 
+  // Keyset-paginated list: pass { limit, cursor, category, difficulty, completed, is_lesson_exercise }
+  // and follow next_cursor from the response to load the next page
+  getPage: (params = {}) =>
+    apiRequest(`/problems?${new URLSearchParams({ limit: 50, ...params })}`),
+
   getById: (id) => apiRequest(`/problems/${id}`),
 
+  // Grade code against the stored test cases on the server; a full pass is
+  // recorded in progress
+  run: (id, code) =>
+    apiRequest(`/problems/${id}/run`, {
+      method: 'POST',
+      body: JSON.stringify({ code }),
+    }),
+
   create: (problem) =>
     apiRequest('/problems', {
       method: 'POST',
@@ -52,17 +84,47 @@ export const progressAPI = {
       body: JSON.stringify(progress),
     }),
 
+  // [{ problem_id, user_code, completed, completed_at }, ...] in one request
+  updateBatch: (items) =>
+    apiRequest('/progress/batch', {
+      method: 'POST',
+      body: JSON.stringify(items),
+    }),
+
   getAll: () => apiRequest('/progress'),
+
+  // { versions: [{ version, created_at, completed, hash, size }], next_before }, newest first
+  getHistory: (problemId, before = null, limit = 50) =>
+    apiRequest(
+      `/progress/${problemId}/history?${new URLSearchParams(
+        before === null ? { limit } : { limit, before }
+      )}`
+    ),
+
+  // { version, created_at, completed, hash, code }
+  getVersion: (problemId, version) => apiRequest(`/progress/${problemId}/history/${version}`),
 };
 
 // ==================== LESSONS API ====================
 
 export const lessonsAPI = {
+  // { [category]: [{ id, title, difficulty, dataStructures, exerciseId, ... }] }
+  getAll: () => apiRequest('/lessons'),
+
+  // Full lesson: explanation, visualizer steps and exercise
+  get: (lessonId) => apiRequest(`/lessons/${lessonId}`),
+
   markComplete: (lessonId) =>
     apiRequest(`/lessons/complete/${lessonId}`, {
       method: 'POST',
     }),
 
+  markCompleteBatch: (lessonIds) =>
+    apiRequest('/lessons/complete/batch', {
+      method: 'POST',
+      body: JSON.stringify(lessonIds),
+    }),
+
   getCompleted: () => apiRequest('/lessons/completed'),
 
   seedExercises: (lessonData) =>
@@ -163,3 +225,75 @@ export const categoriesAPI = {
       body: JSON.stringify({ categoryIds }),
     }),
 };
+
+// ==================== REVIEW API ====================
+
+export const reviewAPI = {
+  // { items, next_due_at }: problems due for review, most overdue first
+  getNext: (limit = 10) => apiRequest(`/review/next?limit=${limit}`),
+
+  // grade: 0-5, where 3 and up counts as remembered
+  record: (problemId, grade) =>
+    apiRequest(`/review/${problemId}`, {
+      method: 'POST',
+      body: JSON.stringify({ grade }),
+    }),
+};
+
+// ==================== STATS API ====================
+
+export const statsAPI = {
+  // { problems, by_category, by_difficulty, lessons, streak, recent_activity }
+  get: () => apiRequest('/stats'),
+};
+
+// ==================== EVENTS API ====================
+
+// Live change notifications over Server-Sent Events. Calls onChange(tables)
+// after every write, or onChange(null) when everything should be refetched.
+// Returns a function that closes the stream.
+export const subscribeToChanges = (onChange) => {
+  // EventSource can't send headers, so the token goes in the query string
+  const token = getApiToken();
+  const query = token ? `?${new URLSearchParams({ access_token: token })}` : '';
+  const source = new EventSource(`${API_BASE_URL}/events${query}`);
+  source.addEventListener('change', (event) => {
+    const data = JSON.parse(event.data);
+    if (data.origin !== CLIENT_ID) onChange(data.tables);
+  });
+  source.addEventListener('resync', () => onChange(null));
+  return () => source.close();
+};
+
+// ==================== ACCOUNT API ====================
+
+export const accountAPI = {
+  // { id, username, is_admin } for the current token, or null on a single-user server
+  me: () => apiRequest('/me'),
+};
+
+// ==================== SYNC API ====================
+
+export const syncAPI = {
+  // Rows changed after `since` (0 = everything, "now" = just the current
+  // position): { changes, next_since, has_more, reset }. Keep next_since (a
+  // number, or a string with user accounts) and call again while has_more;
+  // on reset, clear and resync from 0. `tables` limits the changes
+  changes: (since = 0, limit = 1000, tables = null) =>
+    apiRequest(
+      `/sync?${new URLSearchParams(
+        tables ? { since, limit, tables: tables.join(',') } : { since, limit }
+      )}`
+    ),
+};
+
+// ==================== BATCH API ====================
+
+export const batchAPI = {
+  // Several GETs in one round trip; resolves to [{ path, status, body }, ...]
+  get: (paths) =>
+    apiRequest('/batch', {
+      method: 'POST',
+      body: JSON.stringify({ requests: paths }),
+    }).then((data) => data.responses),
+};